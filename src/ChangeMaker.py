@@ -0,0 +1,72 @@
+from functools import lru_cache
+
+
+class ChangeMaker:
+    """Pays amounts out of bounded coin boxes with the fewest coins.
+
+    Works for any set of positive denominations, not only canonical ones like
+    (1, 2). Solutions are memoized per (amount, coin counts) in a bounded LRU
+    cache, so amounts that keep coming back are answered without solving again.
+    """
+
+    _shared = {}
+
+    def __init__(self, coinValues, cacheSize: int = 4096):
+        coinValues = tuple(coinValues)
+        if not coinValues or any(v <= 0 for v in coinValues):
+            raise ValueError("coin values must be positive")
+        self.coinValues = coinValues
+        self.solve = lru_cache(maxsize=cacheSize)(self._solve)
+
+    # One solver (and so one cache) per set of denominations, shared by all machines using it.
+    @classmethod
+    def shared(cls, coinValues):
+        coinValues = tuple(coinValues)
+        solver = cls._shared.get(coinValues)
+        if solver is None:
+            solver = cls._shared[coinValues] = cls(coinValues)
+        return solver
+
+    # The memoized solve() can't be pickled; a shared solver comes back as the shared
+    # solver of the unpickling process, any other one as a fresh solver with an empty cache.
+    def __reduce__(self):
+        if ChangeMaker._shared.get(self.coinValues) is self:
+            return ChangeMaker.shared, (self.coinValues,)
+        return type(self), (self.coinValues, self.solve.cache_parameters()['maxsize'])
+
+    # Returns how many coins of each denomination to pay `amount` with, or None if
+    # the boxes described by `counts` cannot pay it exactly.
+    def _solve(self, amount: int, counts: tuple):
+        if amount == 0:
+            return (0,) * len(counts)
+        # Every coin is worth at least 1, so no optimal payout uses more than `amount` coins.
+        unreachable = amount + 1
+        best = [0] + [unreachable] * amount
+        layers = []
+        # Bounded knapsack: split each box into 1, 2, 4, ... coin bundles and run 0/1 passes over them.
+        for kind, (value, count) in enumerate(zip(self.coinValues, counts)):
+            bundle = 1
+            while count > 0:
+                take = min(bundle, count)
+                count -= take
+                bundle *= 2
+                weight = value * take
+                if weight > amount:
+                    break
+                taken = bytearray(amount + 1)
+                for a in range(amount, weight - 1, -1):
+                    candidate = best[a - weight] + take
+                    if candidate < best[a]:
+                        best[a] = candidate
+                        taken[a] = 1
+                layers.append((kind, take, weight, taken))
+        if best[amount] == unreachable:
+            return None
+
+        change = [0] * len(counts)
+        rest = amount
+        for kind, take, weight, taken in reversed(layers):
+            if taken[rest]:
+                change[kind] += take
+                rest -= weight
+        return tuple(change)
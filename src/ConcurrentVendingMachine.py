@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from functools import wraps
+import threading
+
+from VendingMachine import VendingMachine
+
+
+def _locked(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class ConcurrentVendingMachine(VendingMachine):
+    """VendingMachine whose every method runs under the machine's own lock.
+
+    The lock is reentrant, so apply_batch() runs its whole batch atomically while
+    still going through the locked per-operation methods.
+    """
+
+    _LOCKED = tuple(VendingMachine._MUTATORS) + (
+        'getNumberOfProduct1', 'getNumberOfProduct2', 'getNumberOfProduct', 'getCurrentBalance',
+        'getCurrentMode', 'getCurrentSum', 'getCoins1', 'getCoins2', 'getCoins', 'getPrice1',
+        'getPrice2', 'getPrice', 'apply_batch', '_getState', '_setState', 'to_bytes',
+        'pack_into', 'unpack_from', 'state', 'canMakeChange',
+        'canBuy', 'savepoint')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+
+    # begin() takes the lock and keeps it until commit() or a full rollback(), so other
+    # threads never see, or add to, changes that may still be rolled back.
+    def begin(self):
+        self._lock.acquire()
+        try:
+            super().begin()
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def commit(self):
+        with self._lock:
+            super().commit()
+            self._lock.release()
+
+    def rollback(self, savepoint: int = None):
+        with self._lock:
+            super().rollback(savepoint)
+            if savepoint is None:
+                self._lock.release()
+
+    # Taken before looking for an open transaction, which may be another thread's.
+    @contextmanager
+    def transaction(self):
+        with self._lock, super().transaction():
+            yield self
+
+    # The child gets its own lock.
+    def fork(self):
+        with self._lock:
+            child = super().fork()
+        child._lock = threading.RLock()
+        return child
+
+
+for _name in ConcurrentVendingMachine._LOCKED:
+    setattr(ConcurrentVendingMachine, _name, _locked(getattr(VendingMachine, _name)))
+
+
+class ShardedFleet:
+    """Plain VendingMachines guarded by striped locks.
+
+    Machine i is guarded by lock i % stripes. With the default of one stripe per
+    machine, threads working on different machines never contend; fewer stripes
+    trade some contention for fewer lock objects.
+    """
+
+    def __init__(self, machines, stripes: int = None):
+        self.machines = list(machines)
+        if not self.machines:
+            raise ValueError("a sharded fleet needs at least one machine")
+        if stripes is not None and stripes < 1:
+            raise ValueError("stripes must be positive")
+        self.__locks = [threading.Lock() for _ in range(stripes or len(self.machines))]
+
+    def __len__(self):
+        return len(self.machines)
+
+    # Calls one method of machine `index` atomically.
+    def call(self, index: int, name: str, *args):
+        with self.__locks[index % len(self.__locks)]:
+            return getattr(self.machines[index], name)(*args)
+
+    # Holds machine `index` for a multi-call session: `with fleet.locked(i) as machine: ...`.
+    @contextmanager
+    def locked(self, index: int):
+        with self.__locks[index % len(self.__locks)]:
+            yield self.machines[index]
@@ -0,0 +1,141 @@
+# Monte Carlo customer demand over a VendingFleet, for planning refill visits.
+# Usage: python src/DemandSimulator.py [--machines N] [--days N] [--rate N] [--refill-every N]
+#                                      [--collect-every N] [--overpay N] [--float C1 C2]
+import argparse
+import time
+
+import numpy as np
+
+from VendingMachine import VendingMachine
+from VendingFleet import VendingFleet
+
+ADMIN_CODE = 117345294655382
+
+
+class DemandSimulator:
+    """Drives a VendingFleet with random customers and counts what goes wrong.
+
+    Every step (a day, say) each machine gets a Poisson(`arrivalRate`) number of
+    customers. Customers are served in rounds: round r serves the r-th customer of
+    every machine that has one, all machines at once. A customer picks product 1
+    with probability `product1Share`, wants 1..`maxItems` items, pays the price
+    plus 0..`overpay` extra, each unit in 1-coins with probability `coin1Share`
+    and the rest in 2-coins, feeds the coins in as one burst (the machine keeps
+    what fits), tries to buy, even if some coins didn't fit, and then takes the
+    money back.
+
+    Per machine it records sales, stock-outs (INSUFFICIENT_PRODUCT), change
+    failures (TOO_BIG_CHANGE, UNSUITABLE_CHANGE), coin-box-full events
+    (CANNOT_PERFORM) and the first step with a stock-out. With `refillEvery`
+    set, every machine is restocked, its coin boxes reset to `refillCoins`
+    and its prices set to `prices` every that many steps; with `collectEvery`
+    set, the cash is collected (coin boxes reset to `refillCoins`) every that
+    many steps in between.
+    """
+
+    def __init__(self, machines: int, arrivalRate: float = 10.0, product1Share: float = 0.5,
+                 coin1Share: float = 0.3, maxItems: int = 2, refillEvery: int = None,
+                 refillCoins=(20, 20), prices=(8, 5), collectEvery: int = None, overpay: int = 0,
+                 seed: int = 0):
+        self.fleet = VendingFleet(machines)
+        self.arrivalRate = arrivalRate
+        self.product1Share = product1Share
+        self.coin1Share = coin1Share
+        self.maxItems = maxItems
+        self.refillEvery = refillEvery
+        self.collectEvery = collectEvery
+        self.overpay = overpay
+        self.refillCoins = refillCoins
+        self.prices = prices
+        self.rng = np.random.default_rng(seed)
+        self.step = 0
+        self.stats = {name: np.zeros(machines, dtype=np.int64) for name in
+                      ('customers', 'sales1', 'sales2', 'stockouts', 'tooBigChange', 'unsuitableChange', 'coinBoxFull')}
+        self.stats['firstStockout'] = np.full(machines, -1, dtype=np.int64)
+        self.refill(np.arange(machines))
+
+    def refill(self, indices):
+        self.fleet.enterAdminMode(indices, ADMIN_CODE)
+        self.fleet.fillProducts(indices)
+        self.fleet.fillCoins(indices, *self.refillCoins)
+        self.fleet.setPrices(indices, *self.prices)
+        self.fleet.exitAdminMode(indices)
+
+    # Takes the cash out, leaving `refillCoins` in the boxes for change.
+    def collect(self, indices):
+        self.fleet.enterAdminMode(indices, ADMIN_CODE)
+        self.fleet.fillCoins(indices, *self.refillCoins)
+        self.fleet.exitAdminMode(indices)
+
+    def run(self, steps: int):
+        everyone = np.arange(len(self.fleet))
+        for _ in range(steps):
+            if self.refillEvery and self.step > 0 and self.step % self.refillEvery == 0:
+                self.refill(everyone)
+            elif self.collectEvery and self.step > 0 and self.step % self.collectEvery == 0:
+                self.collect(everyone)
+            arrivals = self.rng.poisson(self.arrivalRate, len(self.fleet))
+            self.stats['customers'] += arrivals
+            for r in range(arrivals.max(initial=0)):
+                self.__serve(np.flatnonzero(arrivals > r))
+            self.step += 1
+        return self.stats
+
+    def __serve(self, idx):
+        fleet, stats, rng = self.fleet, self.stats, self.rng
+        product1 = rng.random(idx.shape[0]) < self.product1Share
+        number = rng.integers(1, self.maxItems + 1, idx.shape[0])
+        needed = number * np.where(product1, fleet.getPrice1(idx), fleet.getPrice2(idx))
+        paid = needed + (rng.integers(0, self.overpay + 1, idx.shape[0]) if self.overpay else 0)
+
+        # Each unit paid is a 1-coin with probability `coin1Share`, the rest is paid in
+        # 2-coins (rounded up, so odd remainders overpay by one).
+        count1 = rng.binomial(paid, self.coin1Share)
+        count2 = (paid - count1 + 1) // 2
+        res = fleet.putCoins(idx, count1, count2)[0]
+        stats['coinBoxFull'][idx[res == VendingMachine.Response.CANNOT_PERFORM]] += 1
+
+        # Everyone tries: a customer short of money because coins didn't fit still
+        # finds out whether the product ran out.
+        for wants1, give, sales in ((True, fleet.giveProduct1, 'sales1'), (False, fleet.giveProduct2, 'sales2')):
+            buyers = product1 == wants1
+            res = give(idx[buyers], number[buyers])
+            sold = idx[buyers][res == VendingMachine.Response.OK]
+            stats[sales][sold] += number[buyers][res == VendingMachine.Response.OK]
+            out = idx[buyers][res == VendingMachine.Response.INSUFFICIENT_PRODUCT]
+            stats['stockouts'][out] += 1
+            first = out[stats['firstStockout'][out] < 0]
+            stats['firstStockout'][first] = self.step
+            stats['tooBigChange'][idx[buyers][res == VendingMachine.Response.TOO_BIG_CHANGE]] += 1
+            stats['unsuitableChange'][idx[buyers][res == VendingMachine.Response.UNSUITABLE_CHANGE]] += 1
+        fleet.returnMoney(idx)
+
+    def summary(self):
+        return {name: int(values.sum()) for name, values in self.stats.items() if name != 'firstStockout'}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo demand simulation for refill planning')
+    parser.add_argument('--machines', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rate', type=float, default=10.0, help='customers per machine per day')
+    parser.add_argument('--refill-every', type=int, default=7, help='days between refill visits')
+    parser.add_argument('--collect-every', type=int, default=1, help='days between cash collections')
+    parser.add_argument('--overpay', type=int, default=3, help='most a customer pays over the price')
+    parser.add_argument('--float', type=int, nargs=2, default=(2, 10), metavar=('C1', 'C2'),
+                        help='coins left in the boxes for change at refills and collections')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sim = DemandSimulator(args.machines, args.rate, refillEvery=args.refill_every, collectEvery=args.collect_every,
+                          refillCoins=args.float, overpay=args.overpay, seed=args.seed)
+    start = time.perf_counter()
+    stats = sim.run(args.days)
+    elapsed = time.perf_counter() - start
+    for name, total in sim.summary().items():
+        print(f"{name:18} {total:14,}")
+    stocked_out = stats['firstStockout'] >= 0
+    if stocked_out.any():
+        print(f"{'firstStockout':18} median day {int(np.median(stats['firstStockout'][stocked_out]))} "
+              f"({stocked_out.mean():.0%} of machines)")
+    print(f"{args.machines:,} machines x {args.days} days in {elapsed:.1f} s")
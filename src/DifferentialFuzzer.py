@@ -0,0 +1,251 @@
+# Differential fuzzing of VendingMachine against a small reference model of the spec.
+# Usage: python src/DifferentialFuzzer.py [--sequences N] [--length N] [--workers N] [--seed N]
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import sys
+import time
+
+from VendingMachine import VendingMachine
+
+ADMIN_CODE = 117345294655382
+
+
+class ReferenceMachine:
+    """Straightforward model of the spec for the default two-product, (1, 2)-coin machine."""
+
+    def __init__(self):
+        self.mode = VendingMachine.Mode.OPERATION
+        self.num = [0, 0]
+        self.max = [30, 40]
+        self.price = [8, 5]
+        self.coins = [0, 0]
+        self.maxc = [50, 50]
+        self.balance = 0
+
+    def getters(self):
+        admin = self.mode == VendingMachine.Mode.ADMINISTERING
+        return (self.num[0], self.num[1], self.balance, self.mode,
+                self.coins[0] + 2 * self.coins[1] if admin else 0,
+                self.coins[0] if admin else 0, self.coins[1] if admin else 0,
+                self.price[0], self.price[1])
+
+    def enterAdminMode(self, code):
+        if code != ADMIN_CODE:
+            return VendingMachine.Response.INVALID_PARAM
+        if self.balance != 0:
+            return VendingMachine.Response.CANNOT_PERFORM
+        self.mode = VendingMachine.Mode.ADMINISTERING
+        return VendingMachine.Response.OK
+
+    def exitAdminMode(self):
+        self.mode = VendingMachine.Mode.OPERATION
+
+    def fillProducts(self):
+        if self.mode != VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        self.num = list(self.max)
+        return VendingMachine.Response.OK
+
+    def fillCoins(self, c1, c2):
+        if self.mode != VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if not (0 < c1 <= self.maxc[0] and 0 < c2 <= self.maxc[1]):
+            return VendingMachine.Response.INVALID_PARAM
+        self.coins = [c1, c2]
+        return VendingMachine.Response.OK
+
+    def setPrices(self, p1, p2):
+        if self.mode != VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if p1 <= 0 or p2 <= 0:
+            return VendingMachine.Response.INVALID_PARAM
+        self.price = [p1, p2]
+        return VendingMachine.Response.OK
+
+    def putCoin1(self):
+        return self.__put(0, 1)
+
+    def putCoin2(self):
+        return self.__put(1, 2)
+
+    def returnMoney(self):
+        if self.mode != VendingMachine.Mode.OPERATION:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        res = self.__pay(self.balance)
+        if res == VendingMachine.Response.OK:
+            self.balance = 0
+        return res
+
+    def giveProduct1(self, number):
+        return self.__give(0, number)
+
+    def giveProduct2(self, number):
+        return self.__give(1, number)
+
+    def __put(self, i, value):
+        if self.mode != VendingMachine.Mode.OPERATION:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if self.coins[i] == self.maxc[i]:
+            return VendingMachine.Response.CANNOT_PERFORM
+        self.coins[i] += 1
+        self.balance += value
+        return VendingMachine.Response.OK
+
+    def __give(self, i, number):
+        if self.mode != VendingMachine.Mode.OPERATION:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if not 0 < number <= self.max[i]:
+            return VendingMachine.Response.INVALID_PARAM
+        if number > self.num[i]:
+            return VendingMachine.Response.INSUFFICIENT_PRODUCT
+        change = self.balance - number * self.price[i]
+        if change < 0:
+            return VendingMachine.Response.INSUFFICIENT_MONEY
+        res = self.__pay(change)
+        if res == VendingMachine.Response.OK:
+            self.balance = 0
+            self.num[i] -= number
+        return res
+
+    # Fewest coins: as many 2s as possible, the rest in 1s.
+    def __pay(self, amount):
+        if amount > self.coins[0] + 2 * self.coins[1]:
+            return VendingMachine.Response.TOO_BIG_CHANGE
+        twos = min(self.coins[1], amount // 2)
+        ones = amount - 2 * twos
+        if ones > self.coins[0]:
+            return VendingMachine.Response.UNSUITABLE_CHANGE
+        self.coins = [self.coins[0] - ones, self.coins[1] - twos]
+        return VendingMachine.Response.OK
+
+
+def machine_getters(machine: VendingMachine):
+    return (machine.getNumberOfProduct1(), machine.getNumberOfProduct2(), machine.getCurrentBalance(),
+            machine.getCurrentMode(), machine.getCurrentSum(), machine.getCoins1(), machine.getCoins2(),
+            machine.getPrice1(), machine.getPrice2())
+
+
+# Random operation sequence as a list of (method name, args). The weights keep customers
+# busy most of the time with regular admin visits in between.
+def generate(rng: random.Random, length: int):
+    ops = []
+    for _ in range(length):
+        r = rng.random()
+        if r < 0.25:
+            ops.append(('putCoin1', ()))
+        elif r < 0.50:
+            ops.append(('putCoin2', ()))
+        elif r < 0.60:
+            ops.append(('returnMoney', ()))
+        elif r < 0.70:
+            ops.append(('giveProduct1', (rng.randint(-1, 4),)))
+        elif r < 0.80:
+            ops.append(('giveProduct2', (rng.randint(-1, 4),)))
+        elif r < 0.85:
+            ops.append(('enterAdminMode', (ADMIN_CODE if rng.random() < 0.9 else rng.randint(0, 10),)))
+        elif r < 0.90:
+            ops.append(('exitAdminMode', ()))
+        elif r < 0.93:
+            ops.append(('fillProducts', ()))
+        elif r < 0.97:
+            ops.append(('fillCoins', (rng.randint(0, 51), rng.randint(0, 51))))
+        else:
+            ops.append(('setPrices', (rng.randint(0, 10), rng.randint(0, 10))))
+    return ops
+
+
+# Runs `ops` on both models; returns (step, what, machine value, reference value) of the
+# first disagreement, or None.
+def check(ops, factory=VendingMachine):
+    machine, reference = factory(), ReferenceMachine()
+    for step, (name, args) in enumerate(ops):
+        got, expected = getattr(machine, name)(*args), getattr(reference, name)(*args)
+        if got != expected:
+            return step, name, got, expected
+        got, expected = machine_getters(machine), reference.getters()
+        if got != expected:
+            return step, 'getters', got, expected
+    return None
+
+
+def _fuzz_chunk(seed: int, first: int, count: int, length: int, factory):
+    for index in range(first, first + count):
+        ops = generate(random.Random(seed * 1_000_003 + index), length)
+        if check(ops, factory) is not None:
+            return index, ops
+    return None
+
+
+# Shrinks a failing sequence to a minimal one: drops chunks, then single ops, then
+# pulls arguments towards small values, as long as it still fails.
+def shrink(ops, factory=VendingMachine):
+    ops = list(ops)
+    chunk = len(ops) // 2
+    while chunk >= 1:
+        i = 0
+        while i < len(ops):
+            candidate = ops[:i] + ops[i + chunk:]
+            if check(candidate, factory) is not None:
+                ops = candidate
+            else:
+                i += chunk
+        chunk //= 2
+    for i, (name, args) in enumerate(ops):
+        for j, arg in enumerate(args):
+            for smaller in sorted({0, 1, arg // 2, arg - 1}, key=abs):
+                if abs(smaller) >= abs(arg):
+                    continue
+                candidate = ops[:i] + [(name, args[:j] + (smaller,) + args[j + 1:])] + ops[i + 1:]
+                if check(candidate, factory) is not None:
+                    ops, args = candidate, candidate[i][1]
+                    break
+    return ops
+
+
+# Fuzzes `sequences` random sequences over a process pool. Returns None if everything
+# agrees, otherwise the index of the first failing sequence found and its shrunk form.
+def fuzz(sequences: int, length: int = 50, seed: int = 0, workers: int = None, factory=VendingMachine,
+         chunk: int = 2000):
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed, first, min(chunk, sequences - first), length, factory) for first in range(0, sequences, chunk)]
+    if workers == 1:
+        results = (_fuzz_chunk(*job) for job in jobs)
+        failure = next((r for r in results if r is not None), None)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_fuzz_chunk, *job) for job in jobs]
+            failure = None
+            for future in futures:
+                failure = future.result()
+                if failure is not None:
+                    for rest in futures:
+                        rest.cancel()
+                    break
+    if failure is None:
+        return None
+    index, ops = failure
+    return index, shrink(ops, factory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Differential fuzzing of VendingMachine')
+    parser.add_argument('--sequences', type=int, default=1_000_000)
+    parser.add_argument('--length', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    failure = fuzz(args.sequences, args.length, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    if failure is None:
+        print(f"{args.sequences:,} sequences x {args.length} ops agree ({elapsed:.1f} s)")
+        sys.exit(0)
+    index, ops = failure
+    print(f"sequence {index} disagrees, minimal reproducer ({len(ops)} ops):")
+    for name, op_args in ops:
+        print(f"  machine.{name}({', '.join(map(str, op_args))})")
+    print(f"  -> {check(ops)}")
+    sys.exit(1)
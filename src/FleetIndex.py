@@ -0,0 +1,109 @@
+from bisect import bisect_left, insort
+
+from VendingMachine import VendingMachine
+
+
+class FleetIndex:
+    """Secondary indexes answering range queries over a fleet in O(result size).
+
+    For each indexed field (the products in slots 1 and 2, the coins of kinds 1
+    and 2, and the open balance) machines are kept in buckets by their current
+    value, and the values of non-empty buckets in a sorted list. A query bisects
+    that list for its range and reads only buckets with machines in them.
+
+    Registering a machine wraps its state-changing methods on the instance, like
+    FleetRegistry: after every call that changed the machine it is re-read and
+    moved between buckets of the fields that changed. State changed behind the
+    public methods (_setState(), unpack_from()) is not seen; call refresh().
+    """
+
+    FIELDS = ('product1', 'product2', 'coins1', 'coins2', 'balance')
+
+    # setPrices()/setPrice() change no indexed field; rollback() re-reads the machine.
+    _TRACKED = tuple(name for name in VendingMachine._MUTATORS if name not in ('setPrices', 'setPrice')) + \
+        ('rollback',)
+
+    def __init__(self, machines=()):
+        self.machines = []
+        # Per machine, its indexed values in FIELDS order.
+        self.__values = []
+        self.__previous = []
+        # Per field: {value: set of machine indices} and the sorted values with a bucket.
+        self.__buckets = [{} for _ in FleetIndex.FIELDS]
+        self.__keys = [[] for _ in FleetIndex.FIELDS]
+        for machine in machines:
+            self.add(machine)
+
+    def __len__(self):
+        return len(self.machines)
+
+    # Registers a machine and returns its index in the fleet index.
+    def add(self, machine: VendingMachine):
+        index = len(self.machines)
+        self.machines.append(machine)
+        self.__values.append(None)
+        self.__previous.append({name: machine.__dict__[name] for name in FleetIndex._TRACKED
+                                if name in machine.__dict__})
+        self.__update(index)
+        for name in FleetIndex._TRACKED:
+            setattr(machine, name, self.__wrap(index, getattr(machine, name)))
+        return index
+
+    def __wrap(self, index: int, method):
+        update = self.__update
+
+        def tracked(*args, **kwargs):
+            res = method(*args, **kwargs)
+            # putCoins() may keep coins even when it doesn't answer OK.
+            if res == VendingMachine.Response.OK or res is None or type(res) is tuple:
+                update(index)
+            return res
+        return tracked
+
+    def __update(self, index: int):
+        _, balance, _, num, coins = self.machines[index]._getState()
+        values = (num[0], num[1], coins[0], coins[1], balance)
+        old = self.__values[index]
+        for field, value in enumerate(values):
+            if old is not None and old[field] == value:
+                continue
+            buckets, keys = self.__buckets[field], self.__keys[field]
+            if old is not None:
+                bucket = buckets[old[field]]
+                bucket.discard(index)
+                if not bucket:
+                    del buckets[old[field]]
+                    del keys[bisect_left(keys, old[field])]
+            bucket = buckets.get(value)
+            if bucket is None:
+                bucket = buckets[value] = set()
+                insort(keys, value)
+            bucket.add(index)
+        self.__values[index] = values
+
+    # Re-reads machine `index`, or every machine, after changes the wrappers didn't see.
+    def refresh(self, index: int = None):
+        for i in range(len(self.machines)) if index is None else (index,):
+            self.__update(i)
+
+    # Indices of the machines whose `field` is in [low, high) (no upper bound if high
+    # is None), by increasing value. Raises ValueError for a field that isn't indexed.
+    def query(self, field: str, low: int = 0, high: int = None):
+        if field not in FleetIndex.FIELDS:
+            raise ValueError(f"no index on {field!r}; indexed fields are {FleetIndex.FIELDS}")
+        f = FleetIndex.FIELDS.index(field)
+        buckets, keys = self.__buckets[f], self.__keys[f]
+        end = len(keys) if high is None else bisect_left(keys, high)
+        result = []
+        for value in keys[bisect_left(keys, low):end]:
+            result.extend(buckets[value])
+        return result
+
+    # Unregisters every machine, putting back whatever the wrappers replaced.
+    def close(self):
+        for machine, previous in zip(self.machines, self.__previous):
+            for name in FleetIndex._TRACKED:
+                if name in previous:
+                    setattr(machine, name, previous[name])
+                else:
+                    machine.__dict__.pop(name, None)
@@ -0,0 +1,169 @@
+from VendingMachine import VendingMachine
+
+
+class FleetRegistry:
+    """Running fleet-wide totals, answered in O(1) whatever the fleet size.
+
+    Registering a machine wraps its state-changing methods on the instance; after
+    every successful call the registry applies that one machine's change to the
+    totals: cash in the coin boxes, open balance, machines in admin mode, and per
+    product slot the items in stock and the machines that ran out. Coins in and
+    money returned are applied directly, other calls re-read the machine. Failing
+    calls change nothing and are not looked at, except that a partly rejected
+    putCoins() burst still counts the coins it accepted.
+
+    State changed behind the public methods (_setState(), unpack_from()) is not
+    seen; call refresh() afterwards.
+    """
+
+    # setPrices()/setPrice() change nothing the registry totals up; rollback() re-reads
+    # the machine, so undone transactions leave the totals right.
+    _TRACKED = tuple(name for name in VendingMachine._MUTATORS if name not in ('setPrices', 'setPrice')) + \
+        ('rollback',)
+
+    def __init__(self, machines=()):
+        self.machines = []
+        self.__coinvals = []
+        # Per machine, what it last added to the totals: (cash, balance, admin, products).
+        self.__counted = []
+        self.__previous = []
+        self.__cash = 0
+        self.__balance = 0
+        self.__admin = 0
+        self.__products = []
+        self.__empty = []
+        for machine in machines:
+            self.add(machine)
+
+    def __len__(self):
+        return len(self.machines)
+
+    # Registers a machine and returns its index in the registry.
+    def add(self, machine: VendingMachine):
+        index = len(self.machines)
+        self.machines.append(machine)
+        self.__coinvals.append(machine.getCoinValues())
+        self.__counted.append(None)
+        self.__previous.append({name: machine.__dict__[name] for name in FleetRegistry._TRACKED
+                                if name in machine.__dict__})
+        self.__account(index)
+        for name in FleetRegistry._TRACKED:
+            setattr(machine, name, self.__wrap(index, name, getattr(machine, name)))
+        return index
+
+    def __wrap(self, index: int, name: str, method):
+        account = self.__account
+        if name in ('putCoin1', 'putCoin2', 'putCoin'):
+            return self.__wrapCoin(index, name, method)
+        if name == 'returnMoney':
+            return self.__wrapReturn(index, method)
+        if name == 'putCoins':
+            return self.__wrapBurst(index, method)
+
+        def tracked(*args, **kwargs):
+            res = method(*args, **kwargs)
+            if res == VendingMachine.Response.OK or res is None:
+                account(index)
+            return res
+        return tracked
+
+    # A coin taken in adds its value to cash and balance and nothing else, so the hottest
+    # calls skip re-reading the machine.
+    def __wrapCoin(self, index: int, name: str, method):
+        coinvals = self.__coinvals[index]
+        fixed = {'putCoin1': coinvals[0], 'putCoin2': coinvals[1]}.get(name)
+
+        def tracked(*args, **kwargs):
+            res = method(*args, **kwargs)
+            if res == VendingMachine.Response.OK:
+                value = fixed if fixed is not None else coinvals[(args[0] if args else kwargs['kind']) - 1]
+                cash, balance, admin, num = self.__counted[index]
+                self.__counted[index] = (cash + value, balance + value, admin, num)
+                self.__cash += value
+                self.__balance += value
+            return res
+        return tracked
+
+    # A burst adds the value of the coins accepted, even when some were rejected.
+    def __wrapBurst(self, index: int, method):
+        coinvals = self.__coinvals[index]
+
+        def tracked(*counts, **kwargs):
+            res = method(*counts, **kwargs)
+            value = sum(taken * coinval for taken, coinval in zip(res[1], coinvals))
+            if value:
+                cash, balance, admin, num = self.__counted[index]
+                self.__counted[index] = (cash + value, balance + value, admin, num)
+                self.__cash += value
+                self.__balance += value
+            return res
+        return tracked
+
+    # Returning money pays out exactly the open balance.
+    def __wrapReturn(self, index: int, method):
+        def tracked():
+            res = method()
+            if res == VendingMachine.Response.OK:
+                cash, balance, admin, num = self.__counted[index]
+                self.__counted[index] = (cash - balance, 0, admin, num)
+                self.__cash -= balance
+                self.__balance -= balance
+            return res
+        return tracked
+
+    def __account(self, index: int):
+        mode, balance, _, num, coins = self.machines[index]._getState()
+        cash = sum(count * value for count, value in zip(coins, self.__coinvals[index]))
+        admin = mode == VendingMachine.Mode.ADMINISTERING
+        counted = self.__counted[index]
+        if counted is None:
+            counted = (0, 0, False, (0,) * len(num))
+            while len(self.__products) < len(num):
+                self.__products.append(0)
+                self.__empty.append(0)
+            for slot, n in enumerate(num):
+                self.__empty[slot] += n == 0
+        else:
+            for slot, (n, was) in enumerate(zip(num, counted[3])):
+                self.__empty[slot] += (n == 0) - (was == 0)
+        self.__cash += cash - counted[0]
+        self.__balance += balance - counted[1]
+        self.__admin += admin - counted[2]
+        for slot, (n, was) in enumerate(zip(num, counted[3])):
+            self.__products[slot] += n - was
+        self.__counted[index] = (cash, balance, admin, num)
+
+    # Re-reads machine `index`, or every machine, after changes the wrappers didn't see.
+    def refresh(self, index: int = None):
+        for i in range(len(self.machines)) if index is None else (index,):
+            self.__account(i)
+
+    def getTotalCash(self):
+        return self.__cash
+
+    def getTotalBalance(self):
+        return self.__balance
+
+    def getMachinesInAdminMode(self):
+        return self.__admin
+
+    # Items in stock in product slot `slot` (1-based) across machines that have it.
+    def getTotalProducts(self, slot: int):
+        if slot < 1 or slot > len(self.__products):
+            return 0
+        return self.__products[slot - 1]
+
+    # Machines with product slot `slot` (1-based) empty.
+    def getMachinesOutOfProduct(self, slot: int):
+        if slot < 1 or slot > len(self.__empty):
+            return 0
+        return self.__empty[slot - 1]
+
+    # Unregisters every machine, putting back whatever the wrappers replaced.
+    def close(self):
+        for machine, previous in zip(self.machines, self.__previous):
+            for name in FleetRegistry._TRACKED:
+                if name in previous:
+                    setattr(machine, name, previous[name])
+                else:
+                    machine.__dict__.pop(name, None)
@@ -0,0 +1,209 @@
+from bisect import bisect, insort
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import time
+
+from VendingMachine import VendingMachine
+
+
+# Stable 64-bit hash of a machine id or virtual node; Python's hash() of str differs per process.
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent-hash ring mapping machine ids to worker nodes.
+
+    Every node sits on the ring at `replicas` pseudo-random points (virtual
+    nodes); a key belongs to the first point at or after its own hash, found by
+    bisection. Adding a node only takes over the keys that now fall just before
+    its points, about 1/(n + 1) of them, and removing one hands its keys to the
+    next points along the ring.
+    """
+
+    def __init__(self, nodes=(), replicas: int = 64):
+        if replicas <= 0:
+            raise ValueError("replicas must be positive")
+        self.replicas = replicas
+        self.__points = []
+        self.__owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.__owners) // self.replicas
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash((node, i))
+            if point in self.__owners:
+                raise ValueError(f"node {node!r} collides with a point already on the ring")
+            self.__owners[point] = node
+            insort(self.__points, point)
+
+    def remove(self, node):
+        points = [point for point, owner in self.__owners.items() if owner == node]
+        if not points:
+            raise ValueError(f"node {node!r} is not on the ring")
+        for point in points:
+            del self.__owners[point]
+        self.__points = [point for point in self.__points if point in self.__owners]
+
+    def owner(self, key):
+        if not self.__points:
+            raise ValueError("the ring has no nodes")
+        i = bisect(self.__points, _hash(key))
+        return self.__owners[self.__points[i % len(self.__points)]]
+
+
+# Worker process state: its machines by id and [batches, ops, busy ns].
+_machines = {}
+_counters = [0, 0, 0]
+_config = {}
+
+
+def _init(config: dict):
+    _config.update(config)
+
+
+def _apply(batches):
+    t0 = time.perf_counter_ns()
+    results = []
+    for machineId, ops in batches:
+        machine = _machines.get(machineId)
+        if machine is None:
+            machine = _machines[machineId] = VendingMachine(**_config)
+        results.append(machine.apply_batch(ops))
+        _counters[1] += len(results[-1])
+    _counters[0] += len(batches)
+    _counters[2] += time.perf_counter_ns() - t0
+    return results
+
+
+# Ids whose first batch failed were never created and are skipped.
+def _export(ids):
+    return {machineId: _machines.pop(machineId).to_bytes() for machineId in ids if machineId in _machines}
+
+
+def _import(packed: dict):
+    for machineId, data in packed.items():
+        _machines[machineId] = VendingMachine.from_buffer(data)
+
+
+def _snapshot(ids):
+    return {machineId: _machines[machineId].to_bytes() for machineId in ids if machineId in _machines}
+
+
+def _stats():
+    return {'machines': len(_machines), 'batches': _counters[0], 'ops': _counters[1], 'busy_ns': _counters[2]}
+
+
+class FleetScheduler:
+    """Runs VendingMachines across worker processes, sharded by machine id.
+
+    Each worker is a process of its own that keeps the machines it owns; a
+    HashRing over the machine ids decides the owner. run() routes every
+    apply_batch() batch to the owner of its machine, one task per worker, and
+    gathers the responses back in order. A machine is created with `config` on
+    its first batch.
+
+    The ids are the caller's (serial numbers, LogReplay ids, ...): every
+    VendingMachine carries the same admin code, so nothing inside a machine
+    tells machines apart. Adding or removing a worker moves only the machines
+    whose owner changes, as packed state (to_bytes()/from_buffer()).
+    """
+
+    def __init__(self, workers: int = 2, replicas: int = 64, **config):
+        if workers <= 0:
+            raise ValueError("need at least one worker")
+        self.config = config
+        self.ring = HashRing(replicas=replicas)
+        self.__pools = {}
+        # Owning worker of every machine created so far.
+        self.__owners = {}
+        self.__next = 0
+        for _ in range(workers):
+            self.addWorker()
+
+    def __len__(self):
+        return len(self.__owners)
+
+    @property
+    def workers(self):
+        return list(self.__pools)
+
+    # Starts a worker and moves the machines it now owns over to it. Returns its node id.
+    def addWorker(self):
+        node = self.__next
+        self.__next += 1
+        self.__pools[node] = ProcessPoolExecutor(1, initializer=_init, initargs=(self.config,))
+        self.ring.add(node)
+        self.__rebalance()
+        return node
+
+    # Moves the machines of worker `node` to the others and stops it.
+    def removeWorker(self, node):
+        if node not in self.__pools:
+            raise ValueError(f"no worker {node!r}")
+        if len(self.__pools) == 1:
+            raise ValueError("can't remove the last worker")
+        self.ring.remove(node)
+        self.__rebalance()
+        self.__pools.pop(node).shutdown()
+
+    # Moves every machine whose owner on the ring changed, exports and imports running
+    # on all affected workers at once.
+    def __rebalance(self):
+        moves = {}
+        for machineId, node in self.__owners.items():
+            owner = self.ring.owner(machineId)
+            if owner != node:
+                moves.setdefault((node, owner), []).append(machineId)
+        exports = {pair: self.__pools[pair[0]].submit(_export, ids) for pair, ids in moves.items()}
+        imports = [self.__pools[new].submit(_import, future.result()) for (_, new), future in exports.items()]
+        for future in imports:
+            future.result()
+        for (_, new), ids in moves.items():
+            for machineId in ids:
+                self.__owners[machineId] = new
+
+    # Runs (machine id, ops) pairs, ops as taken by apply_batch(); a mapping of id to ops
+    # works too. Batches of one machine run in the given order. Returns the responses
+    # of each batch in the same order.
+    def run(self, batches):
+        batches = list(batches.items() if hasattr(batches, 'items') else batches)
+        routed = {}
+        for position, (machineId, ops) in enumerate(batches):
+            node = self.__owners.get(machineId)
+            if node is None:
+                node = self.__owners[machineId] = self.ring.owner(machineId)
+            positions, work = routed.setdefault(node, ([], []))
+            positions.append(position)
+            work.append((machineId, ops))
+        futures = [(positions, self.__pools[node].submit(_apply, work)) for node, (positions, work) in routed.items()]
+        results = [None] * len(batches)
+        for positions, future in futures:
+            for position, result in zip(positions, future.result()):
+                results[position] = result
+        return results
+
+    # The machines with the given ids (all of them by default) as local copies.
+    def collect(self, ids=None):
+        wanted = {}
+        for machineId in (self.__owners if ids is None else ids):
+            wanted.setdefault(self.__owners[machineId], []).append(machineId)
+        futures = [self.__pools[node].submit(_snapshot, machineIds) for node, machineIds in wanted.items()]
+        machines = {}
+        for future in futures:
+            machines.update({machineId: VendingMachine.from_buffer(data) for machineId, data in future.result().items()})
+        return machines
+
+    # Worker counters: {node: {'machines', 'batches', 'ops', 'busy_ns'}}.
+    def get_stats(self):
+        futures = {node: pool.submit(_stats) for node, pool in self.__pools.items()}
+        return {node: future.result() for node, future in futures.items()}
+
+    def close(self):
+        for pool in self.__pools.values():
+            pool.shutdown()
+        self.__pools.clear()
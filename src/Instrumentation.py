@@ -0,0 +1,98 @@
+import time
+from types import FunctionType
+
+from VendingMachine import VendingMachine
+
+
+class Instrumentation:
+    """Opt-in per-method statistics of one VendingMachine.
+
+    Attaching wraps the machine's public methods on the instance only, so machines
+    that are not instrumented run the plain class methods and pay nothing. For every
+    method it counts calls, sums their wall time and sorts each latency into a fixed
+    log-scale histogram: bucket 0 holds calls that took 0 ns, bucket k calls that
+    took [2**(k-1), 2**k) ns, and the last bucket everything slower. For methods
+    returning Response codes it also counts each code (the response of putCoins()).
+
+    The counters are not locked; on a ConcurrentVendingMachine shared between
+    threads an occasional increment may be lost.
+    """
+
+    BUCKETS = 32
+    # Exclusive upper bound in ns of each histogram bucket (the last one is open).
+    BUCKET_BOUNDS = tuple(2 ** k for k in range(BUCKETS - 1)) + (None,)
+
+    _RESPONSE_NAMES = {value: name for name, value in vars(VendingMachine.Response).items()
+                       if not name.startswith('_')}
+
+    # Public instance methods, in definition order.
+    METHODS = tuple(name for name, value in vars(VendingMachine).items()
+                    if isinstance(value, FunctionType) and not name.startswith('_'))
+
+    def __init__(self, machine: VendingMachine, methods=None):
+        self.__machine = machine
+        self.__methods = tuple(methods) if methods is not None else Instrumentation.METHODS
+        unknown = set(self.__methods).difference(Instrumentation.METHODS)
+        if unknown:
+            raise ValueError(f"not public VendingMachine methods: {sorted(unknown)}")
+        self.__stats = {}
+        # Instance attributes the wrappers replace (e.g. a Journal's), put back by close().
+        self.__previous = {}
+        for name in self.__methods:
+            if name in machine.__dict__:
+                self.__previous[name] = machine.__dict__[name]
+            setattr(machine, name, self.__wrap(name, getattr(machine, name)))
+
+    def __wrap(self, name: str, method):
+        # [calls, total ns, histogram, responses or None]
+        stat = self.__stats[name] = [0, 0, [0] * Instrumentation.BUCKETS,
+                                     {} if name in VendingMachine._MUTATORS else None]
+        histogram, responses = stat[2], stat[3]
+        clock = time.perf_counter_ns
+        last = Instrumentation.BUCKETS - 1
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            res = method(*args, **kwargs)
+            ns = clock() - t0
+            stat[0] += 1
+            stat[1] += ns
+            histogram[min(ns.bit_length(), last)] += 1
+            if responses is not None and res is not None:
+                code = res[0] if type(res) is tuple else res
+                responses[code] = responses.get(code, 0) + 1
+            return res
+        return timed
+
+    # Snapshot of the counters: {method: {'calls', 'total_ns', 'mean_ns', 'histogram',
+    # 'responses'}} for every method called at least once. 'histogram' holds one count
+    # per bucket (see BUCKET_BOUNDS), 'responses' maps Response names to counts.
+    def get_stats(self):
+        stats = {}
+        for name, (calls, total, histogram, responses) in self.__stats.items():
+            if not calls:
+                continue
+            stats[name] = {
+                'calls': calls,
+                'total_ns': total,
+                'mean_ns': total / calls,
+                'histogram': list(histogram),
+                'responses': {Instrumentation._RESPONSE_NAMES.get(res, res): count
+                              for res, count in (responses or {}).items()},
+            }
+        return stats
+
+    def reset(self):
+        for stat in self.__stats.values():
+            stat[0] = stat[1] = 0
+            stat[2][:] = [0] * Instrumentation.BUCKETS
+            if stat[3] is not None:
+                stat[3].clear()
+
+    # Stops collecting and puts back whatever the wrappers replaced.
+    def close(self):
+        for name in self.__methods:
+            if name in self.__previous:
+                setattr(self.__machine, name, self.__previous[name])
+            else:
+                self.__machine.__dict__.pop(name, None)
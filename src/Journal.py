@@ -0,0 +1,267 @@
+import inspect
+import mmap
+import os
+import struct
+
+from VendingMachine import VendingMachine
+
+
+class Journal:
+    """Append-only binary log of the successful mutating calls of one VendingMachine.
+
+    The file starts with a header followed by fixed-width records: an opcode byte,
+    padding and as many little-endian int64 arguments as the widest call of the
+    machine needs (fillCoins() takes one per coin kind, setPrices() one per slot,
+    giveProducts() is stored as the number bought from each slot, putCoins() as
+    the coins it accepted).
+    Every `snapshotEvery` records the machine state is written to `<path>.snap`
+    together with the number of records it covers, so recover() only has to
+    replay the records after it.
+
+    Records go through a buffered file; call flush() to push them to the OS.
+
+    Inside a machine transaction (begin() ... commit()) records are held back and
+    written at commit(); rollback() drops the ones it undoes, so the file only
+    ever holds committed calls.
+
+    A state installed wholesale (unpack_from(), _setState(), restore_fleet()) is
+    not a call that can be replayed, so it is written as a snapshot right away;
+    installing one inside a transaction raises ValueError.
+    """
+
+    _HEADER = struct.Struct('<4sHHH')
+    _MAGIC = b'VMJ1'
+    _SNAPSHOT_HEADER = struct.Struct('<4sQ')
+    _SNAPSHOT_MAGIC = b'VMS1'
+    # Methods that replace the whole state instead of making a call.
+    _INSTALLERS = ('unpack_from', '_setState')
+
+    # Number of arguments of each opcode; None means one per coin kind or product slot.
+    _ARITY = {
+        VendingMachine.Op.PUT_COIN1: 0,
+        VendingMachine.Op.PUT_COIN2: 0,
+        VendingMachine.Op.RETURN_MONEY: 0,
+        VendingMachine.Op.GIVE_PRODUCT1: 1,
+        VendingMachine.Op.GIVE_PRODUCT2: 1,
+        VendingMachine.Op.ENTER_ADMIN_MODE: 1,
+        VendingMachine.Op.EXIT_ADMIN_MODE: 0,
+        VendingMachine.Op.FILL_PRODUCTS: 0,
+        VendingMachine.Op.PUT_COIN: 1,
+        VendingMachine.Op.GIVE_PRODUCT: 2,
+        VendingMachine.Op.FILL_COINS: None,
+        VendingMachine.Op.SET_PRICES: None,
+        VendingMachine.Op.SET_PRICE: 2,
+        VendingMachine.Op.GIVE_PRODUCTS: None,
+        VendingMachine.Op.PUT_COINS: None,
+    }
+
+    def __init__(self, path: str, machine: VendingMachine, snapshotEvery: int = 10000):
+        self.path = path
+        self.snapshotEvery = snapshotEvery
+        self.__machine = machine
+        self.__record = Journal._recordFormat(machine)
+        # Records of the open transaction as (machine savepoint after the call, record).
+        self.__pending = None
+        self.__file = open(path, 'ab')
+        if self.__file.tell() == 0:
+            self.__file.write(Journal._HEADER.pack(Journal._MAGIC, self.__record.size,
+                                                   len(machine.getCoinValues()), machine.getNumberOfSlots()))
+            self.__count = 0
+        else:
+            Journal._checkHeader(path, self.__record)
+            self.__count = (self.__file.tell() - Journal._HEADER.size) // self.__record.size
+            # Cut off a torn record left by a crash so new records stay aligned.
+            self.__file.truncate(Journal._HEADER.size + self.__count * self.__record.size)
+        self.__attach()
+
+    @staticmethod
+    def _recordFormat(machine: VendingMachine):
+        width = max(2, len(machine.getCoinValues()), machine.getNumberOfSlots())
+        return struct.Struct('<B7x' + 'q' * width)
+
+    @staticmethod
+    def _checkHeader(path: str, record: struct.Struct):
+        with open(path, 'rb') as f:
+            magic, size, _, _ = Journal._HEADER.unpack(f.read(Journal._HEADER.size))
+        if magic != Journal._MAGIC or size != record.size:
+            raise ValueError(f"{path} is not a journal of a machine with this configuration")
+
+    def __len__(self):
+        return self.__count
+
+    def __attach(self):
+        machine = self.__machine
+        for name, op in VendingMachine._MUTATORS.items():
+            setattr(machine, name, self.__wrap(name, getattr(machine, name), op))
+        begin, commit, rollback = machine.begin, machine.commit, machine.rollback
+        self.__savepoint = machine.savepoint
+
+        def begun():
+            begin()
+            self.__pending = []
+
+        def committed():
+            commit()
+            pending, self.__pending = self.__pending, None
+            self.__appendAll([record for _, record in pending])
+
+        # A call that changed nothing after `savepoint` sits exactly at it and is kept;
+        # it changes nothing there either.
+        def rolledBack(savepoint=None):
+            rollback(savepoint)
+            if savepoint is None:
+                self.__pending = None
+                return
+            pending = self.__pending
+            while pending and pending[-1][0] > savepoint:
+                pending.pop()
+        machine.begin, machine.commit, machine.rollback = begun, committed, rolledBack
+        for name in Journal._INSTALLERS:
+            setattr(machine, name, self.__wrapInstall(getattr(machine, name)))
+
+    def __wrapInstall(self, method):
+        def installed(*args, **kwargs):
+            if self.__pending is not None:
+                raise ValueError("can't install a state inside a journaled transaction")
+            res = method(*args, **kwargs)
+            self.snapshot()
+            return res
+        return installed
+
+    def __wrap(self, name: str, method, op):
+        pack = self.__record.pack
+        width = (self.__record.size - 8) // 8
+        padding = (0,) * width
+        if op == VendingMachine.Op.GIVE_PRODUCTS:
+            return self.__wrapCart(method, pack, padding)
+        if op == VendingMachine.Op.PUT_COINS:
+            return self.__wrapCoins(method, pack, padding)
+
+        # Keyword arguments are put in place by the signature of the machine's own method.
+        bind = inspect.signature(getattr(type(self.__machine), name)).bind
+
+        def logged(*args, **kwargs):
+            if kwargs:
+                args = bind(None, *args, **kwargs).args[1:]
+            # Packing first keeps the state untouched if an argument doesn't fit into int64.
+            record = pack(op, *(args + padding)[:width])
+            res = method(*args)
+            if res == VendingMachine.Response.OK or res is None:
+                self.__append(record)
+            return res
+        return logged
+
+    def __wrapCart(self, method, pack, padding):
+        slots = self.__machine.getNumberOfSlots()
+
+        def logged(cart):
+            items = VendingMachine._cartItems(cart)
+            counts = [0] * slots
+            for slot, number in items:
+                if 1 <= slot <= slots:
+                    counts[slot - 1] += number
+            record = pack(VendingMachine.Op.GIVE_PRODUCTS, *(tuple(counts) + padding)[:len(padding)])
+            res = method(items)
+            if res == VendingMachine.Response.OK:
+                self.__append(record)
+            return res
+        return logged
+
+    # A partly rejected burst still takes coins, so the coins accepted are logged
+    # whatever the response; replaying them fits the coin boxes exactly.
+    def __wrapCoins(self, method, pack, padding):
+        def logged(*counts, **kwargs):
+            res = method(*counts, **kwargs)
+            if any(res[1]):
+                self.__append(pack(VendingMachine.Op.PUT_COINS, *(res[1] + padding)[:len(padding)]))
+            return res
+        return logged
+
+    def __append(self, record: bytes):
+        if self.__pending is not None:
+            self.__pending.append((self.__savepoint(), record))
+            return
+        self.__file.write(record)
+        self.__count += 1
+        if self.snapshotEvery and self.__count % self.snapshotEvery == 0:
+            self.snapshot()
+
+    # Writes the records of a committed transaction; one snapshot at most, taken after
+    # the last of them so it matches the machine.
+    def __appendAll(self, records):
+        before = self.__count
+        self.__file.write(b''.join(records))
+        self.__count += len(records)
+        if self.snapshotEvery and self.__count // self.snapshotEvery != before // self.snapshotEvery:
+            self.snapshot()
+
+    def flush(self):
+        self.__file.flush()
+
+    # Writes the current state as the new snapshot, atomically replacing the previous one.
+    # Raises ValueError inside a transaction, whose changes the file doesn't hold yet.
+    def snapshot(self):
+        if self.__pending is not None:
+            raise ValueError("can't snapshot inside a transaction")
+        self.flush()
+        mode, balance, prices, num, coins = self.__machine._getState()
+        values = (mode, balance) + prices + num + coins
+        tmp = self.path + '.snap.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(Journal._SNAPSHOT_HEADER.pack(Journal._SNAPSHOT_MAGIC, self.__count))
+            f.write(struct.pack(f'<{len(values)}q', *values))
+        os.replace(tmp, self.path + '.snap')
+
+    # Stops logging and restores the machine's own methods.
+    def close(self):
+        for name in (*VendingMachine._MUTATORS, 'begin', 'commit', 'rollback', *Journal._INSTALLERS):
+            self.__machine.__dict__.pop(name, None)
+        self.__file.close()
+
+    # Rebuilds `machine` (freshly constructed with the journaled configuration) from the
+    # last snapshot plus the records after it. Returns the machine.
+    @staticmethod
+    def recover(path: str, machine: VendingMachine):
+        record = Journal._recordFormat(machine)
+        Journal._checkHeader(path, record)
+        start = Journal.__loadSnapshot(path + '.snap', machine)
+
+        coins, slots = len(machine.getCoinValues()), machine.getNumberOfSlots()
+        methods = {op: getattr(machine, name) for name, op in VendingMachine._MUTATORS.items()}
+        arity = {op: n if n is not None else
+                 (coins if op in (VendingMachine.Op.FILL_COINS, VendingMachine.Op.PUT_COINS) else slots)
+                 for op, n in Journal._ARITY.items()}
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            begin = Journal._HEADER.size + start * record.size
+            # A crash may leave a torn record at the end; it never completed, so drop it.
+            end = begin + max(0, len(view) - begin) // record.size * record.size
+            with view[begin:end] as tail:
+                for n, (op, *args) in enumerate(record.iter_unpack(tail), start):
+                    if op == VendingMachine.Op.GIVE_PRODUCTS:
+                        args = [[(slot, number) for slot, number in enumerate(args[:slots], 1) if number]]
+                    method = methods.get(op)
+                    if method is None:
+                        raise ValueError(f"journal record {n} has unknown opcode {op}")
+                    res = method(*args[:arity[op]])
+                    if op == VendingMachine.Op.PUT_COINS:
+                        res = res[0]
+                    if res != VendingMachine.Response.OK and res is not None:
+                        raise ValueError(f"journal record {n} does not replay (response {res})")
+        return machine
+
+    @staticmethod
+    def __loadSnapshot(path: str, machine: VendingMachine):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        magic, count = Journal._SNAPSHOT_HEADER.unpack_from(data)
+        if magic != Journal._SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a journal snapshot")
+        values = struct.unpack_from(f'<{(len(data) - Journal._SNAPSHOT_HEADER.size) // 8}q',
+                                    data, Journal._SNAPSHOT_HEADER.size)
+        slots, coins = machine.getNumberOfSlots(), len(machine.getCoinValues())
+        machine._setState((values[0], values[1], values[2:2 + slots],
+                           values[2 + slots:2 + 2 * slots], values[2 + 2 * slots:2 + 2 * slots + coins]))
+        return count
@@ -0,0 +1,185 @@
+# Streams a field operation log (CSV or JSON lines, optionally gzipped) into VendingMachines.
+# Usage: python src/LogReplay.py LOG [--format csv|jsonl] [--output report.csv]
+# Prints a per-machine reconciliation as CSV and the throughput on stderr.
+import argparse
+import csv
+import gzip
+import json
+import sys
+import time
+
+from VendingMachine import VendingMachine
+
+
+class LogReplay:
+    """Replays operation records into VendingMachines keyed by machine id.
+
+    A record is (machine id, op, args, expected). `op` names a mutating
+    VendingMachine method (giveProducts() takes its cart as slot/number pairs)
+    or is 'audit', whose args are the coins of each kind followed by the
+    products in each slot as counted in the field; those are compared with the
+    replayed machine. `expected`, if not None, is the Response the field saw
+    (a name such as 'OK' or a code) and is compared with the replayed one.
+
+    Records are consumed one at a time, so memory grows with the number of
+    machines, never with the length of the log.
+    """
+
+    AUDIT = 'audit'
+
+    def __init__(self, factory=VendingMachine):
+        self.factory = factory
+        self.machines = {}
+        # Per machine: [records, failed calls, response mismatches, audits, audit mismatches,
+        # last audited (coins, products) or None]
+        self.stats = {}
+        self.records = 0
+        self.malformed = 0
+
+    # Applies one record and returns the replayed Response (None for audits). Raises
+    # ValueError for arguments the method doesn't take.
+    def apply(self, machineId, op: str, args: tuple, expected=None):
+        machine = self.machines.get(machineId)
+        if machine is None:
+            machine = self.machines[machineId] = self.factory()
+            self.stats[machineId] = [0, 0, 0, 0, 0, None]
+        stat = self.stats[machineId]
+        if op == LogReplay.AUDIT:
+            _, _, _, num, coins = machine._getState()
+            counted = (tuple(args[:len(coins)]), tuple(args[len(coins):]))
+            self.records += 1
+            stat[0] += 1
+            stat[3] += 1
+            stat[4] += counted != (coins, num)
+            stat[5] = counted
+            return None
+        if op == 'giveProducts':
+            args = (tuple(zip(args[0::2], args[1::2])),)
+        try:
+            res = getattr(machine, op)(*args)
+        except TypeError:
+            raise ValueError(f"{op} does not take {len(args)} arguments") from None
+        if op == 'putCoins':
+            res = res[0]
+        self.records += 1
+        stat[0] += 1
+        if res != VendingMachine.Response.OK and res is not None:
+            stat[1] += 1
+        if expected is not None and expected != res:
+            stat[2] += 1
+        return res
+
+    # Replays an iterable of records; malformed ones (None, or with arguments that don't
+    # fit) are counted and skipped.
+    def run(self, records):
+        apply = self.apply
+        for record in records:
+            if record is None:
+                self.malformed += 1
+                continue
+            try:
+                apply(*record)
+            except ValueError:
+                self.malformed += 1
+        return self
+
+    # One row per machine: id, records, failed calls, response mismatches, audits, audit
+    # mismatches, coins and products now, and coins and products at the last audit.
+    def reconcile(self):
+        for machineId, (records, failed, mismatched, audits, audited, last) in self.stats.items():
+            _, _, _, num, coins = self.machines[machineId]._getState()
+            yield (machineId, records, failed, mismatched, audits, audited, coins, num,
+                   last[0] if last else None, last[1] if last else None)
+
+
+_OPS = frozenset(VendingMachine._MUTATORS) | {LogReplay.AUDIT}
+_RESPONSES = {name: value for name, value in vars(VendingMachine.Response).items() if not name.startswith('_')}
+
+
+def _record(machineId, op, args, expected):
+    if op not in _OPS:
+        return None
+    try:
+        args = tuple(int(a) for a in args)
+        if isinstance(expected, str):
+            expected = _RESPONSES[expected] if expected in _RESPONSES else int(expected) if expected else None
+    except (KeyError, ValueError, TypeError):
+        return None
+    return machineId, op, args, expected
+
+
+# CSV with a header naming the columns machine, op, args (space-separated) and,
+# optionally, expected. Yields a record, or None for a malformed row; raises
+# ValueError if the header lacks machine or op.
+def read_csv(lines):
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if header is None:
+        return
+    column = {name.strip(): i for i, name in enumerate(header)}
+    machine, op, args, expected = (column.get(name) for name in ('machine', 'op', 'args', 'expected'))
+    if machine is None or op is None:
+        raise ValueError("CSV log needs 'machine' and 'op' columns")
+    width = max(i for i in (machine, op, args, expected) if i is not None) + 1
+    for row in rows:
+        if not row:
+            continue
+        if len(row) < width:
+            yield None
+            continue
+        yield _record(row[machine], row[op], row[args].split() if args is not None else (),
+                      row[expected] if expected is not None else None)
+
+
+# One JSON object per line with keys machine, op, args (a list) and, optionally, expected.
+def read_jsonl(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            yield _record(item['machine'], item['op'], item.get('args', ()), item.get('expected'))
+        except (ValueError, KeyError, TypeError):
+            yield None
+
+
+# Opens `path` as a stream of records; the format defaults to the file extension.
+def open_records(path: str, format: str = None):
+    name = path[:-3] if path.endswith('.gz') else path
+    format = format or ('jsonl' if name.endswith(('.jsonl', '.json')) else 'csv')
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='') as f:
+        yield from (read_jsonl if format == 'jsonl' else read_csv)(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a VendingMachine operation log')
+    parser.add_argument('log', help='CSV or JSONL log, optionally .gz')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default=None)
+    parser.add_argument('--output', help='write the reconciliation here instead of stdout')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    replay = LogReplay().run(open_records(args.log, args.format))
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(('machine', 'records', 'failed', 'response_mismatches', 'audits', 'audit_mismatches',
+                         'coins', 'products', 'audited_coins', 'audited_products'))
+        mismatches = 0
+        for machineId, *counts, coins, num, auditedCoins, auditedNum in replay.reconcile():
+            mismatches += counts[2] + counts[4]
+            writer.writerow((machineId, *counts, ' '.join(map(str, coins)), ' '.join(map(str, num)),
+                             ' '.join(map(str, auditedCoins or ())), ' '.join(map(str, auditedNum or ()))))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{replay.records:,} records ({replay.malformed:,} malformed) for {len(replay.machines):,} machines "
+          f"in {elapsed:.2f} s: {replay.records / max(elapsed, 1e-9):,.0f} records/s", file=sys.stderr)
+    return 1 if mismatches or replay.malformed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
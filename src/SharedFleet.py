@@ -0,0 +1,87 @@
+from contextlib import ExitStack, contextmanager
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from VendingFleet import VendingFleet
+
+
+class SharedFleet(VendingFleet):
+    """VendingFleet whose state matrix lives in a multiprocessing.shared_memory block.
+
+    Processes started by multiprocessing get the fleet as an argument (or through
+    a pool initializer): only the block name and the locks are pickled, and the
+    child maps the same memory, so every process works on the one copy of the
+    state. The getters and view() read it in place.
+
+    The machines are split into `stripes` contiguous ranges, each guarded by a
+    lock shared by all processes, so vectorized calls on a block of neighbouring
+    machines take one or two locks. call() and locked() take the locks of every
+    selected machine in stripe order, so a call is atomic for each machine it
+    touches and calls on different stripes run in parallel. The inherited
+    methods take no lock.
+
+    The creating process owns the block and calls unlink() once the other
+    processes are done with it; everyone calls close() to unmap it.
+    """
+
+    # Default number of lock stripes; each lock is a kernel semaphore.
+    STRIPES = 64
+
+    def __init__(self, size: int, stripes: int = None, context=None):
+        super().__init__(size)
+        self.__shm = shared_memory.SharedMemory(create=True, size=max(1, self._state.nbytes))
+        state = np.ndarray(self._state.shape, dtype=np.int64, buffer=self.__shm.buf)
+        state[:] = self._state
+        self._bind(state)
+        context = context or multiprocessing
+        self.__locks = [context.Lock() for _ in range(stripes or min(size, SharedFleet.STRIPES) or 1)]
+
+    @property
+    def name(self):
+        return self.__shm.name
+
+    # Pickled for a child process as the block name and the locks, never the state.
+    # Like the locks themselves, this only works while starting a process.
+    def __getstate__(self):
+        return {'name': self.__shm.name, 'shape': self._state.shape, 'locks': self.__locks}
+
+    def __setstate__(self, state):
+        self.__shm = shared_memory.SharedMemory(name=state['name'])
+        self.__locks = state['locks']
+        self._bind(np.ndarray(state['shape'], dtype=np.int64, buffer=self.__shm.buf))
+
+    # Holds every machine selected by `indices` for a multi-call session:
+    # `with fleet.locked(idx): ...`.
+    @contextmanager
+    def locked(self, indices):
+        stripes = np.unique(self._indices(indices) * len(self.__locks) // len(self))
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self.__locks[stripe])
+            yield
+
+    # Calls fleet method `name` on the machines selected by `indices` atomically.
+    def call(self, indices, name: str, *args):
+        with self.locked(indices):
+            return getattr(self, name)(indices, *args)
+
+    # Read-only view of machine `index`: one value per field, in _FIELDS order, read
+    # straight from shared memory.
+    def view(self, index: int):
+        column = self._state[:, index]
+        column.flags.writeable = False
+        return column
+
+    # Unmaps the block in this process; views and arrays taken from the fleet must be
+    # dropped first.
+    def close(self):
+        for name in VendingFleet._FIELDS:
+            setattr(self, '_' + name, None)
+        self._state = None
+        self.__shm.close()
+
+    # Frees the block for good; only the creating process should call it.
+    def unlink(self):
+        self.__shm.unlink()
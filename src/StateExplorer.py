@@ -0,0 +1,314 @@
+# Exhaustive breadth-first search over the reachable states of a two-product VendingMachine.
+# Usage: python src/StateExplorer.py [--products 3 3] [--coins 4 4] [--prices 1 3] [--workers N]
+# Prints the Response codes each method never returns and the lines of VendingMachine.py
+# no reachable state runs.
+# The state space grows with the product of all capacities: the shipped configuration
+# (--products 30 40 --coins 50 50 --prices 1 10) has about 1e11 states, far beyond what
+# a bitset in memory and Python's speed allow, so the defaults are a scaled-down machine.
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import dis
+import linecache
+import os
+import sys
+import time
+
+import VendingMachine as _module
+from VendingMachine import VendingMachine
+
+ADMIN_CODE = 117345294655382
+
+
+class StateExplorer:
+    """Enumerates every state a VendingMachine can reach from a fresh one.
+
+    The machine has two product slots and two coin kinds. From every state the
+    explorer tries each public call with every argument that matters: all coins,
+    all product numbers from 0 to capacity + 1, the right and a wrong admin code,
+    every fillCoins() pair and every setPrices() pair out of `prices` plus 0. The
+    calls run on a real VendingMachine put into the state with _setState(), so
+    the search covers the class itself and not a model of it.
+
+    A state is packed into one integer (mode, balance, both prices, both product
+    counts, both coin counts in mixed radix) and the visited set is a bitset with
+    one bit per possible state. Each BFS level is split into chunks expanded in
+    parallel by a process pool.
+
+    Along the way it records every (method, response) outcome seen and which
+    lines of VendingMachine.py the calls ran (a line tracer in each worker), so
+    untaken() lists the lines of every reached function that no reachable state
+    ever runs: a branch is taken if its first line runs. Lines only the calls it
+    doesn't make would run (inside a transaction or a fork, argument counts that
+    don't fit) are listed too. It also checks: failing
+    calls leave the state alone, money is conserved (the coin boxes change by
+    exactly the money put in minus change and returned money), the open balance
+    is always in the coin boxes, and admin mode is only entered with zero balance.
+    """
+
+    # Violations kept per run, so a broken invariant can't flood memory.
+    MAX_VIOLATIONS = 20
+    # Fewest states sent to a worker at once; smaller chunks cost more in pickling than
+    # they gain in parallelism.
+    MIN_CHUNK = 64
+
+    def __init__(self, productCapacities=(30, 40), coinCapacities=(50, 50), prices=range(1, 11),
+                 coinValues=(1, 2), initialPrices=(8, 5), workers: int = None, factory=VendingMachine):
+        self.productCapacities = tuple(productCapacities)
+        self.coinCapacities = tuple(coinCapacities)
+        self.coinValues = tuple(coinValues)
+        self.initialPrices = tuple(initialPrices)
+        self.prices = tuple(sorted(set(prices) | set(initialPrices)))
+        if len(self.productCapacities) != 2 or len(self.coinCapacities) != 2 or len(self.coinValues) != 2:
+            raise ValueError("the explorer covers machines with two products and two coin kinds")
+        if min(self.prices) <= 0:
+            raise ValueError("prices must be positive")
+        self.workers = workers or os.cpu_count() or 1
+        self.factory = factory
+        self.maxBalance = sum(c * v for c, v in zip(self.coinCapacities, self.coinValues))
+        self.radices = (2, self.maxBalance + 1, len(self.prices), len(self.prices),
+                        self.productCapacities[0] + 1, self.productCapacities[1] + 1,
+                        self.coinCapacities[0] + 1, self.coinCapacities[1] + 1)
+        self.size = 1
+        for radix in self.radices:
+            self.size *= radix
+
+    def _config(self):
+        return (self.productCapacities, self.coinCapacities, self.prices, self.coinValues, self.initialPrices,
+                self.factory)
+
+    # Runs the search. Returns {'states', 'levels', 'chunks', 'outcomes', 'functions',
+    # 'lines', 'violations'} where chunks counts the pieces the levels were split into,
+    # outcomes maps each method to the set of responses it returned at least once,
+    # functions holds the first line of every VendingMachine.py function that ran and
+    # lines every line of the file that ran.
+    def explore(self):
+        visited = bytearray((self.size + 7) // 8)
+        start = _encode(self._config(), _initialState(self._config()))
+        visited[start >> 3] |= 1 << (start & 7)
+        frontier = array('q', [start])
+        states, levels, chunked = 1, 0, 0
+        outcomes, functions, lines, violations = {}, set(), set(), []
+        pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            while frontier:
+                levels += 1
+                # One chunk per worker, so every level is split across all of them.
+                size = max(StateExplorer.MIN_CHUNK, -(-len(frontier) // self.workers))
+                chunks = [frontier[i:i + size] for i in range(0, len(frontier), size)]
+                chunked += len(chunks)
+                if pool is None:
+                    results = (_expand(self._config(), chunk) for chunk in chunks)
+                else:
+                    results = pool.map(_expand, [self._config()] * len(chunks), chunks)
+                frontier = array('q')
+                for successors, seen, entered, ran, broken in results:
+                    for method, responses in seen.items():
+                        outcomes.setdefault(method, set()).update(responses)
+                    functions |= entered
+                    lines |= ran
+                    violations.extend(broken[:StateExplorer.MAX_VIOLATIONS - len(violations)])
+                    for code in successors:
+                        byte, bit = code >> 3, 1 << (code & 7)
+                        if not visited[byte] & bit:
+                            visited[byte] |= bit
+                            frontier.append(code)
+                states += len(frontier)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return {'states': states, 'levels': levels - 1, 'chunks': chunked, 'outcomes': outcomes,
+                'functions': functions, 'lines': lines, 'violations': violations}
+
+    # The Response codes each explored method never returned. Coarser than untaken():
+    # branches that end in the same code can't be told apart.
+    @staticmethod
+    def unreachable(outcomes):
+        responses = [value for name, value in vars(VendingMachine.Response).items() if not name.startswith('_')]
+        return {method: [r for r in responses if r not in seen] for method, seen in outcomes.items()}
+
+    # Lines never run, by function name, of the VendingMachine.py functions the search
+    # entered; functions it never entered aren't listed.
+    @staticmethod
+    def untaken(functions, lines):
+        codes = _codes()
+        never = {}
+        for first in sorted(functions):
+            code = codes[first]
+            missing = sorted(_lineStarts(code) - lines)
+            if missing:
+                never[code.co_name] = missing
+        return never
+
+
+def _initialState(config):
+    productCapacities, coinCapacities, prices, coinValues, initialPrices, _ = config
+    return (VendingMachine.Mode.OPERATION, 0, initialPrices, (0, 0), (0, 0))
+
+
+def _encode(config, state):
+    productCapacities, coinCapacities, prices, coinValues, _, _ = config
+    mode, balance, (p1, p2), (n1, n2), (c1, c2) = state
+    code = mode - 1
+    code = code * (sum(c * v for c, v in zip(coinCapacities, coinValues)) + 1) + balance
+    code = code * len(prices) + prices.index(p1)
+    code = code * len(prices) + prices.index(p2)
+    code = code * (productCapacities[0] + 1) + n1
+    code = code * (productCapacities[1] + 1) + n2
+    code = code * (coinCapacities[0] + 1) + c1
+    return code * (coinCapacities[1] + 1) + c2
+
+
+def _decode(config, code):
+    productCapacities, coinCapacities, prices, coinValues, _, _ = config
+    code, c2 = divmod(code, coinCapacities[1] + 1)
+    code, c1 = divmod(code, coinCapacities[0] + 1)
+    code, n2 = divmod(code, productCapacities[1] + 1)
+    code, n1 = divmod(code, productCapacities[0] + 1)
+    code, p2 = divmod(code, len(prices))
+    code, p1 = divmod(code, len(prices))
+    mode, balance = divmod(code, sum(c * v for c, v in zip(coinCapacities, coinValues)) + 1)
+    return (mode + 1, balance, (prices[p1], prices[p2]), (n1, n2), (c1, c2))
+
+
+# Every call worth trying, as (method name, args).
+def _calls(config):
+    productCapacities, coinCapacities, prices, _, _, _ = config
+    calls = [('putCoin1', ()), ('putCoin2', ()), ('returnMoney', ()),
+             ('enterAdminMode', (ADMIN_CODE,)), ('enterAdminMode', (ADMIN_CODE + 1,)),
+             ('exitAdminMode', ()), ('fillProducts', ())]
+    calls += [('giveProduct1', (n,)) for n in range(productCapacities[0] + 2)]
+    calls += [('giveProduct2', (n,)) for n in range(productCapacities[1] + 2)]
+    calls += [('fillCoins', (c1, c2)) for c1 in range(coinCapacities[0] + 1) for c2 in range(coinCapacities[1] + 1)]
+    calls += [('setPrices', (p1, p2)) for p1 in (0,) + prices for p2 in (0,) + prices]
+    return calls
+
+
+# Every code object of VendingMachine.py, nested ones included, by its first line.
+def _codes():
+    codes, pending = {}, []
+    for value in list(vars(_module).values()) + list(vars(VendingMachine).values()):
+        value = getattr(value, '__func__', value)
+        value = getattr(value, '__wrapped__', value)
+        code = getattr(value, '__code__', None)
+        if code is not None and code.co_filename == _SOURCE:
+            pending.append(code)
+    while pending:
+        code = pending.pop()
+        codes[code.co_firstlineno] = code
+        pending.extend(const for const in code.co_consts if hasattr(const, 'co_firstlineno'))
+    return codes
+
+
+# Lines of a function that can run; the def (or first decorator) line itself never does.
+def _lineStarts(code):
+    return {line for _, line in dis.findlinestarts(code) if line is not None and line != code.co_firstlineno}
+
+
+_SOURCE = VendingMachine.__init__.__code__.co_filename
+# The explorer's own way in and out of a state; their lines say nothing about reachability.
+_PLUMBING = (VendingMachine._setState.__code__, VendingMachine._getState.__code__)
+
+
+# Expands a chunk of encoded states; returns (successor codes, {method: responses},
+# first lines of the functions entered, lines run, violations).
+def _expand(config, codes):
+    productCapacities, coinCapacities, prices, coinValues, _, factory = config
+    machine = factory(coinValues, coinCapacities, prices[:1] * 2, productCapacities)
+    calls = [(name, getattr(machine, name), args) for name, args in _calls(config)]
+    successors, seen, broken = array('q'), {}, []
+    entered, lines = set(), set()
+    # Per function entered, its lines not run yet; once none are left it isn't traced.
+    left = {}
+
+    def cash(state):
+        return state[4][0] * coinValues[0] + state[4][1] * coinValues[1]
+
+    def traceLines(frame, event, arg):
+        if event == 'line':
+            lines.add(frame.f_lineno)
+            left[frame.f_code].discard(frame.f_lineno)
+        return traceLines
+
+    def traceCalls(frame, event, arg):
+        code = frame.f_code
+        todo = left.get(code)
+        if todo is None:
+            if code.co_filename != _SOURCE or code in _PLUMBING:
+                todo = left[code] = set()
+            else:
+                entered.add(code.co_firstlineno)
+                todo = left[code] = _lineStarts(code)
+        return traceLines if todo else None
+
+    previous = sys.gettrace()
+    sys.settrace(traceCalls)
+    try:
+        for code in codes:
+            before = _decode(config, code)
+            for name, method, args in calls:
+                machine._setState(before)
+                res = method(*args)
+                after = machine._getState()
+                seen.setdefault(name, set()).add(res)
+                problem = _check(name, args, res, before, after, cash, productCapacities, coinCapacities)
+                if problem is not None:
+                    broken.append((before, name, args, res, after, problem))
+                if after != before:
+                    successors.append(_encode(config, after))
+    finally:
+        sys.settrace(previous)
+    return successors, seen, entered, lines, broken
+
+
+def _check(name, args, res, before, after, cash, productCapacities, coinCapacities):
+    if res != VendingMachine.Response.OK and res is not None:
+        return None if after == before else "failed call changed the state"
+    mode, balance, _, num, coins = after
+    if balance > cash(after):
+        return "balance not covered by the coin boxes"
+    if mode == VendingMachine.Mode.ADMINISTERING and balance != 0:
+        return "admin mode with an open balance"
+    if any(n < 0 or n > m for n, m in zip(num, productCapacities)) or \
+            any(c < 0 or c > m for c, m in zip(coins, coinCapacities)):
+        return "products or coins out of range"
+    if name == 'fillCoins':
+        return None
+    # Money in the boxes changes by the money taken minus the money given back, where
+    # the money taken is the change of the balance plus whatever was sold.
+    sold = 0
+    if name in ('giveProduct1', 'giveProduct2'):
+        slot = 0 if name == 'giveProduct1' else 1
+        sold = (before[3][slot] - num[slot]) * before[2][slot]
+    if cash(after) - cash(before) != balance - before[1] + sold:
+        return "cash not conserved"
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exhaustive reachable-state search of VendingMachine')
+    parser.add_argument('--products', type=int, nargs=2, default=(3, 3), metavar=('MAX1', 'MAX2'))
+    parser.add_argument('--coins', type=int, nargs=2, default=(4, 4), metavar=('MAXC1', 'MAXC2'))
+    parser.add_argument('--prices', type=int, nargs=2, default=(1, 3), metavar=('MIN', 'MAX'),
+                        help='prices setPrices() may set, inclusive')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    explorer = StateExplorer(args.products, args.coins, range(args.prices[0], args.prices[1] + 1),
+                             initialPrices=(args.prices[1], args.prices[0]), workers=args.workers)
+    print(f"state space {explorer.size:,} ({(explorer.size + 7) // 8:,} byte bitset), {explorer.workers} workers")
+    start = time.perf_counter()
+    result = explorer.explore()
+    print(f"{result['states']:,} reachable states, depth {result['levels']}, "
+          f"{time.perf_counter() - start:.1f} s")
+    names = {value: name for name, value in vars(VendingMachine.Response).items() if not name.startswith('_')}
+    for method, never in StateExplorer.unreachable(result['outcomes']).items():
+        if method != 'exitAdminMode':
+            print(f"  {method:15} never returns {', '.join(names[r] for r in never) or '-'}")
+    print("lines of VendingMachine.py no reachable state runs:")
+    for function, never in StateExplorer.untaken(result['functions'], result['lines']).items():
+        for line in never:
+            print(f"  {function:15} {line:4}: {linecache.getline(_SOURCE, line).strip()}")
+    for violation in result['violations']:
+        print("VIOLATION", violation)
+    sys.exit(1 if result['violations'] else 0)
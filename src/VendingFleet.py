@@ -0,0 +1,320 @@
+import numpy as np
+
+from VendingMachine import VendingMachine
+
+
+class VendingFleet:
+    """Struct-of-arrays counterpart of VendingMachine.
+
+    Every field of a machine lives in one row of a single int64 matrix, so a
+    fleet of n machines costs a handful of arrays instead of n objects. The
+    operations take an array of machine indices (or a boolean mask over the
+    whole fleet, which selects the machines where it is True, in index order)
+    and return an array of VendingMachine.Response codes, one per selected
+    machine, matching what the scalar class would return for each machine.
+    Arguments are either one value for all selected machines or an array with
+    one value per selected machine. Negative indices count from the end. An index
+    may occur at most once per call to a state-changing method, since all selected
+    machines are updated in a single step; ValueError otherwise.
+
+    The fleet models the default VendingMachine configuration: two products,
+    coins of value 1 and 2, and the same capacities and starting prices.
+    """
+
+    _FIELDS = ('mode', 'num1', 'num2', 'max1', 'max2', 'price1', 'price2',
+               'coins1', 'coins2', 'maxc1', 'maxc2', 'balance')
+
+    # One record of VendingMachine's packed state layout for the default configuration,
+    # so fleet snapshots and VendingMachine.snapshot_fleet() buffers are interchangeable.
+    _PACKED = np.dtype([('mode', 'u1'), ('slots', '<u2'), ('kinds', '<u2'), ('pad', 'V3'),
+                        ('balance', '<i8'), ('price1', '<i8'), ('price2', '<i8'), ('max1', '<i8'),
+                        ('max2', '<i8'), ('num1', '<i8'), ('num2', '<i8'), ('coinval1', '<i8'),
+                        ('coinval2', '<i8'), ('maxc1', '<i8'), ('maxc2', '<i8'), ('coins1', '<i8'),
+                        ('coins2', '<i8')])
+
+    __coinval1 = 1
+    __coinval2 = 2
+    __id = 117345294655382
+
+    def __init__(self, size: int):
+        self._bind(np.zeros((len(VendingFleet._FIELDS), size), dtype=np.int64))
+        self._mode[:] = VendingMachine.Mode.OPERATION
+        self._max1[:] = 30
+        self._max2[:] = 40
+        self._price1[:] = 8
+        self._price2[:] = 5
+        self._maxc1[:] = 50
+        self._maxc2[:] = 50
+
+    def __len__(self):
+        return self._state.shape[1]
+
+    # Makes `state` (one row per field, one column per machine) the fleet's storage.
+    def _bind(self, state):
+        self._state = state
+        for row, name in enumerate(VendingFleet._FIELDS):
+            setattr(self, '_' + name, state[row])
+
+    # Packs every machine as a VendingMachine.to_bytes() record, back to back.
+    def to_bytes(self):
+        records = np.zeros(len(self), dtype=VendingFleet._PACKED)
+        records['slots'] = 2
+        records['kinds'] = 2
+        records['coinval1'] = self.__coinval1
+        records['coinval2'] = self.__coinval2
+        for name in VendingFleet._FIELDS:
+            records[name] = getattr(self, '_' + name)
+        return records.tobytes()
+
+    # Builds a fleet from to_bytes() (or VendingMachine.snapshot_fleet() of default-configured
+    # machines) output; the records are read in place through the buffer protocol.
+    @classmethod
+    def from_buffer(cls, buffer):
+        with memoryview(buffer) as view:
+            if view.nbytes % VendingFleet._PACKED.itemsize != 0:
+                raise ValueError("buffer does not hold whole machine records")
+            records = np.frombuffer(view, dtype=VendingFleet._PACKED)
+            if ((records['slots'] != 2) | (records['kinds'] != 2) | (records['coinval1'] != cls.__coinval1)
+                    | (records['coinval2'] != cls.__coinval2)).any():
+                raise ValueError("fleet machines must have the default configuration")
+            VendingFleet.__check(records)
+            fleet = cls(records.shape[0])
+            for name in VendingFleet._FIELDS:
+                getattr(fleet, '_' + name)[:] = records[name]
+            del records
+        return fleet
+
+    # Refuses the records of states no VendingMachine could be in, like VendingMachine.from_buffer().
+    @staticmethod
+    def __check(records):
+        mode, balance = records['mode'], records['balance']
+        if ((mode != VendingMachine.Mode.OPERATION) & (mode != VendingMachine.Mode.ADMINISTERING)).any() \
+                or (balance < 0).any():
+            raise ValueError("invalid mode or balance")
+        if ((records['num1'] < 0) | (records['num1'] > records['max1']) | (records['num2'] < 0)
+                | (records['num2'] > records['max2']) | (records['coins1'] < 0) | (records['coins1'] > records['maxc1'])
+                | (records['coins2'] < 0) | (records['coins2'] > records['maxc2'])).any():
+            raise ValueError("products or coins out of range")
+        if (balance > records['coins1'] * VendingFleet.__coinval1 + records['coins2'] * VendingFleet.__coinval2).any():
+            raise ValueError("balance exceeds the coins in the machine")
+        if ((mode == VendingMachine.Mode.ADMINISTERING) & (balance != 0)).any():
+            raise ValueError("admin mode with an open balance")
+        if ((records['price1'] <= 0) | (records['price2'] <= 0)).any():
+            raise ValueError("prices must be positive")
+
+    # Selected machines as an array of non-negative indices. Mutators pass unique=True:
+    # they update all machines in one step, so a repeated index would lose updates.
+    def _indices(self, indices, unique: bool = False):
+        idx = np.asarray(indices)
+        if idx.dtype == bool:
+            if idx.shape != (len(self),):
+                raise ValueError(f"mask of shape {idx.shape} for a fleet of {len(self)}")
+            return np.flatnonzero(idx)
+        idx = idx.astype(np.intp, copy=False).reshape(-1)
+        if idx.size == 0:
+            return idx
+        low, high = idx.min(), idx.max()
+        if low < -len(self) or high >= len(self):
+            raise IndexError(f"index out of range for a fleet of {len(self)}")
+        if low < 0:
+            idx = idx % len(self)
+        if unique and idx.size > 1 and np.bincount(idx, minlength=len(self)).max() > 1:
+            raise ValueError("an index may occur at most once per call")
+        return idx
+
+    # A per-call or per-machine argument as an int64 array with one value per index.
+    @staticmethod
+    def _argument(value, idx):
+        return np.broadcast_to(np.asarray(value, dtype=np.int64), idx.shape)
+
+    @staticmethod
+    def _responses(idx):
+        return np.full(idx.shape[0], VendingMachine.Response.OK, dtype=np.int8)
+
+    def getNumberOfProduct1(self, indices):
+        return self._num1[self._indices(indices)]
+
+    def getNumberOfProduct2(self, indices):
+        return self._num2[self._indices(indices)]
+
+    def getCurrentBalance(self, indices):
+        return self._balance[self._indices(indices)]
+
+    def getCurrentMode(self, indices):
+        return self._mode[self._indices(indices)]
+
+    def getCurrentSum(self, indices):
+        idx = self._indices(indices)
+        total = self._coins1[idx] * self.__coinval1 + self._coins2[idx] * self.__coinval2
+        return np.where(self._mode[idx] == VendingMachine.Mode.OPERATION, 0, total)
+
+    def getCoins1(self, indices):
+        idx = self._indices(indices)
+        return np.where(self._mode[idx] == VendingMachine.Mode.OPERATION, 0, self._coins1[idx])
+
+    def getCoins2(self, indices):
+        idx = self._indices(indices)
+        return np.where(self._mode[idx] == VendingMachine.Mode.OPERATION, 0, self._coins2[idx])
+
+    def getPrice1(self, indices):
+        return self._price1[self._indices(indices)]
+
+    def getPrice2(self, indices):
+        return self._price2[self._indices(indices)]
+
+    def fillProducts(self, indices):
+        idx = self._indices(indices, unique=True)
+        out = self._responses(idx)
+        ok = self._mode[idx] == VendingMachine.Mode.ADMINISTERING
+        out[~ok] = VendingMachine.Response.ILLEGAL_OPERATION
+        idx = idx[ok]
+        self._num1[idx] = self._max1[idx]
+        self._num2[idx] = self._max2[idx]
+        return out
+
+    def fillCoins(self, indices, c1, c2):
+        idx = self._indices(indices, unique=True)
+        c1, c2 = self._argument(c1, idx), self._argument(c2, idx)
+        out = self._responses(idx)
+        admin = self._mode[idx] != VendingMachine.Mode.OPERATION
+        valid = (c1 > 0) & (c1 <= self._maxc1[idx]) & (c2 > 0) & (c2 <= self._maxc2[idx])
+        out[admin & ~valid] = VendingMachine.Response.INVALID_PARAM
+        out[~admin] = VendingMachine.Response.ILLEGAL_OPERATION
+        ok = admin & valid
+        self._coins1[idx[ok]] = c1[ok]
+        self._coins2[idx[ok]] = c2[ok]
+        return out
+
+    def enterAdminMode(self, indices, code):
+        idx = self._indices(indices, unique=True)
+        out = self._responses(idx)
+        wrong = self._argument(code, idx) != self.__id
+        busy = ~wrong & (self._balance[idx] != 0)
+        out[wrong] = VendingMachine.Response.INVALID_PARAM
+        out[busy] = VendingMachine.Response.CANNOT_PERFORM
+        self._mode[idx[~(wrong | busy)]] = VendingMachine.Mode.ADMINISTERING
+        return out
+
+    def exitAdminMode(self, indices):
+        self._mode[self._indices(indices, unique=True)] = VendingMachine.Mode.OPERATION
+
+    def setPrices(self, indices, p1, p2):
+        idx = self._indices(indices, unique=True)
+        p1, p2 = self._argument(p1, idx), self._argument(p2, idx)
+        out = self._responses(idx)
+        admin = self._mode[idx] != VendingMachine.Mode.OPERATION
+        valid = (p1 > 0) & (p2 > 0)
+        out[admin & ~valid] = VendingMachine.Response.INVALID_PARAM
+        out[~admin] = VendingMachine.Response.ILLEGAL_OPERATION
+        ok = admin & valid
+        self._price1[idx[ok]] = p1[ok]
+        self._price2[idx[ok]] = p2[ok]
+        return out
+
+    def putCoin1(self, indices):
+        return self.__putCoin(self._indices(indices, unique=True), self._coins1, self._maxc1, self.__coinval1)
+
+    def putCoin2(self, indices):
+        return self.__putCoin(self._indices(indices, unique=True), self._coins2, self._maxc2, self.__coinval2)
+
+    # Burst insertion: every machine takes as many of its count1 1-coins and count2 2-coins
+    # as fit into its boxes. Returns (responses, accepted1, accepted2); the response is
+    # CANNOT_PERFORM when some coin was rejected.
+    def putCoins(self, indices, count1, count2):
+        idx = self._indices(indices, unique=True)
+        count1, count2 = self._argument(count1, idx), self._argument(count2, idx)
+        out = self._responses(idx)
+        admin = self._mode[idx] == VendingMachine.Mode.ADMINISTERING
+        invalid = ~admin & ((count1 < 0) | (count2 < 0))
+        live = ~(admin | invalid)
+        accepted1 = np.where(live, np.minimum(count1, self._maxc1[idx] - self._coins1[idx]), 0)
+        accepted2 = np.where(live, np.minimum(count2, self._maxc2[idx] - self._coins2[idx]), 0)
+        out[live & ((accepted1 < count1) | (accepted2 < count2))] = VendingMachine.Response.CANNOT_PERFORM
+        out[invalid] = VendingMachine.Response.INVALID_PARAM
+        out[admin] = VendingMachine.Response.ILLEGAL_OPERATION
+        self._coins1[idx] += accepted1
+        self._coins2[idx] += accepted2
+        self._balance[idx] += accepted1 * self.__coinval1 + accepted2 * self.__coinval2
+        return out, accepted1, accepted2
+
+    def returnMoney(self, indices):
+        idx = self._indices(indices, unique=True)
+        out = self._responses(idx)
+        admin = self._mode[idx] == VendingMachine.Mode.ADMINISTERING
+        out[admin] = VendingMachine.Response.ILLEGAL_OPERATION
+        # Machines with zero balance answer OK without touching anything.
+        live = ~admin & (self._balance[idx] != 0)
+        idx = idx[live]
+        out[live] = self.__payChange(idx, self._balance[idx], VendingMachine.Response.TOO_BIG_CHANGE)
+        return out
+
+    def giveProduct1(self, indices, number):
+        return self.__giveProduct(self._indices(indices, unique=True), number, self._num1, self._max1,
+                                  self._price1, VendingMachine.Response.TOO_BIG_CHANGE)
+
+    def giveProduct2(self, indices, number):
+        # The scalar giveProduct2() reports INSUFFICIENT_MONEY instead of TOO_BIG_CHANGE
+        # here (unreachable, see readme), the fleet mirrors it.
+        return self.__giveProduct(self._indices(indices, unique=True), number, self._num2, self._max2,
+                                  self._price2, VendingMachine.Response.INSUFFICIENT_MONEY)
+
+    def __putCoin(self, idx, coins, maxc, coinval):
+        out = self._responses(idx)
+        admin = self._mode[idx] == VendingMachine.Mode.ADMINISTERING
+        full = ~admin & (coins[idx] == maxc[idx])
+        out[admin] = VendingMachine.Response.ILLEGAL_OPERATION
+        out[full] = VendingMachine.Response.CANNOT_PERFORM
+        idx = idx[~(admin | full)]
+        self._balance[idx] += coinval
+        coins[idx] += 1
+        return out
+
+    def __giveProduct(self, idx, number, num, maxn, price, tooBigChange):
+        number = self._argument(number, idx)
+        out = self._responses(idx)
+        pending = np.ones(idx.shape[0], dtype=bool)
+
+        def reject(mask, response):
+            mask &= pending
+            out[mask] = response
+            pending[mask] = False
+
+        reject(self._mode[idx] == VendingMachine.Mode.ADMINISTERING, VendingMachine.Response.ILLEGAL_OPERATION)
+        reject((number <= 0) | (number > maxn[idx]), VendingMachine.Response.INVALID_PARAM)
+        reject(number > num[idx], VendingMachine.Response.INSUFFICIENT_PRODUCT)
+        res = self._balance[idx] - number * price[idx]
+        reject(res < 0, VendingMachine.Response.INSUFFICIENT_MONEY)
+
+        idx, number, res = idx[pending], number[pending], res[pending]
+        paid = self.__payChange(idx, res, tooBigChange)
+        sold = paid == VendingMachine.Response.OK
+        num[idx[sold]] -= number[sold]
+        out[pending] = paid
+        return out
+
+    def __payChange(self, idx, res, tooBigChange):
+        # Vectorized form of the change branches shared by returnMoney() and giveProduct*().
+        out = self._responses(idx)
+        coins1, coins2 = self._coins1[idx], self._coins2[idx]
+        sum2 = coins2 * self.__coinval2
+
+        tooBig = res > coins1 * self.__coinval1 + sum2
+        allCoins2 = ~tooBig & (res > sum2)
+        even = ~tooBig & ~allCoins2 & (res % self.__coinval2 == 0)
+        rest = ~tooBig & ~allCoins2 & ~even
+        unsuitable = rest & (coins1 == 0)
+        odd = rest & ~unsuitable
+
+        out[tooBig] = tooBigChange
+        out[unsuitable] = VendingMachine.Response.UNSUITABLE_CHANGE
+        # using coinval1 == 1
+        coins1 = np.where(allCoins2, coins1 - (res - sum2), coins1)
+        coins2 = np.where(allCoins2, 0, coins2)
+        coins2 = np.where(even | odd, coins2 - res // self.__coinval2, coins2)
+        coins1 = np.where(odd, coins1 - 1, coins1)
+
+        self._coins1[idx] = coins1
+        self._coins2[idx] = coins2
+        paid = idx[out == VendingMachine.Response.OK]
+        self._balance[paid] = 0
+        return out
@@ -1,3 +1,45 @@
+from array import array
+from contextlib import contextmanager
+from functools import lru_cache
+from numbers import Integral
+import struct
+
+from ChangeMaker import ChangeMaker
+
+
+# Packed state: a header of mode, slot count and coin kind count, then little-endian
+# int64 balance, prices, product capacities, products, coin values, coin capacities
+# and coins. Machines with the same configuration pack to the same width.
+_PACKED_HEADER = struct.Struct('<BHH3x')
+
+
+@lru_cache(maxsize=None)
+def _packedLayout(slots: int, kinds: int):
+    return struct.Struct(_PACKED_HEADER.format + 'q' * (1 + 3 * slots + 3 * kinds))
+
+
+# Adds `count` coins worth `value` to the bitmap of payable amounts (bit a set for
+# every amount a the coins can pay exactly). The coins go in as 1, 2, 4, ... coin
+# bundles, so this takes a few shifts however many coins there are.
+def _addCoins(payable: int, value: int, count: int):
+    bundle = 1
+    while count > 0:
+        take = min(bundle, count)
+        payable |= payable << value * take
+        count -= take
+        bundle *= 2
+    return payable
+
+
+# Bitmap of the amounts payable out of coin boxes holding `counts`.
+@lru_cache(maxsize=4096)
+def _payableAmounts(coinValues: tuple, counts: tuple):
+    payable = 1
+    for value, count in zip(coinValues, counts):
+        payable = _addCoins(payable, value, count)
+    return payable
+
+
 class VendingMachine:
     class Mode:
         OPERATION = 1
@@ -13,34 +55,91 @@ class VendingMachine:
         INSUFFICIENT_PRODUCT = 7
         INSUFFICIENT_MONEY = 8
 
-    __coinval1 = 1
-    __coinval2 = 2
+    # Opcodes of the mutating methods. apply_batch() understands PUT_COIN1..FILL_PRODUCTS,
+    # the rest take several arguments and are used by the journal only.
+    class Op:
+        PUT_COIN1 = 1
+        PUT_COIN2 = 2
+        RETURN_MONEY = 3
+        GIVE_PRODUCT1 = 4
+        GIVE_PRODUCT2 = 5
+        ENTER_ADMIN_MODE = 6
+        EXIT_ADMIN_MODE = 7
+        FILL_PRODUCTS = 8
+        PUT_COIN = 9
+        GIVE_PRODUCT = 10
+        FILL_COINS = 11
+        SET_PRICES = 12
+        SET_PRICE = 13
+        GIVE_PRODUCTS = 14
+        PUT_COINS = 15
+
+    # Public methods that may change the state, by opcode. A call that returns anything
+    # but OK (or None, for exitAdminMode()) leaves the state untouched, so observers
+    # wrapping these methods on an instance only need to look at successful calls.
+    # The exception is putCoins(), which returns (response, accepted, rejected) and
+    # keeps the accepted coins of a partly rejected burst; observers go by `accepted`.
+    _MUTATORS = {
+        'putCoin1': Op.PUT_COIN1,
+        'putCoin2': Op.PUT_COIN2,
+        'returnMoney': Op.RETURN_MONEY,
+        'giveProduct1': Op.GIVE_PRODUCT1,
+        'giveProduct2': Op.GIVE_PRODUCT2,
+        'enterAdminMode': Op.ENTER_ADMIN_MODE,
+        'exitAdminMode': Op.EXIT_ADMIN_MODE,
+        'fillProducts': Op.FILL_PRODUCTS,
+        'putCoin': Op.PUT_COIN,
+        'giveProduct': Op.GIVE_PRODUCT,
+        'fillCoins': Op.FILL_COINS,
+        'setPrices': Op.SET_PRICES,
+        'setPrice': Op.SET_PRICE,
+        'giveProducts': Op.GIVE_PRODUCTS,
+        'putCoins': Op.PUT_COINS,
+    }
 
-    def __init__(self):
+    # coinValues and coinCapacities describe the coin boxes; coin kind k (1-based)
+    # is coinValues[k - 1]. The first two kinds back putCoin1/2() and getCoins1/2().
+    # prices and productCapacities describe the product slots the same way.
+    def __init__(self, coinValues=(1, 2), coinCapacities=(50, 50), prices=(8, 5), productCapacities=(30, 40)):
+        if len(coinValues) < 2 or len(coinValues) != len(coinCapacities):
+            raise ValueError("need at least two coin kinds, each with a capacity")
+        if any(v <= 0 for v in coinValues) or any(c <= 0 for c in coinCapacities):
+            raise ValueError("coin values and capacities must be positive")
+        if len(prices) < 2 or len(prices) != len(productCapacities):
+            raise ValueError("need at least two product slots, each with a capacity")
+        if any(p <= 0 for p in prices) or any(c <= 0 for c in productCapacities):
+            raise ValueError("prices and product capacities must be positive")
         self.__id = 117345294655382
         self.__mode = VendingMachine.Mode.OPERATION
-        # max amount of product 1 and 2
-        self.__max1 = 30
-        self.__max2 = 40
-        # current amount of product 1 and 2
-        self.__num1 = 0
-        self.__num2 = 0
-        # price of product 1 and 2
-        self.__price1 = 8
-        self.__price2 = 5
-        # coins storage capacity for coins 1 and 2
-        self.__maxc1 = 50
-        self.__maxc2 = 50
-        # current amount of coins 1 and 2
-        self.__coins1 = 0
-        self.__coins2 = 0
+        # price, max amount and current amount of each product slot
+        self.__prices = list(prices)
+        self.__max = list(productCapacities)
+        self.__num = [0] * len(self.__max)
+        # value, storage capacity and current amount of each coin kind
+        self.__coinvals = tuple(coinValues)
+        self.__maxc = list(coinCapacities)
+        self.__coins = [0] * len(self.__coinvals)
         self.__balance = 0
+        self.__change = ChangeMaker.shared(self.__coinvals)
+        # Bitmap of the change amounts the coin boxes can pay; see canMakeChange().
+        self.__payable = 1
+        # Undo log of the open transaction, None outside one; see begin().
+        self.__log = None
+        # True while the state lists may be shared with a fork(); the few in-place
+        # writers copy them first.
+        self.__cow = False
 
     def getNumberOfProduct1(self):
-        return self.__num1
+        return self.__num[0]
 
     def getNumberOfProduct2(self):
-        return self.__num2
+        return self.__num[1]
+
+    # Like getNumberOfProduct1/2() for any slot; 0 for a slot the machine doesn't have.
+    def getNumberOfProduct(self, slot: int):
+        if slot < 1 or slot > len(self.__num):
+            return 0
+        return self.__num[slot - 1]
 
     def getCurrentBalance(self):
         return self.__balance
@@ -51,40 +150,66 @@ class VendingMachine:
     def getCurrentSum(self):
         if self.__mode == VendingMachine.Mode.OPERATION:
             return 0
-        return self.__coins1 * self.__coinval1 + self.__coins2 * self.__coinval2
+        return self.__coinSum()
 
     def getCoins1(self):
         if self.__mode == VendingMachine.Mode.OPERATION:
             return 0
-        return self.__coins1
+        return self.__coins[0]
 
     def getCoins2(self):
         if self.__mode == VendingMachine.Mode.OPERATION:
             return 0
-        return self.__coins2
+        return self.__coins[1]
+
+    # Like getCoins1/2() for any coin kind; 0 for a kind the machine doesn't have.
+    def getCoins(self, kind: int):
+        if self.__mode == VendingMachine.Mode.OPERATION:
+            return 0
+        if kind < 1 or kind > len(self.__coins):
+            return 0
+        return self.__coins[kind - 1]
+
+    def getCoinValues(self):
+        return self.__coinvals
 
     def getPrice1(self):
-        return self.__price1
+        return self.__prices[0]
 
     def getPrice2(self):
-        return self.__price2
+        return self.__prices[1]
+
+    # Like getPrice1/2() for any slot; 0 for a slot the machine doesn't have.
+    def getPrice(self, slot: int):
+        if slot < 1 or slot > len(self.__prices):
+            return 0
+        return self.__prices[slot - 1]
+
+    def getNumberOfSlots(self):
+        return len(self.__num)
 
     def fillProducts(self):
         if self.__mode != VendingMachine.Mode.ADMINISTERING:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        self.__num1 = self.__max1
-        self.__num2 = self.__max2
+        if self.__log is not None:
+            self.__record('num')
+        self.__num = list(self.__max)
         return VendingMachine.Response.OK
 
-    def fillCoins(self, c1: int, c2: int):
+    # Takes one count per coin kind, so machines with more kinds pass the rest after c2.
+    def fillCoins(self, c1: int, c2: int, *counts: int):
         if self.__mode == VendingMachine.Mode.OPERATION:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        if c1 <= 0 or c1 > self.__maxc1:
-            return VendingMachine.Response.INVALID_PARAM
-        if c2 <= 0 or c2 > self.__maxc2:
+        counts = (c1, c2) + counts
+        if len(counts) != len(self.__coins):
             return VendingMachine.Response.INVALID_PARAM
-        self.__coins1 = c1
-        self.__coins2 = c2
+        for count, capacity in zip(counts, self.__maxc):
+            if count <= 0 or count > capacity:
+                return VendingMachine.Response.INVALID_PARAM
+        if self.__log is not None:
+            self.__record('coins', 'payable')
+        self.__coins = list(counts)
+        self.__payable = _payableAmounts(self.__coinvals, counts)
         return VendingMachine.Response.OK
 
     def enterAdminMode(self, code: int):
@@ -92,127 +217,487 @@ class VendingMachine:
             return VendingMachine.Response.INVALID_PARAM
         if self.__balance != 0:
             return VendingMachine.Response.CANNOT_PERFORM
+        if self.__log is not None:
+            self.__record('mode')
         self.__mode = VendingMachine.Mode.ADMINISTERING
         return VendingMachine.Response.OK
 
     def exitAdminMode(self):
+        if self.__log is not None:
+            self.__record('mode')
         self.__mode = VendingMachine.Mode.OPERATION
 
-    def setPrices(self, p1: int, p2: int):
+    # Takes one price per slot, so machines with more slots pass the rest after p2.
+    def setPrices(self, p1: int, p2: int, *prices: int):
+        if self.__mode == VendingMachine.Mode.OPERATION:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        prices = (p1, p2) + prices
+        if len(prices) != len(self.__prices):
+            return VendingMachine.Response.INVALID_PARAM
+        for price in prices:
+            if price <= 0:
+                return VendingMachine.Response.INVALID_PARAM
+        if self.__log is not None:
+            self.__record('prices')
+        self.__prices = list(prices)
+        return VendingMachine.Response.OK
+
+    def setPrice(self, slot: int, price: int):
         if self.__mode == VendingMachine.Mode.OPERATION:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        if p1 <= 0 or p2 <= 0:
+        if slot < 1 or slot > len(self.__prices) or price <= 0:
             return VendingMachine.Response.INVALID_PARAM
-        self.__price1 = p1
-        self.__price2 = p2
+        if self.__cow:
+            self.__own()
+        if self.__log is not None:
+            self.__recordItem('prices', slot - 1)
+        self.__prices[slot - 1] = price
         return VendingMachine.Response.OK
 
     def putCoin1(self):
         if self.__mode == VendingMachine.Mode.ADMINISTERING:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        if self.__coins1 == self.__maxc1:
-            return VendingMachine.Response.CANNOT_PERFORM
-        self.__balance += self.__coinval1
-        self.__coins1 += 1
-        return VendingMachine.Response.OK
+        return self.__putCoin(0)
 
     def putCoin2(self):
         if self.__mode == VendingMachine.Mode.ADMINISTERING:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        if self.__coins2 == self.__maxc2:
-            return VendingMachine.Response.CANNOT_PERFORM
-        self.__balance += self.__coinval2
-        self.__coins2 += 1
-        return VendingMachine.Response.OK
+        return self.__putCoin(1)
+
+    # Like putCoin1/2() for any coin kind.
+    def putCoin(self, kind: int):
+        if self.__mode == VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if kind < 1 or kind > len(self.__coins):
+            return VendingMachine.Response.INVALID_PARAM
+        return self.__putCoin(kind - 1)
+
+    # Takes a burst of coins, one count per coin kind, as far as the coin boxes have room,
+    # and returns (response, accepted, rejected) with the coins of each kind taken and
+    # left over. The response is CANNOT_PERFORM if anything was rejected; the accepted
+    # coins stay in the machine either way.
+    def putCoins(self, count1: int, count2: int, *counts: int):
+        counts = (count1, count2) + counts
+        none = (0,) * len(counts)
+        if self.__mode == VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION, none, counts
+        if len(counts) != len(self.__coins) or any(count < 0 for count in counts):
+            return VendingMachine.Response.INVALID_PARAM, none, counts
+        accepted = tuple(min(count, capacity - coins) for count, capacity, coins
+                         in zip(counts, self.__maxc, self.__coins))
+        rejected = tuple(count - taken for count, taken in zip(counts, accepted))
+        if any(accepted):
+            if self.__log is not None:
+                self.__record('balance', 'coins', 'payable')
+            self.__balance += sum(taken * value for taken, value in zip(accepted, self.__coinvals))
+            self.__coins = [coins + taken for coins, taken in zip(self.__coins, accepted)]
+            for value, taken in zip(self.__coinvals, accepted):
+                self.__payable = _addCoins(self.__payable, value, taken)
+        if any(rejected):
+            return VendingMachine.Response.CANNOT_PERFORM, accepted, rejected
+        return VendingMachine.Response.OK, accepted, rejected
 
     def returnMoney(self):
         if self.__mode == VendingMachine.Mode.ADMINISTERING:
             return VendingMachine.Response.ILLEGAL_OPERATION
         if self.__balance == 0:
             return VendingMachine.Response.OK
-        if self.__balance > self.__coins1 * self.__coinval1 + self.__coins2 * self.__coinval2:
-            return VendingMachine.Response.TOO_BIG_CHANGE
-        if self.__balance > self.__coins2 * self.__coinval2:
-            # using coinval1 == 1
-            self.__coins1 -= self.__balance - self.__coins2 * self.__coinval2
-            self.__coins2 = 0
-            self.__balance = 0
-            return VendingMachine.Response.OK
-        if self.__balance % self.__coinval2 == 0:
-            self.__coins2 -= self.__balance // self.__coinval2
+        res = self.__payChange(self.__balance, VendingMachine.Response.TOO_BIG_CHANGE)
+        if res == VendingMachine.Response.OK:
+            if self.__log is not None:
+                self.__record('balance')
             self.__balance = 0
-            return VendingMachine.Response.OK
-        if self.__coins1 == 0:
-            # using coinval1 == 1
-            return VendingMachine.Response.UNSUITABLE_CHANGE
-        # using coinval1 == 1
-        self.__coins2 -= self.__balance // self.__coinval2
-        self.__coins1 -= 1
-        self.__balance = 0
-        return VendingMachine.Response.OK
+        return res
 
     def giveProduct1(self, number: int):
         if self.__mode == VendingMachine.Mode.ADMINISTERING:
             return VendingMachine.Response.ILLEGAL_OPERATION
-        if number <= 0 or number > self.__max1:
+        return self.__giveProduct(0, number, VendingMachine.Response.TOO_BIG_CHANGE)
+
+    def giveProduct2(self, number: int):
+        if self.__mode == VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        # Historically reports INSUFFICIENT_MONEY when change exceeds the coin boxes (unreachable, see readme).
+        return self.__giveProduct(1, number, VendingMachine.Response.INSUFFICIENT_MONEY)
+
+    # Like giveProduct1/2() for any slot.
+    def giveProduct(self, slot: int, number: int):
+        if self.__mode == VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        if slot < 1 or slot > len(self.__num):
             return VendingMachine.Response.INVALID_PARAM
-        if number > self.__num1:
+        return self.__giveProduct(slot - 1, number, VendingMachine.Response.TOO_BIG_CHANGE)
+
+    # Buys a whole cart in one transaction: stock and money are checked for all of it,
+    # change is paid once, and nothing changes unless the result is OK. `cart` maps
+    # slots to numbers or is a sequence of (slot, number) pairs; repeated slots add up.
+    def giveProducts(self, cart):
+        if self.__mode == VendingMachine.Mode.ADMINISTERING:
+            return VendingMachine.Response.ILLEGAL_OPERATION
+        items = VendingMachine._cartItems(cart)
+        if not items:
+            return VendingMachine.Response.INVALID_PARAM
+        wanted = [0] * len(self.__num)
+        for slot, number in items:
+            if slot < 1 or slot > len(self.__num) or number <= 0:
+                return VendingMachine.Response.INVALID_PARAM
+            wanted[slot - 1] += number
+        if any(number > capacity for number, capacity in zip(wanted, self.__max)):
+            return VendingMachine.Response.INVALID_PARAM
+        if any(number > left for number, left in zip(wanted, self.__num)):
             return VendingMachine.Response.INSUFFICIENT_PRODUCT
 
-        res = self.__balance - number * self.__price1
+        res = self.__balance - sum(number * price for number, price in zip(wanted, self.__prices))
         if res < 0:
             return VendingMachine.Response.INSUFFICIENT_MONEY
-        if res > self.__coins1 * self.__coinval1 + self.__coins2 * self.__coinval2:
-            return VendingMachine.Response.TOO_BIG_CHANGE
-        if res > self.__coins2 * self.__coinval2:
-            # using coinval1 == 1
-            self.__coins1 -= res - self.__coins2 * self.__coinval2
-            self.__coins2 = 0
+        res = self.__payChange(res, VendingMachine.Response.TOO_BIG_CHANGE)
+        if res == VendingMachine.Response.OK:
+            if self.__log is not None:
+                self.__record('balance', 'num')
             self.__balance = 0
-            self.__num1 -= number
-            return VendingMachine.Response.OK
-        if res % self.__coinval2 == 0:
-            self.__coins2 -= res // self.__coinval2
-            self.__balance = 0
-            self.__num1 -= number
-            return VendingMachine.Response.OK
-        if self.__coins1 == 0:
-            return VendingMachine.Response.UNSUITABLE_CHANGE
-        self.__coins1 -= 1
-        self.__coins2 -= res // self.__coinval2
-        self.__balance = 0
-        self.__num1 -= number
-        return VendingMachine.Response.OK
+            self.__num = [left - number for left, number in zip(self.__num, wanted)]
+        return res
 
-    def giveProduct2(self, number: int):
-        if self.__mode == VendingMachine.Mode.ADMINISTERING:
-            return VendingMachine.Response.ILLEGAL_OPERATION
-        if number <= 0 or number > self.__max2:
+    # A cart as a list of (slot, number) pairs.
+    @staticmethod
+    def _cartItems(cart):
+        return [(slot, number) for slot, number in (cart.items() if hasattr(cart, 'items') else cart)]
+
+    # True if the coin boxes can pay `amount` exactly right now, i.e. returnMoney() or a
+    # purchase leaving that much change would not fail on TOO_BIG_CHANGE or UNSUITABLE_CHANGE.
+    def canMakeChange(self, amount: int):
+        return amount >= 0 and self.__payable >> amount & 1 == 1
+
+    # True if giveProduct(slot, number) would return OK right now.
+    def canBuy(self, slot: int, number: int):
+        if self.__mode == VendingMachine.Mode.ADMINISTERING or slot < 1 or slot > len(self.__num):
+            return False
+        i = slot - 1
+        if number <= 0 or number > self.__num[i]:
+            return False
+        change = self.__balance - number * self.__prices[i]
+        return change >= 0 and self.__payable >> change & 1 == 1
+
+    def __coinSum(self):
+        return sum(count * value for count, value in zip(self.__coins, self.__coinvals))
+
+    def __giveProduct(self, i: int, number: int, tooBigChange: int):
+        if number <= 0 or number > self.__max[i]:
             return VendingMachine.Response.INVALID_PARAM
-        if number > self.__num2:
+        if number > self.__num[i]:
             return VendingMachine.Response.INSUFFICIENT_PRODUCT
 
-        res = self.__balance - number * self.__price2
+        res = self.__balance - number * self.__prices[i]
         if res < 0:
             return VendingMachine.Response.INSUFFICIENT_MONEY
-        if res > self.__coins1 * self.__coinval1 + self.__coins2 * self.__coinval2:
-            return VendingMachine.Response.INSUFFICIENT_MONEY
-        if res > self.__coins2 * self.__coinval2:
-            # using coinval1 == 1
-            self.__coins1 -= res - self.__coins2 * self.__coinval2
-            self.__coins2 = 0
-            self.__balance = 0
-            self.__num2 -= number
-            return VendingMachine.Response.OK
-        if res % self.__coinval2 == 0:
-            self.__coins2 -= res // self.__coinval2
+        res = self.__payChange(res, tooBigChange)
+        if res == VendingMachine.Response.OK:
+            if self.__cow:
+                self.__own()
+            if self.__log is not None:
+                self.__record('balance')
+                self.__recordItem('num', i)
             self.__balance = 0
-            self.__num2 -= number
-            return VendingMachine.Response.OK
-        if self.__coins1 == 0:
+            self.__num[i] -= number
+        return res
+
+    def __putCoin(self, i: int):
+        if self.__coins[i] == self.__maxc[i]:
+            return VendingMachine.Response.CANNOT_PERFORM
+        if self.__cow:
+            self.__own()
+        if self.__log is not None:
+            self.__record('balance', 'payable')
+            self.__recordItem('coins', i)
+        self.__balance += self.__coinvals[i]
+        self.__coins[i] += 1
+        # One more coin can be paid out on top of anything that was payable before.
+        self.__payable |= self.__payable << self.__coinvals[i]
+        return VendingMachine.Response.OK
+
+    # Pays `amount` out of the coin boxes with as few coins as possible. The boxes
+    # are only touched when the result is OK.
+    def __payChange(self, amount: int, tooBigChange: int):
+        if amount > self.__coinSum():
+            return tooBigChange
+        change = self.__change.solve(amount, tuple(self.__coins))
+        if change is None:
             return VendingMachine.Response.UNSUITABLE_CHANGE
-        self.__coins2 -= res // self.__coinval2
-        self.__coins1 -= 1
-        self.__balance = 0
-        self.__num2 -= number
+        if self.__log is not None:
+            self.__record('coins', 'payable')
+        self.__coins = [count - paid for count, paid in zip(self.__coins, change)]
+        # Taking coins out can't be undone bit by bit, so the bitmap is rebuilt.
+        self.__payable = _payableAmounts(self.__coinvals, tuple(self.__coins))
         return VendingMachine.Response.OK
+
+    # Gives this machine its own copy of the lists that are changed in place.
+    def __own(self):
+        self.__prices = list(self.__prices)
+        self.__num = list(self.__num)
+        self.__coins = list(self.__coins)
+        self.__cow = False
+
+    # Returns a new machine in the same state without copying anything: parent and
+    # child share the state lists until one of them changes one in place. Per-instance
+    # wrappers (journals, instrumentation) are not carried over to the child.
+    def fork(self):
+        state = self.__dict__.copy()
+        for name in state.keys() & VendingMachine.__dict__.keys():
+            del state[name]
+        child = object.__new__(type(self))
+        child.__dict__ = state
+        self.__cow = child.__cow = True
+        child.__log = None
+        return child
+
+    # Starts a transaction: from now on every change is logged as the old value of the
+    # field or list item it overwrites, so rollback() costs one step per change. Raises
+    # ValueError if a transaction is already open.
+    def begin(self):
+        if self.__log is not None:
+            raise ValueError("a transaction is already open")
+        self.__log = []
+
+    # Marks the current point of the open transaction for rollback(savepoint).
+    def savepoint(self):
+        if self.__log is None:
+            raise ValueError("no open transaction")
+        return len(self.__log)
+
+    # Keeps every change and ends the transaction.
+    def commit(self):
+        if self.__log is None:
+            raise ValueError("no open transaction")
+        self.__log = None
+
+    # Undoes the changes since `savepoint` and keeps the transaction open, or, without
+    # a savepoint, undoes all of them and ends it. A Journal holds back the records of
+    # a transaction until commit() and drops the undone ones; FleetRegistry and
+    # FleetIndex re-read the machine after a rollback.
+    def rollback(self, savepoint: int = None):
+        log = self.__log
+        if log is None:
+            raise ValueError("no open transaction")
+        if savepoint is not None and not 0 <= savepoint <= len(log):
+            raise ValueError(f"savepoint {savepoint} is not in the transaction")
+        for _ in range(len(log) - (savepoint or 0)):
+            name, i, old = log.pop()
+            if i is None:
+                setattr(self, '_VendingMachine__' + name, old)
+                # A list put back may be shared with a fork taken before it was replaced.
+                if type(old) is list:
+                    self.__cow = True
+            else:
+                if self.__cow:
+                    self.__own()
+                getattr(self, '_VendingMachine__' + name)[i] = old
+        if savepoint is None:
+            self.__log = None
+
+    # `with machine.transaction():` commits when the block ends and rolls back if it
+    # raises. Inside an open transaction it acts as a savepoint instead, undoing only
+    # its own changes on an exception.
+    @contextmanager
+    def transaction(self):
+        if self.__log is not None:
+            savepoint = self.savepoint()
+            try:
+                yield self
+            except BaseException:
+                if self.__log is not None:
+                    self.rollback(savepoint)
+                raise
+            return
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            if self.__log is not None:
+                self.rollback()
+            raise
+        if self.__log is not None:
+            self.commit()
+
+    def __record(self, *names: str):
+        for name in names:
+            self.__log.append((name, None, getattr(self, '_VendingMachine__' + name)))
+
+    def __recordItem(self, name: str, i: int):
+        self.__log.append((name, i, getattr(self, '_VendingMachine__' + name)[i]))
+
+    # Mutable part of the state as (mode, balance, prices, products, coins); the last
+    # three are tuples indexed like the slots and coin kinds. Capacities and coin
+    # values are fixed at construction and not included.
+    def _getState(self):
+        return (self.__mode, self.__balance, tuple(self.__prices), tuple(self.__num), tuple(self.__coins))
+
+    # Restores a state produced by _getState() of a machine with the same configuration.
+    def _setState(self, state):
+        mode, balance, prices, num, coins = state
+        if len(prices) != len(self.__prices) or len(num) != len(self.__num) or len(coins) != len(self.__coins):
+            raise ValueError("state does not match the machine configuration")
+        if self.__log is not None:
+            self.__record('mode', 'balance', 'prices', 'num', 'coins', 'payable')
+        self.__mode = mode
+        self.__balance = balance
+        self.__prices = list(prices)
+        self.__num = list(num)
+        self.__coins = list(coins)
+        self.__payable = _payableAmounts(self.__coinvals, tuple(coins))
+
+    # Builds a machine directly in the given state instead of replaying the calls that
+    # lead there. Products and coins default to empty. Raises ValueError for a state no
+    # machine could be in: wrong lengths, counts out of range, a balance the coin boxes
+    # don't hold, or an open balance in admin mode.
+    @classmethod
+    def from_state(cls, mode: int = Mode.OPERATION, balance: int = 0, prices=(8, 5), products=None, coins=None,
+                   coinValues=(1, 2), coinCapacities=(50, 50), productCapacities=(30, 40)):
+        machine = cls(coinValues, coinCapacities, prices, productCapacities)
+        products = [0] * len(productCapacities) if products is None else products
+        coins = [0] * len(coinCapacities) if coins is None else coins
+        if len(products) != len(productCapacities) or len(coins) != len(coinCapacities):
+            raise ValueError("state does not match the machine configuration")
+        machine.__restore(mode, balance, products, coins)
+        return machine
+
+    # The whole state, configuration included, as keyword arguments of from_state().
+    def state(self):
+        return {'mode': self.__mode, 'balance': self.__balance, 'prices': tuple(self.__prices),
+                'products': tuple(self.__num), 'coins': tuple(self.__coins), 'coinValues': self.__coinvals,
+                'coinCapacities': tuple(self.__maxc), 'productCapacities': tuple(self.__max)}
+
+    # Runs a sequence of (opcode, argument) pairs and returns their Response codes.
+    # ops is either a sequence of pairs or a flat sequence such as array('i')
+    # holding opcode and argument interleaved; the argument of ops that take
+    # none is ignored. exitAdminMode() has no response and is reported as 0.
+    def apply_batch(self, ops):
+        if isinstance(ops, array) or (len(ops) > 0 and isinstance(ops[0], Integral)):
+            if len(ops) % 2 != 0:
+                raise ValueError("flat batch must hold opcode/argument pairs")
+            opcodes, args = ops[0::2], ops[1::2]
+        else:
+            opcodes, args = zip(*ops) if len(ops) > 0 else ((), ())
+        unknown = set(opcodes).difference(range(VendingMachine.Op.PUT_COIN1, VendingMachine.Op.FILL_PRODUCTS + 1))
+        if unknown:
+            raise ValueError(f"unknown opcodes: {sorted(unknown)}")
+
+        # Methods are looked up on the instance so per-instance wrappers are honoured.
+        withArg = (None, None, None, None, self.giveProduct1, self.giveProduct2, self.enterAdminMode, None, None)
+        noArg = (None, self.putCoin1, self.putCoin2, self.returnMoney, None, None, None, self.exitAdminMode, self.fillProducts)
+        out = array('b')
+        append = out.append
+        for op, arg in zip(opcodes, args):
+            method = noArg[op]
+            res = method() if method is not None else withArg[op](arg)
+            append(0 if res is None else res)
+        return out
+
+    # Size in bytes of the packed state written by to_bytes() and pack_into().
+    def packedSize(self):
+        return _packedLayout(len(self.__num), len(self.__coins)).size
+
+    def __packedValues(self):
+        return (self.__mode, len(self.__num), len(self.__coins), self.__balance, *self.__prices, *self.__max,
+                *self.__num, *self.__coinvals, *self.__maxc, *self.__coins)
+
+    # Every number must fit into int64, otherwise ValueError.
+    def to_bytes(self):
+        try:
+            return _packedLayout(len(self.__num), len(self.__coins)).pack(*self.__packedValues())
+        except struct.error as e:
+            raise ValueError(f"state does not fit the packed layout: {e}") from None
+
+    def pack_into(self, buffer, offset: int = 0):
+        try:
+            _packedLayout(len(self.__num), len(self.__coins)).pack_into(buffer, offset, *self.__packedValues())
+        except struct.error as e:
+            raise ValueError(f"state does not fit the packed layout: {e}") from None
+
+    # Reads the packed state at `offset` as (slots, kinds, mode, balance, the other values).
+    @staticmethod
+    def _unpack(buffer, offset: int = 0):
+        try:
+            _, slots, kinds = _PACKED_HEADER.unpack_from(buffer, offset)
+            values = _packedLayout(slots, kinds).unpack_from(buffer, offset)
+            return slots, kinds, values[0], values[3], values[4:]
+        except struct.error as e:
+            raise ValueError(f"truncated packed state: {e}") from None
+
+    # Builds a new machine from a packed state, configuration included. Raises
+    # ValueError for a truncated buffer or a state no machine could be in.
+    @classmethod
+    def from_buffer(cls, buffer, offset: int = 0):
+        slots, kinds, mode, balance, fields = VendingMachine._unpack(buffer, offset)
+        prices, maxn, num = fields[:slots], fields[slots:2 * slots], fields[2 * slots:3 * slots]
+        rest = fields[3 * slots:]
+        coinvals, maxc, coins = rest[:kinds], rest[kinds:2 * kinds], rest[2 * kinds:]
+        machine = cls(coinvals, maxc, prices, maxn)
+        machine.__restore(mode, balance, num, coins)
+        return machine
+
+    # Restores a packed state in place; the configuration in the buffer must match.
+    def unpack_from(self, buffer, offset: int = 0):
+        slots, kinds, mode, balance, fields = VendingMachine._unpack(buffer, offset)
+        if (slots, kinds) != (len(self.__num), len(self.__coins)) or fields[slots:2 * slots] != tuple(self.__max) \
+                or fields[3 * slots + kinds:3 * slots + 2 * kinds] != tuple(self.__maxc) \
+                or fields[3 * slots:3 * slots + kinds] != self.__coinvals:
+            raise ValueError("packed state does not match the machine configuration")
+        if any(price <= 0 for price in fields[:slots]):
+            raise ValueError("prices must be positive")
+        self.__restore(mode, balance, fields[2 * slots:3 * slots], fields[3 * slots + 2 * kinds:])
+        if self.__log is not None:
+            self.__record('prices')
+        self.__prices = list(fields[:slots])
+
+    def __restore(self, mode: int, balance: int, num, coins):
+        if mode not in (VendingMachine.Mode.OPERATION, VendingMachine.Mode.ADMINISTERING) or balance < 0:
+            raise ValueError("invalid mode or balance")
+        if any(n < 0 or n > m for n, m in zip(num, self.__max)) or \
+                any(c < 0 or c > m for c, m in zip(coins, self.__maxc)):
+            raise ValueError("products or coins out of range")
+        if balance > sum(count * value for count, value in zip(coins, self.__coinvals)):
+            raise ValueError("balance exceeds the coins in the machine")
+        if mode == VendingMachine.Mode.ADMINISTERING and balance != 0:
+            raise ValueError("admin mode with an open balance")
+        if self.__log is not None:
+            self.__record('mode', 'balance', 'num', 'coins', 'payable')
+        self.__mode = mode
+        self.__balance = balance
+        self.__num = list(num)
+        self.__coins = list(coins)
+        self.__payable = _payableAmounts(self.__coinvals, tuple(coins))
+
+    # Packs every machine back to back into one buffer (a new bytearray unless one is
+    # given) through a single memoryview and returns it.
+    @staticmethod
+    def snapshot_fleet(machines, buffer=None):
+        machines = list(machines)
+        size = sum(machine.packedSize() for machine in machines)
+        if buffer is None:
+            buffer = bytearray(size)
+        with memoryview(buffer) as view:
+            if view.nbytes < size:
+                raise ValueError(f"buffer holds {view.nbytes} bytes, the fleet needs {size}")
+            offset = 0
+            for machine in machines:
+                machine.pack_into(view, offset)
+                offset += machine.packedSize()
+        return buffer
+
+    # Restores a buffer written by snapshot_fleet(): in place into `machines` if given,
+    # otherwise into new machines built from the packed configurations. Returns the machines.
+    @staticmethod
+    def restore_fleet(buffer, machines=None):
+        with memoryview(buffer) as view:
+            offset = 0
+            if machines is not None:
+                for machine in machines:
+                    machine.unpack_from(view, offset)
+                    offset += machine.packedSize()
+                return machines
+            restored = []
+            while offset < view.nbytes:
+                machine = VendingMachine.from_buffer(view, offset)
+                restored.append(machine)
+                offset += machine.packedSize()
+            return restored
@@ -0,0 +1,189 @@
+import asyncio
+import struct
+
+from VendingMachine import VendingMachine
+
+
+class Protocol:
+    """Framing shared by VendingServer and VendingClient.
+
+    A request is REQUEST (request id, machine id, opcode, argument count) followed
+    by that many int64 arguments. A response is RESPONSE (request id, value), where
+    value is the Response code of a mutating call, the result of a getter, 0 for
+    exitAdminMode() and ERROR for an unknown machine, opcode or argument list, or
+    a call that raised.
+    giveProducts() takes its cart as slot/number argument pairs; putCoins()
+    answers its Response only, the balance tells how much of the burst was taken.
+    Responses on one connection come back in request order, so clients may send
+    any number of requests before reading.
+    """
+
+    REQUEST = struct.Struct('<IIBB')
+    RESPONSE = struct.Struct('<Iq')
+    ARG = struct.Struct('<q')
+    ERROR = -1
+
+    # Getter opcodes, placed after VendingMachine.Op.
+    GET_NUMBER_OF_PRODUCT = 64
+    GET_CURRENT_BALANCE = 65
+    GET_CURRENT_MODE = 66
+    GET_CURRENT_SUM = 67
+    GET_COINS = 68
+    GET_PRICE = 69
+
+    # Method name by opcode.
+    METHODS = {
+        GET_NUMBER_OF_PRODUCT: 'getNumberOfProduct',
+        GET_CURRENT_BALANCE: 'getCurrentBalance',
+        GET_CURRENT_MODE: 'getCurrentMode',
+        GET_CURRENT_SUM: 'getCurrentSum',
+        GET_COINS: 'getCoins',
+        GET_PRICE: 'getPrice',
+    }
+    METHODS.update({op: name for name, op in VendingMachine._MUTATORS.items()})
+
+
+class VendingServer:
+    """Serves the VendingMachine API of many machines from one event loop.
+
+    `machines` is a sequence or mapping indexed by the machine id sent in requests.
+    """
+
+    def __init__(self, machines):
+        self.machines = machines
+        self.__server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: str = None):
+        if path is not None:
+            self.__server = await asyncio.start_unix_server(self.__serve, path=path)
+        else:
+            self.__server = await asyncio.start_server(self.__serve, host, port)
+        return self
+
+    # Address actually bound, useful with port 0.
+    @property
+    def address(self):
+        return self.__server.sockets[0].getsockname()
+
+    async def close(self):
+        self.__server.close()
+        await self.__server.wait_closed()
+
+    async def __serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(1 << 16)
+                if not data:
+                    break
+                buffer += data
+                # Answer every complete request in the buffer with one write.
+                consumed, out = self.__handle(buffer)
+                del buffer[:consumed]
+                if out:
+                    writer.write(out)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def __handle(self, buffer: bytearray):
+        request, response, arg = Protocol.REQUEST, Protocol.RESPONSE, Protocol.ARG
+        out = bytearray()
+        pos = 0
+        while pos + request.size <= len(buffer):
+            requestId, machineId, op, argc = request.unpack_from(buffer, pos)
+            end = pos + request.size + argc * arg.size
+            if end > len(buffer):
+                break
+            args = struct.unpack_from(f'<{argc}q', buffer, pos + request.size)
+            out += response.pack(requestId, self.__call(machineId, op, args))
+            pos = end
+        return pos, out
+
+    def __call(self, machineId: int, op: int, args: tuple):
+        name = Protocol.METHODS.get(op)
+        try:
+            machine = self.machines[machineId]
+        except (IndexError, KeyError):
+            return Protocol.ERROR
+        if name is None:
+            return Protocol.ERROR
+        if op == VendingMachine.Op.GIVE_PRODUCTS:
+            # The cart travels as slot, number, slot, number, ...
+            if len(args) % 2 != 0:
+                return Protocol.ERROR
+            args = (tuple(zip(args[0::2], args[1::2])),)
+        # Whatever a call raises (wrong arguments, a failing machine) is answered, never
+        # allowed to drop the connection and the requests pipelined behind it.
+        try:
+            res = getattr(machine, name)(*args)
+        except Exception:
+            return Protocol.ERROR
+        if op == VendingMachine.Op.PUT_COINS:
+            return res[0]
+        return 0 if res is None else res
+
+
+class VendingClient:
+    """Pipelining client for VendingServer."""
+
+    def __init__(self):
+        self.__reader = None
+        self.__writer = None
+        self.__pending = {}
+        self.__nextId = 0
+        self.__receiver = None
+
+    async def connect(self, host: str = '127.0.0.1', port: int = 0, path: str = None):
+        if path is not None:
+            self.__reader, self.__writer = await asyncio.open_unix_connection(path)
+        else:
+            self.__reader, self.__writer = await asyncio.open_connection(host, port)
+        self.__receiver = asyncio.get_running_loop().create_task(self.__receive())
+        return self
+
+    async def close(self):
+        self.__writer.close()
+        await self.__writer.wait_closed()
+        await self.__receiver
+
+    # Queues one request and returns a future for its value; nothing waits for the server.
+    def send(self, machineId: int, op: int, *args: int):
+        requestId = self.__nextId
+        self.__nextId = (self.__nextId + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.__pending[requestId] = future
+        self.__writer.write(Protocol.REQUEST.pack(requestId, machineId, op, len(args))
+                            + struct.pack(f'<{len(args)}q', *args))
+        return future
+
+    async def call(self, machineId: int, op: int, *args: int):
+        return await self.send(machineId, op, *args)
+
+    # Sends all (machineId, op, *args) requests in one go and returns their values in order.
+    async def pipeline(self, requests):
+        futures = [self.send(*request) for request in requests]
+        await self.__writer.drain()
+        return [await future for future in futures]
+
+    async def __receive(self):
+        response = Protocol.RESPONSE
+        buffer = bytearray()
+        while True:
+            data = await self.__reader.read(1 << 16)
+            if not data:
+                break
+            buffer += data
+            end = len(buffer) - len(buffer) % response.size
+            for requestId, value in response.iter_unpack(bytes(buffer[:end])):
+                # An unknown or repeated id answers nothing we asked; skip it.
+                future = self.__pending.pop(requestId, None)
+                if future is not None and not future.done():
+                    future.set_result(value)
+            del buffer[:end]
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("connection closed"))
+        self.__pending.clear()
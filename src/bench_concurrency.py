@@ -0,0 +1,68 @@
+# Stress benchmark: purchase-session throughput of ShardedFleet by thread count.
+# Usage: python src/bench_concurrency.py [--machines N] [--sessions N] [--stripes N] [--threads 1,2,4,8]
+import argparse
+import threading
+import time
+
+from VendingMachine import VendingMachine
+from ConcurrentVendingMachine import ShardedFleet
+
+ADMIN_CODE = 117345294655382
+
+
+def make_fleet(machines: int, stripes: int):
+    fleet = []
+    for _ in range(machines):
+        machine = VendingMachine(coinCapacities=(10**9, 10**9), productCapacities=(10**9, 10**9))
+        machine.enterAdminMode(ADMIN_CODE)
+        machine.fillProducts()
+        machine.exitAdminMode()
+        fleet.append(machine)
+    return ShardedFleet(fleet, stripes)
+
+
+def run(fleet: ShardedFleet, threads: int, sessions: int):
+    per_thread = sessions // threads
+
+    def work(t: int):
+        for n in range(per_thread):
+            with fleet.locked((t * per_thread + n) % len(fleet)) as machine:
+                # Exact money for product 2 at its default price of 5.
+                machine.putCoin1()
+                machine.putCoin2()
+                machine.putCoin2()
+                machine.giveProduct2(1)
+                machine.returnMoney()
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    # Money is conserved: every sold item left exactly its price in the coin boxes.
+    sold = sum(10**9 - machine.getNumberOfProduct2() for machine in fleet.machines)
+    cash = 0
+    for machine in fleet.machines:
+        machine.enterAdminMode(ADMIN_CODE)
+        cash += machine.getCurrentSum()
+        machine.exitAdminMode()
+    assert sold == per_thread * threads and cash == sold * 5, "lost update"
+    return per_thread * threads * 5 / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ShardedFleet thread scaling benchmark')
+    parser.add_argument('--machines', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=200000)
+    parser.add_argument('--stripes', type=int, default=None)
+    parser.add_argument('--threads', default='1,2,4,8')
+    args = parser.parse_args()
+
+    base = None
+    for threads in (int(t) for t in args.threads.split(',')):
+        rate = run(make_fleet(args.machines, args.stripes), threads, args.sessions)
+        base = base or rate
+        print(f"{threads:3d} threads: {rate:12,.0f} ops/s  ({rate / base:.2f}x)")
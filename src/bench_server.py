@@ -0,0 +1,65 @@
+# Throughput/latency benchmark of VendingServer over a local socket; needs no outside services.
+# Usage: python src/bench_server.py [--machines N] [--requests N] [--depth N] [--unix]
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from VendingMachine import VendingMachine
+from VendingServer import VendingServer, VendingClient
+
+
+def session(machineId: int):
+    # One customer buying product 2 with exact money, then taking the (empty) change.
+    return [(machineId, VendingMachine.Op.PUT_COIN2),
+            (machineId, VendingMachine.Op.PUT_COIN2),
+            (machineId, VendingMachine.Op.PUT_COIN1),
+            (machineId, VendingMachine.Op.GIVE_PRODUCT2, 1),
+            (machineId, VendingMachine.Op.RETURN_MONEY)]
+
+
+async def run(args):
+    machines = [VendingMachine() for _ in range(args.machines)]
+    for machine in machines:
+        machine.enterAdminMode(117345294655382)
+        machine.fillProducts()
+        machine.exitAdminMode()
+
+    path = os.path.join(tempfile.mkdtemp(), 'vending.sock') if args.unix else None
+    server = await VendingServer(machines).start(path=path)
+    client = VendingClient()
+    await (client.connect(path=path) if args.unix else client.connect(*server.address[:2]))
+
+    # Pipelined throughput: `depth` requests in flight per round trip.
+    requests = []
+    while len(requests) < args.requests:
+        requests += session(len(requests) // 5 % args.machines)
+    start = time.perf_counter()
+    for i in range(0, len(requests), args.depth):
+        await client.pipeline(requests[i:i + args.depth])
+    elapsed = time.perf_counter() - start
+    print(f"pipelined: {len(requests) / elapsed:,.0f} req/s (depth {args.depth}, {args.machines} machines)")
+
+    # Unpipelined latency: one request per round trip.
+    samples = []
+    for i in range(min(args.requests, 5000)):
+        start = time.perf_counter()
+        await client.call(i % args.machines, VendingMachine.Op.RETURN_MONEY)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"round trip: p50 {statistics.median(samples) * 1e6:.1f} us, "
+          f"p99 {samples[int(len(samples) * 0.99)] * 1e6:.1f} us")
+
+    await client.close()
+    await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='VendingServer throughput/latency benchmark')
+    parser.add_argument('--machines', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--depth', type=int, default=1000)
+    parser.add_argument('--unix', action='store_true', help='use a Unix socket instead of TCP')
+    asyncio.run(run(parser.parse_args()))
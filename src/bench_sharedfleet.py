@@ -0,0 +1,66 @@
+# Stress benchmark: purchase-session throughput of a SharedFleet by worker process count.
+# Usage: python src/bench_sharedfleet.py [--machines N] [--rounds N] [--block N] [--stripes N] [--processes 1,2,4]
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from SharedFleet import SharedFleet
+
+ADMIN_CODE = 117345294655382
+
+
+# One worker: `rounds` sessions on random blocks of machines, each block held under its locks.
+# Every 20th session on a block refills it, so the boxes never run full.
+def work(fleet: SharedFleet, seed: int, rounds: int, block: int, start):
+    rng = np.random.default_rng(seed)
+    blocks = len(fleet) // block
+    start.wait()
+    for n in range(rounds):
+        idx = np.arange(block) + rng.integers(blocks) * block
+        with fleet.locked(idx):
+            if n % 20 == 0:
+                fleet.enterAdminMode(idx, ADMIN_CODE)
+                fleet.fillProducts(idx)
+                fleet.fillCoins(idx, 1, 1)
+                fleet.exitAdminMode(idx)
+            # Exact money for product 2 at its default price of 5.
+            fleet.putCoins(idx, 1, 2)
+            fleet.giveProduct2(idx, 1)
+    fleet.close()
+
+
+def run(machines: int, stripes: int, processes: int, rounds: int, block: int):
+    context = multiprocessing.get_context('spawn')
+    fleet = SharedFleet(machines, stripes, context)
+    start = context.Barrier(processes + 1)
+    workers = [context.Process(target=work, args=(fleet, p, rounds, block, start)) for p in range(processes)]
+    try:
+        for worker in workers:
+            worker.start()
+        start.wait()
+        t0 = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - t0
+    finally:
+        fleet.close()
+        fleet.unlink()
+    return processes * rounds * block / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SharedFleet process scaling benchmark')
+    parser.add_argument('--machines', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--block', type=int, default=256)
+    parser.add_argument('--stripes', type=int, default=None)
+    parser.add_argument('--processes', default='1,2,4')
+    args = parser.parse_args()
+
+    base = None
+    for processes in (int(p) for p in args.processes.split(',')):
+        rate = run(args.machines, args.stripes, processes, args.rounds, args.block)
+        base = base or rate
+        print(f"{processes:3d} processes: {rate:14,.0f} sessions/s  ({rate / base:.2f}x)")
@@ -0,0 +1,248 @@
+# Micro-benchmarks of every public VendingMachine method and of mixed purchase sessions.
+# Usage: python src/bench_vendingmachine.py [--output run.json] [--compare baseline.json] [--threshold 0.1]
+# With --compare, cases slower than the baseline by more than the threshold are flagged
+# and the exit status is 1.
+import argparse
+import json
+import platform
+import sys
+import time
+
+from VendingMachine import VendingMachine
+
+ADMIN_CODE = 117345294655382
+BIG = 10**9
+
+
+def stocked_machine(admin: bool = False, balance: int = 0):
+    return VendingMachine.from_state(VendingMachine.Mode.ADMINISTERING if admin else VendingMachine.Mode.OPERATION,
+                                     balance, (3, 4), (BIG, BIG), (1000 + balance % 2, 1000 + balance // 2),
+                                     coinCapacities=(BIG, BIG), productCapacities=(BIG, BIG))
+
+
+# name -> (machine factory, call). Each call starts from the factory's state, restored
+# between iterations, so stateful methods always take the same path.
+CASES = {
+    'getNumberOfProduct1': (stocked_machine, lambda m: m.getNumberOfProduct1()),
+    'getNumberOfProduct2': (stocked_machine, lambda m: m.getNumberOfProduct2()),
+    'getNumberOfProduct': (stocked_machine, lambda m: m.getNumberOfProduct(2)),
+    'getNumberOfSlots': (stocked_machine, lambda m: m.getNumberOfSlots()),
+    'getCurrentBalance': (stocked_machine, lambda m: m.getCurrentBalance()),
+    'getCurrentMode': (stocked_machine, lambda m: m.getCurrentMode()),
+    'getCurrentSum': (lambda: stocked_machine(admin=True), lambda m: m.getCurrentSum()),
+    'getCoins1': (lambda: stocked_machine(admin=True), lambda m: m.getCoins1()),
+    'getCoins2': (lambda: stocked_machine(admin=True), lambda m: m.getCoins2()),
+    'getCoins': (lambda: stocked_machine(admin=True), lambda m: m.getCoins(2)),
+    'getCoinValues': (stocked_machine, lambda m: m.getCoinValues()),
+    'getPrice1': (stocked_machine, lambda m: m.getPrice1()),
+    'getPrice2': (stocked_machine, lambda m: m.getPrice2()),
+    'getPrice': (stocked_machine, lambda m: m.getPrice(2)),
+    'fillProducts': (lambda: stocked_machine(admin=True), lambda m: m.fillProducts()),
+    'fillCoins': (lambda: stocked_machine(admin=True), lambda m: m.fillCoins(10, 10)),
+    'enterAdminMode': (stocked_machine, lambda m: m.enterAdminMode(ADMIN_CODE)),
+    'exitAdminMode': (lambda: stocked_machine(admin=True), lambda m: m.exitAdminMode()),
+    'setPrices': (lambda: stocked_machine(admin=True), lambda m: m.setPrices(5, 6)),
+    'setPrice': (lambda: stocked_machine(admin=True), lambda m: m.setPrice(2, 6)),
+    'putCoin1': (stocked_machine, lambda m: m.putCoin1()),
+    'putCoin2': (stocked_machine, lambda m: m.putCoin2()),
+    'putCoin': (stocked_machine, lambda m: m.putCoin(2)),
+    'putCoins': (stocked_machine, lambda m: m.putCoins(3, 4)),
+    'returnMoney': (lambda: stocked_machine(balance=7), lambda m: m.returnMoney()),
+    'giveProduct1': (lambda: stocked_machine(balance=7), lambda m: m.giveProduct1(1)),
+    'giveProduct2': (lambda: stocked_machine(balance=7), lambda m: m.giveProduct2(1)),
+    'giveProduct': (lambda: stocked_machine(balance=7), lambda m: m.giveProduct(2, 1)),
+    'giveProducts': (lambda: stocked_machine(balance=11), lambda m: m.giveProducts({1: 1, 2: 2})),
+    'apply_batch': (stocked_machine, lambda m: m.apply_batch(SESSION_OPS)),
+    'packedSize': (stocked_machine, lambda m: m.packedSize()),
+    'to_bytes': (stocked_machine, lambda m: m.to_bytes()),
+    'pack_into': (stocked_machine, lambda m: m.pack_into(PACKED_BUFFER)),
+    'from_buffer': (stocked_machine, lambda m: VendingMachine.from_buffer(PACKED_BUFFER)),
+    'unpack_from': (stocked_machine, lambda m: m.unpack_from(PACKED_BUFFER)),
+    'snapshot_fleet': (stocked_machine, lambda m: VendingMachine.snapshot_fleet((m,), PACKED_BUFFER)),
+    'restore_fleet': (stocked_machine, lambda m: VendingMachine.restore_fleet(PACKED_BUFFER, (m,))),
+    'fork': (stocked_machine, lambda m: m.fork()),
+    'from_state': (stocked_machine, lambda m: VendingMachine.from_state(**STATE)),
+    'state': (stocked_machine, lambda m: m.state()),
+    'canMakeChange': (stocked_machine, lambda m: m.canMakeChange(1999)),
+    'canBuy': (lambda: stocked_machine(balance=7), lambda m: m.canBuy(2, 1)),
+    'begin': (stocked_machine, lambda m: empty_transaction(m)),
+    'savepoint': (stocked_machine, lambda m: savepoint_after_coin(m)),
+    'commit': (stocked_machine, lambda m: committed_session(m)),
+    'rollback': (stocked_machine, lambda m: rolled_back_session(m)),
+    'transaction': (stocked_machine, lambda m: transaction_session(m)),
+}
+
+PACKED_BUFFER = bytearray(stocked_machine().to_bytes())
+STATE = stocked_machine(balance=7).state()
+
+SESSION_OPS = [(VendingMachine.Op.PUT_COIN2, 0), (VendingMachine.Op.PUT_COIN2, 0),
+               (VendingMachine.Op.PUT_COIN1, 0), (VendingMachine.Op.GIVE_PRODUCT2, 1),
+               (VendingMachine.Op.RETURN_MONEY, 0)]
+
+
+def session_exact(m: VendingMachine):
+    m.putCoin2()
+    m.putCoin2()
+    m.giveProduct2(1)
+    m.returnMoney()
+
+
+def session_change(m: VendingMachine):
+    m.putCoin2()
+    m.putCoin2()
+    m.putCoin2()
+    m.putCoin1()
+    m.giveProduct1(2)
+    m.returnMoney()
+
+
+def session_browse(m: VendingMachine):
+    m.getPrice1()
+    m.getPrice2()
+    m.getNumberOfProduct2()
+    m.putCoin2()
+    m.giveProduct2(1)
+    m.putCoin2()
+    m.putCoin1()
+    m.giveProduct2(1)
+    m.returnMoney()
+
+
+# Transactions close again, since the state restored between iterations doesn't
+# include the open transaction.
+def empty_transaction(m: VendingMachine):
+    m.begin()
+    return m.commit()
+
+
+def savepoint_after_coin(m: VendingMachine):
+    m.begin()
+    m.putCoin2()
+    savepoint = m.savepoint()
+    m.commit()
+    return savepoint
+
+
+def committed_session(m: VendingMachine):
+    m.begin()
+    session_exact(m)
+    return m.commit()
+
+
+def rolled_back_session(m: VendingMachine):
+    m.begin()
+    session_exact(m)
+    return m.rollback()
+
+
+def transaction_session(m: VendingMachine):
+    with m.transaction():
+        session_exact(m)
+
+
+SESSIONS = {
+    'session_exact_money': (stocked_machine, session_exact),
+    'session_with_change': (stocked_machine, session_change),
+    'session_browse_and_top_up': (stocked_machine, session_browse),
+}
+
+
+def timer_overhead(samples: int = 10000):
+    clock = time.perf_counter_ns
+    deltas = []
+    for _ in range(samples):
+        t0 = clock()
+        deltas.append(clock() - t0)
+    deltas.sort()
+    return deltas[len(deltas) // 2]
+
+
+def measure(factory, call, iterations: int, overhead: int):
+    machine = factory()
+    state = machine._getState()
+    restore = machine._setState
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(iterations):
+        restore(state)
+        t0 = clock()
+        call(machine)
+        samples.append(clock() - t0)
+    samples = sorted(max(s - overhead, 1) for s in samples)
+    mean = sum(samples) / len(samples)
+    return {
+        'ops_per_sec': 1e9 / mean,
+        'mean_ns': mean,
+        'p50_ns': samples[len(samples) // 2],
+        'p99_ns': samples[int(len(samples) * 0.99)],
+        'iterations': iterations,
+    }
+
+
+def run(iterations: int = 20000, cases=None):
+    overhead = timer_overhead()
+    results = {}
+    for name, (factory, call) in dict(CASES, **SESSIONS).items():
+        if cases is None or name in cases:
+            results[name] = measure(factory, call, iterations, overhead)
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': iterations,
+            'timer_overhead_ns': overhead,
+        },
+        'results': results,
+    }
+
+
+# Returns {name: relative slowdown} for cases whose mean latency grew by more than `threshold`.
+def compare(baseline: dict, current: dict, threshold: float):
+    flagged = {}
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        slowdown = now['mean_ns'] / before['mean_ns'] - 1
+        if slowdown > threshold:
+            flagged[name] = slowdown
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='VendingMachine micro-benchmarks')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+    parser.add_argument('cases', nargs='*', help='run only these cases')
+    args = parser.parse_args(argv)
+
+    current = run(args.iterations, set(args.cases) or None)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"{'case':28} {'ops/s':>12} {'mean ns':>9} {'p50 ns':>8} {'p99 ns':>8}  change")
+    for name, r in current['results'].items():
+        change = ''
+        if baseline and name in baseline['results']:
+            change = f"{r['mean_ns'] / baseline['results'][name]['mean_ns'] - 1:+.1%}"
+        print(f"{name:28} {r['ops_per_sec']:12,.0f} {r['mean_ns']:9.0f} {r['p50_ns']:8d} {r['p99_ns']:8d}  {change}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if baseline:
+        flagged = compare(baseline, current, args.threshold)
+        for name, slowdown in flagged.items():
+            print(f"REGRESSION {name}: {slowdown:+.1%} (threshold {args.threshold:.0%})")
+        return 1 if flagged else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
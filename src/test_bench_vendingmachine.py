@@ -0,0 +1,48 @@
+from VendingMachine import VendingMachine
+import bench_vendingmachine
+import json
+
+"""
+bench_vendingmachine tests.
+"""
+# Tests that every public VendingMachine method has a benchmark case.
+def test_cases_CoverPublicMethods():
+    public = {name for name in dir(VendingMachine) if not name.startswith('_') and callable(getattr(VendingMachine, name))}
+    public -= {'Mode', 'Response', 'Op'}
+    assert public <= set(bench_vendingmachine.CASES)
+
+# Tests that every case starts from a state where it does real work.
+def test_cases_SucceedFromTheirState():
+    for name, (factory, call) in bench_vendingmachine.CASES.items():
+        if name.startswith('get'):
+            continue
+        result = call(factory())
+        if name == 'apply_batch':
+            assert set(result) == {VendingMachine.Response.OK}
+        elif name == 'putCoins':
+            assert result[0] == VendingMachine.Response.OK
+        elif name in ('packedSize', 'to_bytes', 'from_buffer', 'snapshot_fleet', 'restore_fleet', 'fork',
+                      'from_state', 'state', 'canMakeChange', 'canBuy',
+                      'savepoint'):
+            assert result, name
+        else:
+            assert result in (None, VendingMachine.Response.OK), name
+
+# Tests flagging only slowdowns above the threshold.
+def test_compare_Threshold():
+    baseline = {'results': {'a': {'mean_ns': 100.0}, 'b': {'mean_ns': 100.0}, 'c': {'mean_ns': 100.0}}}
+    current = {'results': {'a': {'mean_ns': 109.0}, 'b': {'mean_ns': 125.0}, 'd': {'mean_ns': 500.0}}}
+    assert list(bench_vendingmachine.compare(baseline, current, 0.10)) == ['b']
+
+# Tests the JSON round trip and the exit status of a flagged comparison.
+def test_main_JsonAndExitStatus(tmp_path):
+    output = str(tmp_path / "run.json")
+    assert bench_vendingmachine.main(['--iterations', '50', '--output', output, 'putCoin1', 'giveProduct1']) == 0
+    with open(output) as f:
+        run = json.load(f)
+    assert set(run['results']) == {'putCoin1', 'giveProduct1'}
+    for result in run['results'].values():
+        result['mean_ns'] /= 100
+    with open(output, 'w') as f:
+        json.dump(run, f)
+    assert bench_vendingmachine.main(['--iterations', '50', '--compare', output, 'putCoin1']) == 1
@@ -0,0 +1,78 @@
+from ChangeMaker import ChangeMaker
+from itertools import product
+import random
+import pytest
+
+# Helper function: fewest coins paying `amount` by trying every combination.
+def brute_force_fewest_coins(values: tuple, counts: tuple, amount: int):
+    best = None
+    for change in product(*(range(c + 1) for c in counts)):
+        if sum(v * n for v, n in zip(values, change)) == amount:
+            if best is None or sum(change) < best:
+                best = sum(change)
+    return best
+
+"""
+ChangeMaker.solve() tests.
+"""
+# Tests paying nothing.
+def test_solve_ZeroAmount():
+    assert ChangeMaker((1, 2, 5)).solve(0, (3, 3, 3)) == (0, 0, 0)
+
+# Tests returning None when the exact amount can't be formed.
+@pytest.mark.parametrize("values, counts, amount", [((1, 2), (0, 5), 3),
+                                                    ((2, 5), (10, 10), 3),
+                                                    ((3, 5), (1, 1), 7),
+                                                    ((1, 2), (1, 1), 4)])
+def test_solve_Unsuitable(values: tuple, counts: tuple, amount: int):
+    assert ChangeMaker(values).solve(amount, counts) is None
+
+# Tests preferring fewer coins where greedy would fail (6 = 3 + 3, not 4 + 1 + 1).
+def test_solve_NonCanonicalDenominations():
+    assert ChangeMaker((1, 3, 4)).solve(6, (5, 5, 5)) == (0, 2, 0)
+
+# Tests that solutions are exact, within the boxes and minimal on random denominations.
+@pytest.mark.parametrize("seed", range(20))
+def test_solve_MatchesBruteForce(seed: int):
+    rng = random.Random(seed)
+    values = tuple(sorted(rng.sample(range(1, 12), rng.randint(2, 4))))
+    counts = tuple(rng.randint(0, 4) for _ in values)
+    maker = ChangeMaker(values)
+    for amount in range(sum(v * c for v, c in zip(values, counts)) + 2):
+        change = maker.solve(amount, counts)
+        expected = brute_force_fewest_coins(values, counts, amount)
+        if expected is None:
+            assert change is None
+        else:
+            assert all(0 <= n <= c for n, c in zip(change, counts))
+            assert sum(v * n for v, n in zip(values, change)) == amount
+            assert sum(change) == expected
+
+# Tests that repeated queries are served from the bounded cache.
+def test_solve_Cached():
+    maker = ChangeMaker((1, 2, 5), cacheSize=2)
+    maker.solve(7, (5, 5, 5))
+    maker.solve(7, (5, 5, 5))
+    assert maker.solve.cache_info().hits == 1
+    maker.solve(8, (5, 5, 5))
+    maker.solve(9, (5, 5, 5))
+    assert maker.solve.cache_info().currsize == 2
+
+# Tests sharing one solver per set of denominations.
+def test_shared_SameDenominations():
+    assert ChangeMaker.shared((1, 2)) is ChangeMaker.shared([1, 2])
+    assert ChangeMaker.shared((1, 2)) is not ChangeMaker.shared((1, 2, 5))
+
+# Tests rejecting non-positive denominations.
+@pytest.mark.parametrize("values", [(), (0, 1), (1, -2)])
+def test_init_InvalidValues(values: tuple):
+    with pytest.raises(ValueError):
+        ChangeMaker(values)
+
+# Tests pickling: the shared solver stays shared, others keep their cache size.
+def test_pickle_SharedAndPrivate():
+    import pickle
+    assert pickle.loads(pickle.dumps(ChangeMaker.shared((1, 2)))) is ChangeMaker.shared((1, 2))
+    copy = pickle.loads(pickle.dumps(ChangeMaker((1, 3), cacheSize=7)))
+    assert copy.coinValues == (1, 3)
+    assert copy.solve.cache_parameters()['maxsize'] == 7
@@ -0,0 +1,162 @@
+from VendingMachine import VendingMachine
+from ConcurrentVendingMachine import ConcurrentVendingMachine, ShardedFleet
+import sys
+import threading
+import pytest
+
+ADMIN_CODE = 117345294655382
+THREADS = 8
+
+# Helper function to run `work(thread_index)` on THREADS threads with frequent switching.
+def run_threads(work):
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+"""
+ConcurrentVendingMachine tests.
+"""
+# Tests that no inserted coin is lost when many threads insert at once.
+def test_putCoin_NoLostUpdates():
+    machine = ConcurrentVendingMachine(coinCapacities=(10**6, 10**6))
+    run_threads(lambda i: [(machine.putCoin1(), machine.putCoin2()) for _ in range(2000)])
+    assert machine.getCurrentBalance() == THREADS * 2000 * 3
+    machine.returnMoney()
+    machine.enterAdminMode(ADMIN_CODE)
+    assert machine.getCoins1() == 0
+    assert machine.getCoins2() == 0
+
+# Tests that the machine keeps the VendingMachine behaviour.
+def test_concurrentMachine_SameResponses():
+    machine, plain = ConcurrentVendingMachine(), VendingMachine()
+    for m in (machine, plain):
+        m.enterAdminMode(ADMIN_CODE)
+        m.fillProducts()
+        m.exitAdminMode()
+    ops = [(VendingMachine.Op.PUT_COIN2, 0)] * 3 + [(VendingMachine.Op.GIVE_PRODUCT2, 1), (VendingMachine.Op.RETURN_MONEY, 0)]
+    assert machine.apply_batch(ops) == plain.apply_batch(ops)
+    assert machine._getState() == plain._getState()
+
+"""
+ShardedFleet tests.
+"""
+# Tests that sessions on a shared machine stay atomic and money is conserved.
+@pytest.mark.parametrize("stripes", [None, 2])
+def test_shardedFleet_Sessions(stripes):
+    machines = [VendingMachine(coinCapacities=(10**6, 10**6)) for _ in range(4)]
+    for machine in machines:
+        machine.enterAdminMode(ADMIN_CODE)
+        machine.setPrices(4, 4)
+        machine.fillProducts()
+        machine.exitAdminMode()
+    fleet = ShardedFleet(machines, stripes)
+    responses = []
+
+    def work(i):
+        for n in range(5):
+            with fleet.locked((i + n) % len(fleet)) as machine:
+                machine.putCoin2()
+                machine.putCoin2()
+                responses.append(machine.giveProduct1(1))
+    run_threads(work)
+
+    assert responses == [VendingMachine.Response.OK] * THREADS * 5
+    sold = sum(30 - fleet.call(i, 'getNumberOfProduct1') for i in range(len(fleet)))
+    assert sold == THREADS * 5
+    for i in range(len(fleet)):
+        fleet.call(i, 'enterAdminMode', ADMIN_CODE)
+    assert sum(fleet.call(i, 'getCurrentSum') for i in range(len(fleet))) == sold * 4
+
+# Tests that a fork is thread-safe on its own lock.
+def test_fork_OwnLock():
+    machine = ConcurrentVendingMachine()
+    child = machine.fork()
+    assert isinstance(child, ConcurrentVendingMachine)
+    assert child._lock is not machine._lock
+    with machine._lock:
+        assert child.putCoin1() == VendingMachine.Response.OK
+    assert machine.getCurrentBalance() == 0
+
+# Tests that from_state() builds a locked machine.
+def test_fromState_OwnClassAndLock():
+    machine = ConcurrentVendingMachine.from_state(balance=2, coins=(0, 1))
+    assert isinstance(machine, ConcurrentVendingMachine)
+    with machine._lock:
+        assert machine.state()['balance'] == 2
+    assert machine.returnMoney() == VendingMachine.Response.OK
+
+# Tests that a transaction holds the machine, so its rollback never undoes other threads' coins.
+def test_transaction_HoldsLock():
+    machine = ConcurrentVendingMachine(coinCapacities=(10**6, 10**6))
+
+    def work(i):
+        for _ in range(500):
+            if i % 2:
+                machine.putCoin1()
+                continue
+            with machine.transaction():
+                machine.putCoin1()
+                machine.putCoin2()
+                machine.rollback()
+    run_threads(work)
+    assert machine.getCurrentBalance() == THREADS // 2 * 500
+
+# Tests that the locked methods take keyword arguments like VendingMachine's.
+def test_locked_KeywordArguments():
+    machine = ConcurrentVendingMachine()
+    buffer = bytearray(8 + machine.packedSize())
+    machine.pack_into(buffer, offset=8)
+    machine.begin()
+    savepoint = machine.savepoint()
+    assert machine.putCoin1() == VendingMachine.Response.OK
+    machine.rollback(savepoint=savepoint)
+    assert machine.getCurrentBalance() == 0
+    machine.commit()
+    assert machine.giveProduct1(number=1) == VendingMachine.Response.INSUFFICIENT_PRODUCT
+    assert bytes(buffer[8:]) == machine.to_bytes()
+
+# Tests that begin() holds the machine until rollback(), so a coin another thread
+# inserts meanwhile waits and isn't undone.
+def test_begin_HoldsLockUntilRollback():
+    machine = ConcurrentVendingMachine()
+    begun, inserted = threading.Event(), threading.Event()
+    responses = []
+
+    def insert():
+        begun.wait()
+        responses.append(machine.putCoin2())
+        inserted.set()
+    thread = threading.Thread(target=insert)
+    thread.start()
+    machine.begin()
+    machine.putCoin1()
+    begun.set()
+    assert not inserted.wait(0.2)
+    machine.rollback()
+    thread.join()
+    assert responses == [VendingMachine.Response.OK]
+    assert machine.getCurrentBalance() == 2
+    with pytest.raises(ValueError):
+        machine.commit()
+    machine.begin()
+    with pytest.raises(ValueError):
+        machine.begin()
+    machine.commit()
+    thread = threading.Thread(target=machine.putCoin1)
+    thread.start()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert machine.getCurrentBalance() == 3
+
+# Tests rejecting an empty sharded fleet and stripe counts below one.
+@pytest.mark.parametrize("machines, stripes", [([], None), ([], 2), ([VendingMachine()], 0), ([VendingMachine()], -1)])
+def test_shardedFleet_Invalid(machines, stripes):
+    with pytest.raises(ValueError):
+        ShardedFleet(machines, stripes)
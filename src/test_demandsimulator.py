@@ -0,0 +1,68 @@
+from VendingMachine import VendingMachine
+from DemandSimulator import DemandSimulator
+import numpy as np
+
+ADMIN_CODE = 117345294655382
+
+"""
+DemandSimulator tests.
+"""
+# Tests that the same seed gives the same statistics.
+def test_run_Deterministic():
+    first = DemandSimulator(50, seed=7).run(20)
+    second = DemandSimulator(50, seed=7).run(20)
+    for name in first:
+        assert (first[name] == second[name]).all()
+
+# Tests that without refills no machine sells more than it was stocked with.
+def test_run_SalesBoundedByStock():
+    sim = DemandSimulator(100, arrivalRate=20.0, refillCoins=(50, 50), seed=1)
+    stats = sim.run(30)
+    machines = np.arange(100)
+    assert (stats['sales1'] + sim.fleet.getNumberOfProduct1(machines) == 30).all()
+    assert (stats['sales2'] + sim.fleet.getNumberOfProduct2(machines) == 40).all()
+
+# Tests stock-outs being recorded together with the step they first happened on.
+def test_run_StockoutsRecorded():
+    sim = DemandSimulator(20, arrivalRate=30.0, refillCoins=(10, 10), prices=(1, 1), seed=2)
+    stats = sim.run(10)
+    hit = stats['stockouts'] > 0
+    assert hit.any()
+    assert ((stats['firstStockout'] >= 0) == hit).all()
+    assert (stats['firstStockout'][hit] < 10).all()
+
+# Tests that full coin boxes are counted and every customer is accounted for.
+def test_run_CoinBoxFullCounted():
+    sim = DemandSimulator(10, arrivalRate=10.0, refillCoins=(50, 50), seed=3)
+    stats = sim.run(5)
+    assert stats['coinBoxFull'].sum() > 0
+    assert stats['customers'].sum() > 0
+    assert sim.summary()['customers'] == stats['customers'].sum()
+
+# Tests that refill visits restock the machines and leave them in operation mode.
+def test_run_RefillEvery():
+    sim = DemandSimulator(10, arrivalRate=30.0, refillEvery=2, refillCoins=(10, 10), prices=(1, 1), seed=4)
+    sim.run(3)
+    machines = np.arange(10)
+    assert (sim.fleet.getCurrentMode(machines) == VendingMachine.Mode.OPERATION).all()
+    assert (sim.fleet.getNumberOfProduct1(machines) < 30).any()
+    sim.refill(machines)
+    assert (sim.fleet.getNumberOfProduct1(machines) == 30).all()
+    assert (sim.fleet.getCurrentBalance(machines) == 0).all()
+
+# Tests that collecting the cash keeps the coin boxes from filling up.
+def test_run_CollectEvery():
+    kept = DemandSimulator(50, arrivalRate=10.0, refillCoins=(20, 20), seed=5)
+    collected = DemandSimulator(50, arrivalRate=10.0, refillCoins=(20, 20), collectEvery=1, seed=5)
+    kept.run(10)
+    collected.run(10)
+    assert collected.summary()['coinBoxFull'] < kept.summary()['coinBoxFull'] // 2
+    assert collected.summary()['sales1'] > kept.summary()['sales1']
+
+# Tests that overpaying customers run into change failures once the 1-coins are gone.
+def test_run_OverpayChangeFailures():
+    sim = DemandSimulator(20, arrivalRate=10.0, coin1Share=0.0, refillCoins=(1, 5), collectEvery=1,
+                          overpay=3, seed=6)
+    stats = sim.run(5)
+    assert stats['unsuitableChange'].sum() > 0
+    assert stats['sales1'].sum() + stats['sales2'].sum() > 0
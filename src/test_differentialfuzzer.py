@@ -0,0 +1,37 @@
+from VendingMachine import VendingMachine
+import DifferentialFuzzer
+import random
+
+# VendingMachine with bug 14 reintroduced: putCoin1() accepts a coin into a full box.
+class FullBoxBugMachine(VendingMachine):
+    def putCoin1(self):
+        res = super().putCoin1()
+        return VendingMachine.Response.OK if res == VendingMachine.Response.CANNOT_PERFORM else res
+
+"""
+ReferenceMachine and fuzz() tests.
+"""
+# Tests that the machine agrees with the reference model on random sequences.
+def test_fuzz_NoDisagreement():
+    assert DifferentialFuzzer.fuzz(500, length=60, seed=1, workers=1) is None
+
+# Tests fuzzing through a process pool.
+def test_fuzz_ProcessPool():
+    assert DifferentialFuzzer.fuzz(200, length=40, seed=2, workers=2, chunk=50) is None
+
+# Tests that generated sequences are reproducible from the seed.
+def test_generate_Deterministic():
+    assert DifferentialFuzzer.generate(random.Random(7), 30) == DifferentialFuzzer.generate(random.Random(7), 30)
+
+# Tests finding a planted bug and shrinking it to a minimal reproducer.
+def test_fuzz_FindsAndShrinksBug():
+    failure = DifferentialFuzzer.fuzz(2000, length=200, seed=3, workers=1, factory=FullBoxBugMachine)
+    assert failure is not None
+    _, ops = failure
+    assert DifferentialFuzzer.check(ops, FullBoxBugMachine) is not None
+    assert DifferentialFuzzer.check(ops) is None
+    # The reproducer must still reach a full box and then insert one more coin ...
+    assert ops[-1] == ('putCoin1', ())
+    # ... and dropping any single operation makes the bug disappear.
+    for i in range(len(ops)):
+        assert DifferentialFuzzer.check(ops[:i] + ops[i + 1:], FullBoxBugMachine) is None
@@ -0,0 +1,100 @@
+from VendingMachine import VendingMachine
+from FleetIndex import FleetIndex
+from FleetRegistry import FleetRegistry
+from test_fleetregistry import random_call
+import random
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to answer a query by looping over the machines.
+def brute_force(machines: list, field: str, low: int, high: int):
+    found = []
+    for i, machine in enumerate(machines):
+        _, balance, _, num, coins = machine._getState()
+        value = dict(product1=num[0], product2=num[1], coins1=coins[0], coins2=coins[1], balance=balance)[field]
+        if low <= value and (high is None or value < high):
+            found.append(i)
+    return found
+
+"""
+FleetIndex tests.
+"""
+# Tests that every query matches a full scan under random traffic on a mixed fleet.
+@pytest.mark.parametrize("seed", range(3))
+def test_query_MatchesBruteForce(seed: int):
+    rng = random.Random(seed)
+    machines = [VendingMachine() for _ in range(10)]
+    machines += [VendingMachine(coinValues=(1, 2, 5), coinCapacities=(20, 20, 20),
+                                prices=(3, 4, 6), productCapacities=(5, 5, 5)) for _ in range(5)]
+    index = FleetIndex(machines)
+    for _ in range(1500):
+        random_call(rng, machines)
+        field = rng.choice(FleetIndex.FIELDS)
+        low, high = rng.randint(0, 20), rng.choice([None, rng.randint(0, 45)])
+        found = index.query(field, low, high)
+        assert sorted(found) == brute_force(machines, field, low, high)
+        assert len(found) == len(set(found))
+
+# Tests the dispatcher queries and the order of the results.
+def test_query_LowStock():
+    machines = [VendingMachine.from_state(products=(0, n), coins=(0, 2 * n), balance=n % 3) for n in (7, 2, 4, 9)]
+    index = FleetIndex(machines)
+    assert sorted(index.query('product2', high=5)) == [1, 2]
+    assert index.query('coins2', high=10) == [1, 2]
+    assert index.query('coins2', 5) == [2, 0, 3]
+    assert sorted(index.query('balance', 1)) == [0, 1, 2]
+    assert index.query('product1', 1) == []
+    assert index.query('coins2', 30, 40) == []
+    with pytest.raises(ValueError):
+        index.query('price1')
+
+# Tests buckets following a sale, a partly rejected burst and apply_batch().
+def test_query_Updates():
+    machine = VendingMachine.from_state(products=(3, 3), coins=(48, 0))
+    index = FleetIndex([machine])
+    assert machine.putCoins(5, 1)[0] == VendingMachine.Response.CANNOT_PERFORM
+    assert index.query('coins1', 50) == [0]
+    assert index.query('balance', 4, 5) == [0]
+    assert machine.giveProduct2(1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    machine.apply_batch([(VendingMachine.Op.PUT_COIN2, 0), (VendingMachine.Op.GIVE_PRODUCT2, 1)])
+    assert index.query('product2', 0, 3) == [0]
+    assert index.query('balance', 1) == []
+
+# Tests that indexed machines still take keyword arguments.
+def test_wrap_KeywordArguments():
+    machine = VendingMachine.from_state(products=(3, 3), coins=(5, 5))
+    index = FleetIndex([machine])
+    assert machine.putCoin(kind=2) == VendingMachine.Response.OK
+    assert machine.giveProduct1(number=1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    assert machine.giveProduct2(number=1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    assert index.query('coins2', 6, 7) == [0]
+    assert index.query('balance', 2, 3) == [0]
+
+# Tests refresh() and close(), stacked with a registry.
+def test_refreshAndClose():
+    machine = VendingMachine()
+    registry = FleetRegistry([machine])
+    index = FleetIndex([machine])
+    machine._setState((VendingMachine.Mode.OPERATION, 4, (8, 5), (1, 0), (0, 2)))
+    assert index.query('balance', 1) == []
+    index.refresh()
+    registry.refresh()
+    assert index.query('balance', 1) == [0]
+    index.close()
+    machine.putCoin1()
+    assert index.query('balance', 5) == []
+    assert registry.getTotalBalance() == 5
+
+# Tests that buckets follow rolled-back transactions.
+def test_query_Rollback():
+    machine = VendingMachine.from_state(prices=(1, 1), products=(2, 2))
+    index = FleetIndex([machine])
+    with pytest.raises(KeyError):
+        with machine.transaction():
+            machine.putCoin2()
+            assert machine.giveProduct1(2) == VendingMachine.Response.OK
+            raise KeyError
+    assert index.query('product1', 2, 3) == [0]
+    assert index.query('coins2', 1) == []
+    assert index.query('balance', 0, 1) == [0]
@@ -0,0 +1,131 @@
+from VendingMachine import VendingMachine
+from FleetRegistry import FleetRegistry
+from Instrumentation import Instrumentation
+import random
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to compute every aggregate by looping over the machines.
+def brute_force(machines: list):
+    cash = balance = admin = 0
+    products, empty = [0, 0, 0], [0, 0, 0]
+    for machine in machines:
+        mode, b, _, num, coins = machine._getState()
+        cash += sum(c * v for c, v in zip(coins, machine.getCoinValues()))
+        balance += b
+        admin += mode == VendingMachine.Mode.ADMINISTERING
+        for slot, n in enumerate(num):
+            products[slot] += n
+            empty[slot] += n == 0
+    return cash, balance, admin, products, empty
+
+# Helper function to read every aggregate from the registry.
+def aggregates(registry: FleetRegistry):
+    return (registry.getTotalCash(), registry.getTotalBalance(), registry.getMachinesInAdminMode(),
+            [registry.getTotalProducts(slot) for slot in (1, 2, 3)],
+            [registry.getMachinesOutOfProduct(slot) for slot in (1, 2, 3)])
+
+# Helper function to run one random public call on a random machine.
+def random_call(rng: random.Random, machines: list):
+    machine = rng.choice(machines)
+    name, args = rng.choice([
+        ('putCoin1', ()), ('putCoin2', ()), ('putCoin', (rng.randint(1, 3),)), ('returnMoney', ()),
+        ('giveProduct1', (rng.randint(1, 3),)), ('giveProduct2', (rng.randint(1, 3),)),
+        ('giveProduct', (rng.randint(1, 3), rng.randint(1, 3))), ('enterAdminMode', (ADMIN_CODE,)),
+        ('exitAdminMode', ()), ('fillProducts', ()), ('setPrices', (2, 3)),
+        ('fillCoins', (rng.randint(1, 10), rng.randint(1, 10))),
+        ('putCoins', (rng.randint(0, 30), rng.randint(0, 30))),
+    ])
+    getattr(machine, name)(*args)
+
+"""
+FleetRegistry tests.
+"""
+# Tests that the aggregates track random traffic on a mixed fleet exactly.
+@pytest.mark.parametrize("seed", range(5))
+def test_aggregates_MatchBruteForce(seed: int):
+    rng = random.Random(seed)
+    machines = [VendingMachine() for _ in range(10)]
+    machines += [VendingMachine(coinValues=(1, 2, 5), coinCapacities=(20, 20, 20),
+                                prices=(3, 4, 6), productCapacities=(5, 5, 5)) for _ in range(5)]
+    registry = FleetRegistry(machines)
+    assert aggregates(registry) == brute_force(machines)
+    for _ in range(2000):
+        random_call(rng, machines)
+        assert aggregates(registry) == brute_force(machines)
+
+# Tests the aggregates of a fresh fleet and of unknown slots.
+def test_aggregates_Fresh():
+    registry = FleetRegistry([VendingMachine(), VendingMachine()])
+    assert registry.getTotalCash() == 0
+    assert registry.getMachinesOutOfProduct(1) == 2
+    assert registry.getMachinesOutOfProduct(3) == 0
+    assert registry.getTotalProducts(0) == 0
+
+# Tests apply_batch() calls being seen through the wrappers.
+def test_aggregates_ApplyBatch():
+    machine = VendingMachine()
+    registry = FleetRegistry([machine])
+    machine.apply_batch([(VendingMachine.Op.ENTER_ADMIN_MODE, ADMIN_CODE), (VendingMachine.Op.FILL_PRODUCTS, 0),
+                         (VendingMachine.Op.EXIT_ADMIN_MODE, 0), (VendingMachine.Op.PUT_COIN2, 0)])
+    assert registry.getTotalBalance() == 2
+    assert registry.getTotalCash() == 2
+    assert registry.getTotalProducts(1) == 30
+    assert registry.getMachinesOutOfProduct(1) == 0
+
+# Tests refresh() picking up changes made behind the wrappers.
+def test_refresh():
+    machine = VendingMachine()
+    registry = FleetRegistry([machine])
+    machine._setState((VendingMachine.Mode.OPERATION, 4, (8, 5), (1, 0), (0, 2)))
+    assert registry.getTotalBalance() == 0
+    registry.refresh()
+    assert registry.getTotalBalance() == 4
+    assert registry.getTotalCash() == 4
+    assert registry.getMachinesOutOfProduct(1) == 0
+
+# Tests close() detaching and keeping wrappers installed before the registry.
+def test_close():
+    machines = [VendingMachine(), VendingMachine()]
+    instrumentation = Instrumentation(machines[0], ['putCoin1'])
+    registry = FleetRegistry(machines)
+    registry.close()
+    machines[0].putCoin1()
+    machines[1].putCoin1()
+    assert registry.getTotalBalance() == 0
+    assert instrumentation.get_stats()['putCoin1']['calls'] == 1
+    assert 'putCoin1' not in vars(machines[1])
+
+# Tests that registered machines still take keyword arguments.
+def test_wrap_KeywordArguments():
+    machines = [VendingMachine.from_state(products=(5, 5), coins=(5, 5))]
+    registry = FleetRegistry(machines)
+    assert machines[0].putCoin(kind=2) == VendingMachine.Response.OK
+    assert machines[0].putCoins(count1=1, count2=0)[0] == VendingMachine.Response.OK
+    assert machines[0].giveProduct1(number=1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    assert registry.getTotalBalance() == 3
+    assert registry.getTotalCash() == 18
+    assert aggregates(registry) == brute_force(machines)
+
+# Tests that totals follow rolled-back transactions and savepoints.
+def test_aggregates_Rollback():
+    machines = [VendingMachine.from_state(prices=(1, 1), products=(2, 2)), VendingMachine()]
+    registry = FleetRegistry(machines)
+    with pytest.raises(KeyError):
+        with machines[0].transaction():
+            machines[0].putCoin2()
+            machines[0].putCoin1()
+            assert machines[0].giveProduct1(2) == VendingMachine.Response.OK
+            raise KeyError
+    assert aggregates(registry) == brute_force(machines)
+    assert registry.getTotalCash() == 0
+    assert registry.getMachinesOutOfProduct(1) == 1
+    machines[1].begin()
+    machines[1].putCoin2()
+    savepoint = machines[1].savepoint()
+    machines[1].putCoin1()
+    machines[1].rollback(savepoint)
+    machines[1].commit()
+    assert aggregates(registry) == brute_force(machines)
+    assert registry.getTotalBalance() == 2
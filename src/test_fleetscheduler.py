@@ -0,0 +1,123 @@
+from VendingMachine import VendingMachine
+from FleetScheduler import FleetScheduler, HashRing
+import random
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to make a random session for one machine as apply_batch() pairs.
+def random_ops(rng: random.Random):
+    ops = [(VendingMachine.Op.ENTER_ADMIN_MODE, ADMIN_CODE), (VendingMachine.Op.FILL_PRODUCTS, 0),
+           (VendingMachine.Op.EXIT_ADMIN_MODE, 0)] if rng.random() < 0.2 else []
+    for _ in range(rng.randint(1, 8)):
+        ops.append(rng.choice([(VendingMachine.Op.PUT_COIN1, 0), (VendingMachine.Op.PUT_COIN2, 0),
+                               (VendingMachine.Op.GIVE_PRODUCT1, rng.randint(1, 2)),
+                               (VendingMachine.Op.GIVE_PRODUCT2, 1), (VendingMachine.Op.RETURN_MONEY, 0)]))
+    return ops
+
+# Helper function to run the same batches on local machines.
+def run_locally(machines: dict, batches: list):
+    return [machines.setdefault(machineId, VendingMachine()).apply_batch(ops) for machineId, ops in batches]
+
+"""
+HashRing tests.
+"""
+# Tests that a new node takes over a fair share of the keys and nothing else moves.
+def test_add_MovesOnlyToNewNode():
+    ring = HashRing(range(4))
+    before = {key: ring.owner(key) for key in range(5000)}
+    ring.add(4)
+    moved = [key for key in before if ring.owner(key) != before[key]]
+    assert all(ring.owner(key) == 4 for key in moved)
+    assert 5000 / 5 * 0.6 < len(moved) < 5000 / 5 * 1.4
+
+# Tests that removing a node gives back exactly the ring from before it was added.
+def test_remove_RestoresOwners():
+    ring = HashRing(['a', 'b'])
+    before = {key: ring.owner(key) for key in range(1000)}
+    ring.add('c')
+    ring.remove('c')
+    assert {key: ring.owner(key) for key in range(1000)} == before
+    assert len(ring) == 2
+    with pytest.raises(ValueError):
+        ring.remove('c')
+
+# Tests that owners don't depend on the process (no salted hash()).
+def test_owner_Stable():
+    ring = HashRing([0, 1, 2])
+    assert [ring.owner(f"m{key}") for key in range(5)] == [HashRing([0, 1, 2]).owner(f"m{key}") for key in range(5)]
+    with pytest.raises(ValueError):
+        HashRing().owner(1)
+
+"""
+FleetScheduler tests.
+"""
+# Tests routed batches against the same batches run locally, across a rebalance.
+def test_run_MatchesLocal():
+    rng = random.Random(3)
+    local = {}
+    scheduler = FleetScheduler(workers=2)
+    try:
+        for round_ in range(4):
+            batches = [(f"m{rng.randrange(40)}", random_ops(rng)) for _ in range(60)]
+            assert [list(r) for r in scheduler.run(batches)] == [list(r) for r in run_locally(local, batches)]
+            if round_ == 1:
+                scheduler.addWorker()
+            if round_ == 2:
+                scheduler.removeWorker(0)
+        remote = scheduler.collect()
+        assert {machineId: m.state() for machineId, m in remote.items()} == \
+            {machineId: m.state() for machineId, m in local.items()}
+    finally:
+        scheduler.close()
+
+# Tests that adding a worker moves only the machines the ring gives it.
+def test_addWorker_Rebalance():
+    scheduler = FleetScheduler(workers=3)
+    try:
+        scheduler.run({machineId: [(VendingMachine.Op.PUT_COIN2, 0)] for machineId in range(300)})
+        before = {node: stats['machines'] for node, stats in scheduler.get_stats().items()}
+        node = scheduler.addWorker()
+        after = {n: stats['machines'] for n, stats in scheduler.get_stats().items()}
+        assert sum(after.values()) == 300
+        assert 0 < after[node] < 300 / 4 * 1.6
+        assert sum(before[n] - after[n] for n in before) == after[node]
+        assert all(m.getCurrentBalance() == 2 for m in scheduler.collect().values())
+    finally:
+        scheduler.close()
+
+# Tests the gathered counters.
+def test_getStats():
+    scheduler = FleetScheduler(workers=2)
+    try:
+        scheduler.run([(1, [(VendingMachine.Op.PUT_COIN1, 0)] * 3), (2, [(VendingMachine.Op.PUT_COIN2, 0)])])
+        stats = scheduler.get_stats().values()
+        assert sum(s['batches'] for s in stats) == 2
+        assert sum(s['ops'] for s in stats) == 4
+        assert sum(s['machines'] for s in stats) == 2
+    finally:
+        scheduler.close()
+
+# Tests the configuration reaching the workers, and invalid worker changes.
+def test_config():
+    scheduler = FleetScheduler(workers=1, coinValues=(1, 2, 5), coinCapacities=(9, 9, 9))
+    try:
+        scheduler.run([(7, [(VendingMachine.Op.PUT_COIN1, 0)])])
+        assert scheduler.collect()[7].getCoinValues() == (1, 2, 5)
+        with pytest.raises(ValueError):
+            scheduler.removeWorker(0)
+        with pytest.raises(ValueError):
+            scheduler.removeWorker(5)
+    finally:
+        scheduler.close()
+
+# Tests that a failing batch raises and leaves the scheduler usable.
+def test_run_InvalidBatch():
+    scheduler = FleetScheduler(workers=2)
+    try:
+        with pytest.raises(ValueError):
+            scheduler.run([(1, [(99, 0)])])
+        scheduler.addWorker()
+        assert list(scheduler.run([(1, [(VendingMachine.Op.PUT_COIN1, 0)])])[0]) == [VendingMachine.Response.OK]
+    finally:
+        scheduler.close()
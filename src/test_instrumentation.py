@@ -0,0 +1,132 @@
+from VendingMachine import VendingMachine
+from Instrumentation import Instrumentation
+from Journal import Journal
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to build a stocked machine in operation mode.
+def make_machine() -> VendingMachine:
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.fillCoins(10, 10)
+    machine.exitAdminMode()
+    return machine
+
+"""
+Instrumentation tests.
+"""
+# Tests counting calls and responses per method.
+def test_getStats_CallsAndResponses():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    for _ in range(3):
+        machine.putCoin2()
+        machine.giveProduct2(1)
+    machine.returnMoney()
+    machine.getPrice2()
+    stats = instrumentation.get_stats()
+    assert stats['putCoin2']['calls'] == 3
+    assert stats['giveProduct2']['calls'] == 3
+    assert stats['giveProduct2']['responses'] == {'INSUFFICIENT_MONEY': 2, 'OK': 1}
+    assert stats['returnMoney']['responses'] == {'OK': 1}
+    # Getters return plain numbers, not Response codes.
+    assert stats['getPrice2']['responses'] == {}
+    assert 'giveProduct1' not in stats
+
+# Tests the histogram holding every call and the total time adding up.
+def test_getStats_Histogram():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    for _ in range(100):
+        machine.getCurrentBalance()
+    stats = instrumentation.get_stats()['getCurrentBalance']
+    assert len(stats['histogram']) == Instrumentation.BUCKETS == len(Instrumentation.BUCKET_BOUNDS)
+    assert sum(stats['histogram']) == 100
+    assert stats['total_ns'] >= 0
+    assert stats['mean_ns'] == stats['total_ns'] / 100
+    # The bucket a call lands in brackets its latency.
+    slowest = max(k for k, count in enumerate(stats['histogram']) if count)
+    assert stats['total_ns'] < 100 * Instrumentation.BUCKET_BOUNDS[slowest]
+
+# Tests that get_stats() returns a snapshot, not live counters.
+def test_getStats_Snapshot():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    machine.putCoin1()
+    stats = instrumentation.get_stats()
+    machine.putCoin1()
+    assert stats['putCoin1']['calls'] == 1
+    assert instrumentation.get_stats()['putCoin1']['calls'] == 2
+
+# Tests instrumenting only some methods and rejecting unknown names.
+def test_init_Methods():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine, ['putCoin1'])
+    machine.putCoin1()
+    machine.putCoin2()
+    assert list(instrumentation.get_stats()) == ['putCoin1']
+    with pytest.raises(ValueError):
+        Instrumentation(machine, ['_getState'])
+
+# Tests apply_batch() counting both itself and the calls it makes.
+def test_getStats_ApplyBatch():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    machine.apply_batch([(VendingMachine.Op.PUT_COIN1, 0), (VendingMachine.Op.PUT_COIN2, 0)])
+    stats = instrumentation.get_stats()
+    assert stats['apply_batch']['calls'] == 1
+    assert stats['putCoin1']['calls'] == stats['putCoin2']['calls'] == 1
+
+# Tests reset() clearing all counters.
+def test_reset():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    machine.putCoin1()
+    instrumentation.reset()
+    assert instrumentation.get_stats() == {}
+
+# Tests close() leaving the machine on its class methods again.
+def test_close_Detaches():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    instrumentation.close()
+    assert not {name for name in vars(machine) if not name.startswith('_')}
+    machine.putCoin1()
+    assert instrumentation.get_stats() == {}
+
+# Tests stacking on top of a journal: both see the calls and close() puts the journal back.
+def test_close_RestoresJournal(tmp_path):
+    machine = make_machine()
+    journal = Journal(str(tmp_path / 'journal'), machine)
+    instrumentation = Instrumentation(machine)
+    machine.putCoin1()
+    assert len(journal) == 1
+    instrumentation.close()
+    machine.putCoin1()
+    assert len(journal) == 2
+    assert instrumentation.get_stats()['putCoin1']['calls'] == 1
+    journal.close()
+
+# Tests counting the response of putCoins() bursts.
+def test_getStats_PutCoinsResponses():
+    machine = VendingMachine()
+    instrumentation = Instrumentation(machine, ['putCoins'])
+    assert machine.putCoins(40, 0) == (VendingMachine.Response.OK, (40, 0), (0, 0))
+    machine.putCoins(20, 0)
+    assert instrumentation.get_stats()['putCoins']['responses'] == {'OK': 1, 'CANNOT_PERFORM': 1}
+
+# Tests that instrumented methods still take keyword arguments.
+def test_wrap_KeywordArguments():
+    machine = make_machine()
+    instrumentation = Instrumentation(machine)
+    machine.begin()
+    savepoint = machine.savepoint()
+    machine.putCoin2()
+    machine.rollback(savepoint=savepoint)
+    machine.commit()
+    assert machine.giveProduct1(number=1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    stats = instrumentation.get_stats()
+    assert stats['rollback']['calls'] == 1
+    assert stats['giveProduct1']['responses'] == {'INSUFFICIENT_MONEY': 1}
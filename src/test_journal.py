@@ -0,0 +1,279 @@
+from VendingMachine import VendingMachine
+from Journal import Journal
+import os
+import random
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to run a session touching every kind of journaled call.
+def run_session(machine: VendingMachine):
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.fillCoins(10, 10)
+    machine.setPrices(3, 4)
+    machine.setPrice(2, 5)
+    machine.exitAdminMode()
+    for _ in range(3):
+        machine.putCoin2()
+        machine.putCoin1()
+        machine.giveProduct1(1)
+        machine.putCoin(2)
+        machine.putCoin(2)
+        machine.putCoin(2)
+        machine.giveProduct(2, 1)
+        machine.putCoin2()
+        machine.giveProduct2(1)
+        machine.returnMoney()
+    machine.putCoin1()
+
+# Helper function to compare the full state of two machines.
+def same_state(a: VendingMachine, b: VendingMachine):
+    return a._getState() == b._getState()
+
+"""
+Journal tests.
+"""
+# Tests rebuilding a machine from the journal alone.
+def test_recover_WithoutSnapshot(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine, snapshotEvery=0)
+    run_session(machine)
+    journal.close()
+    assert not os.path.exists(path + ".snap")
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+
+# Tests rebuilding a machine from a snapshot plus the tail after it.
+def test_recover_WithSnapshot(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine, snapshotEvery=7)
+    run_session(machine)
+    journal.close()
+    assert os.path.exists(path + ".snap")
+    assert len(journal) % 7 != 0
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+
+# Tests that failed calls aren't journaled.
+def test_journal_SkipsFailedCalls(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine)
+    assert machine.giveProduct1(1) == VendingMachine.Response.INSUFFICIENT_PRODUCT
+    assert machine.enterAdminMode(ADMIN_CODE + 1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.putCoin1() == VendingMachine.Response.OK
+    assert len(journal) == 1
+    journal.close()
+
+# Tests dropping a torn record at the end of the file.
+def test_recover_TornRecord(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine)
+    machine.putCoin1()
+    machine.putCoin2()
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x00\x00")
+    assert Journal.recover(path, VendingMachine()).getCurrentBalance() == 3
+
+# Tests continuing an existing journal after recovery.
+def test_journal_Reopen(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine)
+    machine.putCoin1()
+    journal.close()
+    machine = Journal.recover(path, VendingMachine())
+    journal = Journal(path, machine)
+    assert len(journal) == 1
+    machine.putCoin2()
+    journal.close()
+    assert Journal.recover(path, VendingMachine()).getCurrentBalance() == 3
+
+# Tests that reopening after a crash drops the torn record before appending.
+def test_journal_ReopenAfterTornRecord(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine)
+    machine.putCoin1()
+    machine.putCoin2()
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x00\x00")
+    machine = Journal.recover(path, VendingMachine())
+    journal = Journal(path, machine)
+    assert len(journal) == 2
+    machine.putCoin2()
+    journal.close()
+    assert machine.getCurrentBalance() == 5
+    assert Journal.recover(path, VendingMachine()).getCurrentBalance() == 5
+
+# Tests that a record with an unknown opcode is reported as a ValueError.
+def test_recover_UnknownOpcode(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine)
+    machine.putCoin1()
+    journal.close()
+    with open(path, "r+b") as f:
+        f.seek(-Journal._recordFormat(machine).size, os.SEEK_END)
+        f.write(bytes([255]))
+    with pytest.raises(ValueError):
+        Journal.recover(path, VendingMachine())
+
+# Tests journaling machines with extra coin kinds and slots.
+def test_recover_WideMachine(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    config = dict(coinValues=(1, 2, 5), coinCapacities=(9, 9, 9), prices=(1, 2, 3), productCapacities=(4, 4, 4))
+    machine = VendingMachine(**config)
+    journal = Journal(path, machine, snapshotEvery=3)
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillCoins(1, 2, 3)
+    machine.setPrices(2, 3, 4)
+    machine.fillProducts()
+    machine.exitAdminMode()
+    machine.putCoin(3)
+    machine.giveProduct(3, 1)
+    journal.close()
+    assert same_state(Journal.recover(path, VendingMachine(**config)), machine)
+    with pytest.raises(ValueError):
+        Journal.recover(path, VendingMachine())
+
+# Tests that close() gives the machine its own methods back.
+def test_journal_CloseDetaches(tmp_path):
+    machine = VendingMachine()
+    journal = Journal(str(tmp_path / "machine.journal"), machine)
+    journal.close()
+    assert "putCoin1" not in vars(machine)
+    assert machine.putCoin1() == VendingMachine.Response.OK
+
+# Tests journaling and replaying whole-cart purchases.
+def test_recover_GiveProducts(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    config = dict(coinValues=(1, 2, 5), coinCapacities=(9, 9, 9), prices=(1, 2, 3), productCapacities=(4, 4, 4))
+    machine = VendingMachine(**config)
+    journal = Journal(path, machine, snapshotEvery=0)
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillCoins(3, 3, 3)
+    machine.fillProducts()
+    machine.exitAdminMode()
+    machine.putCoin(3)
+    machine.putCoin(3)
+    assert machine.giveProducts([(3, 2), (1, 1), (3, 1), (2, 1)]) == VendingMachine.Response.INSUFFICIENT_MONEY
+    assert machine.giveProducts([(3, 2), (1, 1)]) == VendingMachine.Response.OK
+    journal.close()
+    assert len(journal) == 7
+    assert same_state(Journal.recover(path, VendingMachine(**config)), machine)
+
+# Tests journaling the coins a partly rejected burst accepted.
+def test_recover_PutCoins(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine, snapshotEvery=0)
+    assert machine.putCoins(30, 10)[0] == VendingMachine.Response.OK
+    assert machine.putCoins(30, 0) == (VendingMachine.Response.CANNOT_PERFORM, (20, 0), (10, 0))
+    assert machine.putCoins(1, 0)[0] == VendingMachine.Response.CANNOT_PERFORM
+    assert machine.putCoins(-1, 0)[0] == VendingMachine.Response.INVALID_PARAM
+    journal.close()
+    assert len(journal) == 2
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+
+# Tests that only committed transactions reach the journal.
+def test_journal_Transactions(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine, snapshotEvery=0)
+    machine.begin()
+    machine.putCoin1()
+    assert len(journal) == 0
+    machine.rollback()
+    machine.putCoin2()
+    with machine.transaction():
+        machine.putCoin1()
+        savepoint = machine.savepoint()
+        machine.putCoin2()
+        machine.returnMoney()
+        machine.rollback(savepoint)
+        machine.putCoin1()
+        with pytest.raises(ValueError):
+            journal.snapshot()
+    with pytest.raises(KeyError):
+        with machine.transaction():
+            machine.putCoin2()
+            raise KeyError
+    journal.close()
+    assert len(journal) == 3
+    assert machine.getCurrentBalance() == 4
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+
+# Tests recovery of random sessions that are committed or rolled back, with and without snapshots.
+@pytest.mark.parametrize("snapshotEvery", (0, 5))
+def test_recover_RandomTransactions(tmp_path, snapshotEvery: int):
+    path = str(tmp_path / "machine.journal")
+    rng = random.Random(5)
+    machine = VendingMachine.from_state(prices=(2, 3), products=(20, 20), coins=(5, 5))
+    journal = Journal(path, machine, snapshotEvery=snapshotEvery)
+    calls = [('putCoin1', ()), ('putCoin2', ()), ('putCoins', (2, 1)), ('returnMoney', ()),
+             ('giveProduct1', (1,)), ('giveProduct2', (1,))]
+    for _ in range(50):
+        machine.begin()
+        savepoints = []
+        for _ in range(rng.randint(1, 8)):
+            if rng.random() < 0.3:
+                savepoints.append(machine.savepoint())
+            name, args = rng.choice(calls)
+            getattr(machine, name)(*args)
+        if savepoints and rng.random() < 0.5:
+            machine.rollback(rng.choice(savepoints))
+        if rng.random() < 0.3:
+            machine.rollback()
+        else:
+            machine.commit()
+    journal.close()
+    recovered = Journal.recover(path, VendingMachine.from_state(prices=(2, 3), products=(20, 20), coins=(5, 5)))
+    assert same_state(recovered, machine)
+
+# Tests journaling calls made with keyword arguments.
+def test_journal_KeywordArguments(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine.from_state(products=(5, 5), coins=(5, 5))
+    journal = Journal(path, machine, snapshotEvery=0)
+    assert machine.putCoin(kind=2) == VendingMachine.Response.OK
+    assert machine.putCoins(count1=3, count2=1)[0] == VendingMachine.Response.OK
+    assert machine.giveProducts(cart={2: 1}) == VendingMachine.Response.OK
+    machine.putCoin2()
+    assert machine.giveProduct(1, number=1) == VendingMachine.Response.INSUFFICIENT_MONEY
+    machine.begin()
+    savepoint = machine.savepoint()
+    machine.putCoin1()
+    machine.rollback(savepoint=savepoint)
+    machine.commit()
+    journal.close()
+    assert len(journal) == 4
+    assert machine.getCurrentBalance() == 2
+    assert same_state(Journal.recover(path, VendingMachine.from_state(products=(5, 5), coins=(5, 5))), machine)
+
+# Tests that states installed wholesale are snapshotted, so recovery rebuilds them.
+def test_journal_InstalledStates(tmp_path):
+    path = str(tmp_path / "machine.journal")
+    machine = VendingMachine()
+    journal = Journal(path, machine, snapshotEvery=0)
+    machine.putCoin1()
+    machine.unpack_from(VendingMachine.from_state(balance=3, products=(4, 4), coins=(1, 1)).to_bytes())
+    machine.putCoin2()
+    journal.flush()
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+    machine._setState((VendingMachine.Mode.OPERATION, 0, (3, 3), (2, 2), (9, 9)))
+    VendingMachine.restore_fleet(VendingMachine.snapshot_fleet([VendingMachine.from_state(coins=(7, 0))]), [machine])
+    machine.putCoin1()
+    journal.flush()
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+    machine.begin()
+    with pytest.raises(ValueError):
+        machine._setState((VendingMachine.Mode.OPERATION, 0, (3, 3), (2, 2), (9, 9)))
+    machine.rollback()
+    journal.close()
+    assert same_state(Journal.recover(path, VendingMachine()), machine)
+    assert '_setState' not in vars(machine)
@@ -0,0 +1,96 @@
+from VendingMachine import VendingMachine
+from LogReplay import LogReplay, open_records, read_csv, read_jsonl, main
+import gzip
+import json
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# A refill, a sale with change, an audit that matches and one that doesn't.
+RECORDS = [
+    ('m1', 'enterAdminMode', (ADMIN_CODE,), 'OK'),
+    ('m1', 'fillProducts', (), 'OK'),
+    ('m1', 'fillCoins', (5, 5), 'OK'),
+    ('m1', 'exitAdminMode', (), None),
+    ('m1', 'putCoin2', (), 'OK'),
+    ('m1', 'putCoin2', (), 'OK'),
+    ('m1', 'putCoin2', (), 'OK'),
+    ('m1', 'giveProduct2', (1,), 'OK'),
+    ('m2', 'putCoin1', (), 'OK'),
+    ('m2', 'giveProduct1', (1,), 'OK'),
+    ('m1', 'audit', (4, 8, 30, 39), None),
+    ('m2', 'audit', (1, 0, 0, 1), None),
+    ('m2', 'giveProducts', (1, 1, 2, 1), 'INSUFFICIENT_PRODUCT'),
+]
+
+# Helper function to write RECORDS as a CSV log.
+def write_csv(path, records=RECORDS):
+    with open(path, 'w') as f:
+        f.write('machine,op,args,expected\n')
+        for machine, op, args, expected in records:
+            f.write(f"{machine},{op},{' '.join(map(str, args))},{expected or ''}\n")
+
+# Helper function to write RECORDS as a JSONL log.
+def write_jsonl(path, records=RECORDS):
+    with open(path, 'w') as f:
+        for machine, op, args, expected in records:
+            f.write(json.dumps({'machine': machine, 'op': op, 'args': list(args), 'expected': expected}) + '\n')
+
+"""
+LogReplay tests.
+"""
+# Tests per-machine reconciliation of the sample log.
+def test_reconcile_Sample(tmp_path):
+    write_csv(tmp_path / 'log.csv')
+    replay = LogReplay().run(open_records(str(tmp_path / 'log.csv')))
+    rows = {row[0]: row[1:] for row in replay.reconcile()}
+    assert replay.records == len(RECORDS)
+    assert rows['m1'] == (9, 0, 0, 1, 0, (4, 8), (30, 39), (4, 8), (30, 39))
+    # m2 was never stocked: the sale fails although the field says OK, and the audit is off.
+    assert rows['m2'] == (4, 2, 1, 1, 1, (1, 0), (0, 0), (1, 0), (0, 1))
+
+# Tests that CSV, JSONL and gzipped logs replay the same.
+def test_openRecords_Formats(tmp_path):
+    write_csv(tmp_path / 'log.csv')
+    write_jsonl(tmp_path / 'log.jsonl')
+    with open(tmp_path / 'log.csv', 'rb') as f, gzip.open(tmp_path / 'log.csv.gz', 'wb') as g:
+        g.write(f.read())
+    results = [list(LogReplay().run(open_records(str(tmp_path / name))).reconcile())
+               for name in ('log.csv', 'log.jsonl', 'log.csv.gz')]
+    assert results[0] == results[1] == results[2]
+
+# Tests that records are parsed lazily, one at a time.
+def test_readJsonl_Streams():
+    def lines():
+        yield json.dumps({'machine': 1, 'op': 'putCoin1'})
+        raise AssertionError("read past the first record")
+    assert next(read_jsonl(lines())) == (1, 'putCoin1', (), None)
+
+# Tests counting and skipping malformed records.
+def test_run_Malformed():
+    lines = ['machine,op,args,expected', 'm1,putCoin1,,OK', 'm1,noSuchMethod,,', 'm1,putCoin1,x,',
+             'm1,putCoin1,1,', 'm1,giveProduct1,1,BOGUS', 'short', '']
+    replay = LogReplay().run(read_csv(lines))
+    assert replay.records == 1
+    assert replay.malformed == 5
+    with pytest.raises(ValueError):
+        list(read_csv(['machine,args']))
+
+# Tests replaying bursts, judged by their response.
+def test_apply_PutCoins():
+    replay = LogReplay()
+    assert replay.apply('m1', 'putCoins', (49, 3), VendingMachine.Response.OK) == VendingMachine.Response.OK
+    assert replay.apply('m1', 'putCoins', (2, 0), VendingMachine.Response.OK) == VendingMachine.Response.CANNOT_PERFORM
+    replay.apply('m1', LogReplay.AUDIT, (50, 3, 0, 0))
+    assert list(replay.reconcile())[0][1:6] == (3, 1, 1, 1, 0)
+
+# Tests the CLI report and its exit status.
+def test_main(tmp_path, capsys):
+    write_jsonl(tmp_path / 'good.jsonl', RECORDS[:8] + RECORDS[10:11])
+    assert main([str(tmp_path / 'good.jsonl'), '--output', str(tmp_path / 'report.csv')]) == 0
+    report = (tmp_path / 'report.csv').read_text().splitlines()
+    assert report[0].startswith('machine,records,failed')
+    assert report[1] == 'm1,9,0,0,1,0,4 8,30 39,4 8,30 39'
+    assert 'records/s' in capsys.readouterr().err
+    write_jsonl(tmp_path / 'bad.jsonl')
+    assert main([str(tmp_path / 'bad.jsonl'), '--output', str(tmp_path / 'report.csv')]) == 1
@@ -0,0 +1,100 @@
+from VendingMachine import VendingMachine
+from VendingFleet import VendingFleet
+from SharedFleet import SharedFleet
+from test_vendingfleet import assert_same_state, apply_random_step
+import multiprocessing
+import pickle
+import numpy as np
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+
+# Helper function run in a child process: sessions on every machine, each under the locks.
+def sell_everywhere(fleet: SharedFleet, sessions: int):
+    everyone = np.arange(len(fleet))
+    for _ in range(sessions):
+        with fleet.locked(everyone):
+            fleet.putCoins(everyone, 1, 2)
+            fleet.giveProduct2(everyone, 1)
+        fleet.call(everyone[::2], 'returnMoney')
+    fleet.close()
+
+# Helper function to stock every machine of a fleet.
+def stock(fleet: VendingFleet):
+    everyone = np.arange(len(fleet))
+    fleet.enterAdminMode(everyone, ADMIN_CODE)
+    fleet.fillProducts(everyone)
+    fleet.exitAdminMode(everyone)
+
+"""
+SharedFleet tests.
+"""
+# Tests that the shared fleet behaves like the scalar machines.
+def test_sharedFleet_MatchesScalar():
+    rng = np.random.default_rng(7)
+    fleet = SharedFleet(16, stripes=4)
+    try:
+        machines = [VendingMachine() for _ in range(16)]
+        for _ in range(300):
+            apply_random_step(rng, fleet, machines)
+        assert_same_state(fleet, machines)
+    finally:
+        fleet.close()
+        fleet.unlink()
+
+# Tests processes selling concurrently on one shared fleet without losing updates.
+def test_call_AcrossProcesses():
+    context = multiprocessing.get_context('spawn')
+    fleet = SharedFleet(10, stripes=3, context=context)
+    try:
+        stock(fleet)
+        workers = [context.Process(target=sell_everywhere, args=(fleet, 5)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert [worker.exitcode for worker in workers] == [0, 0, 0]
+        everyone = np.arange(10)
+        assert list(fleet.getNumberOfProduct2(everyone)) == [40 - 15] * 10
+        fleet.enterAdminMode(everyone, ADMIN_CODE)
+        assert list(fleet.getCurrentSum(everyone)) == [15 * 5] * 10
+    finally:
+        fleet.close()
+        fleet.unlink()
+
+# Tests that view() reads the shared state in place and can't write to it.
+def test_view_InPlace():
+    fleet = SharedFleet(4)
+    try:
+        view = fleet.view(2)
+        assert list(fleet.call([2], 'putCoin2')) == [VendingMachine.Response.OK]
+        assert view[VendingFleet._FIELDS.index('balance')] == 2
+        assert not view.flags.owndata
+        with pytest.raises(ValueError):
+            view[0] = 0
+        del view
+    finally:
+        fleet.close()
+        fleet.unlink()
+
+# Tests that the state never goes through pickle outside process start-up.
+def test_pickle_OnlyAtProcessStart():
+    fleet = SharedFleet(4)
+    try:
+        with pytest.raises(RuntimeError):
+            pickle.dumps(fleet)
+    finally:
+        fleet.close()
+        fleet.unlink()
+
+# Tests building a shared fleet from a packed snapshot.
+def test_fromBuffer():
+    machines = [VendingMachine.from_state(balance=3, coins=(1, 1)), VendingMachine()]
+    fleet = SharedFleet.from_buffer(VendingMachine.snapshot_fleet(machines))
+    try:
+        assert isinstance(fleet, SharedFleet)
+        assert list(fleet.getCurrentBalance([0, 1])) == [3, 0]
+    finally:
+        fleet.close()
+        fleet.unlink()
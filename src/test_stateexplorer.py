@@ -0,0 +1,73 @@
+from VendingMachine import VendingMachine
+from StateExplorer import StateExplorer, _encode, _decode
+import inspect
+import pytest
+
+# Small enough to search in well under a second.
+SMALL = dict(productCapacities=(2, 2), coinCapacities=(2, 3), prices=(1, 2), initialPrices=(2, 1))
+
+
+# A machine whose failing enterAdminMode() still takes a coin.
+class LeakyMachine(VendingMachine):
+    def enterAdminMode(self, code: int):
+        res = super().enterAdminMode(code)
+        if res == VendingMachine.Response.INVALID_PARAM:
+            self.putCoin1()
+        return res
+
+"""
+StateExplorer tests.
+"""
+# Tests that every code in the state space decodes and encodes back to itself.
+def test_encode_RoundTrip():
+    explorer = StateExplorer(**SMALL)
+    config = explorer._config()
+    for code in range(0, explorer.size, 7):
+        assert _encode(config, _decode(config, code)) == code
+
+# Tests the search of a small machine: no violations and the readme's unreachable branches.
+def test_explore_Small():
+    result = StateExplorer(workers=1, **SMALL).explore()
+    assert result['violations'] == []
+    assert 1 < result['states'] < StateExplorer(**SMALL).size
+    never = StateExplorer.unreachable(result['outcomes'])
+    assert VendingMachine.Response.UNSUITABLE_CHANGE in never['returnMoney']
+    assert VendingMachine.Response.TOO_BIG_CHANGE in never['returnMoney']
+    assert VendingMachine.Response.TOO_BIG_CHANGE in never['giveProduct1']
+    assert VendingMachine.Response.OK in result['outcomes']['giveProduct2']
+    assert VendingMachine.Response.INSUFFICIENT_PRODUCT in result['outcomes']['giveProduct1']
+    assert VendingMachine.Response.CANNOT_PERFORM in result['outcomes']['putCoin1']
+    # Line coverage: the readme's unreachable TOO_BIG_CHANGE return is never run, the
+    # UNSUITABLE_CHANGE one is.
+    never = StateExplorer.untaken(result['functions'], result['lines'])
+    source = inspect.getsourcelines(VendingMachine)
+    lines = {text.strip(): number for number, text in enumerate(source[0], source[1])}
+    assert lines['return tooBigChange'] in never['__payChange']
+    assert lines['return VendingMachine.Response.UNSUITABLE_CHANGE'] in result['lines']
+    assert 'giveProduct1' not in never
+
+# Tests that splitting the levels across processes finds exactly the same states.
+def test_explore_Workers():
+    config = dict(SMALL, productCapacities=(3, 3))
+    single = StateExplorer(workers=1, **config).explore()
+    pooled = StateExplorer(workers=3, **config).explore()
+    assert single['chunks'] == single['levels'] + 1
+    # Levels of more than MIN_CHUNK states go to several workers.
+    assert pooled['chunks'] > pooled['levels'] + 3
+    assert (pooled['states'], pooled['levels'], pooled['outcomes'], pooled['functions'], pooled['lines']) == \
+        (single['states'], single['levels'], single['outcomes'], single['functions'], single['lines'])
+
+# Tests catching a failing call that changes the state.
+def test_explore_Violation():
+    result = StateExplorer(workers=1, factory=LeakyMachine, **SMALL).explore()
+    assert result['violations']
+    assert len(result['violations']) <= StateExplorer.MAX_VIOLATIONS
+    before, name, args, res, after, problem = result['violations'][0]
+    assert name == 'enterAdminMode'
+    assert problem == "failed call changed the state"
+
+# Tests rejecting configurations the explorer doesn't cover.
+@pytest.mark.parametrize("config", [dict(productCapacities=(1, 1, 1)), dict(prices=(0, 1))])
+def test_init_Invalid(config: dict):
+    with pytest.raises(ValueError):
+        StateExplorer(**config)
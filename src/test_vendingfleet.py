@@ -0,0 +1,193 @@
+from VendingMachine import VendingMachine
+from VendingFleet import VendingFleet
+import numpy as np
+import pytest
+
+ADMIN_CODE = 117345294655382
+FLEET_SIZE = 64
+
+"""
+VendingFleet vs VendingMachine tests.
+"""
+def assert_same_state(fleet: VendingFleet, machines: list):
+    indices = np.arange(len(machines))
+    assert list(fleet.getCurrentMode(indices)) == [m.getCurrentMode() for m in machines]
+    assert list(fleet.getCurrentBalance(indices)) == [m.getCurrentBalance() for m in machines]
+    assert list(fleet.getNumberOfProduct1(indices)) == [m.getNumberOfProduct1() for m in machines]
+    assert list(fleet.getNumberOfProduct2(indices)) == [m.getNumberOfProduct2() for m in machines]
+    assert list(fleet.getPrice1(indices)) == [m.getPrice1() for m in machines]
+    assert list(fleet.getPrice2(indices)) == [m.getPrice2() for m in machines]
+    # Coins are only visible in admin mode, so peek at them there like the scalar tests do.
+    idle = [i for i, m in enumerate(machines) if m.getCurrentBalance() == 0]
+    fleet.enterAdminMode(idle, ADMIN_CODE)
+    for i in idle:
+        machines[i].enterAdminMode(ADMIN_CODE)
+    assert list(fleet.getCoins1(indices)) == [m.getCoins1() for m in machines]
+    assert list(fleet.getCoins2(indices)) == [m.getCoins2() for m in machines]
+    assert list(fleet.getCurrentSum(indices)) == [m.getCurrentSum() for m in machines]
+
+# Helper function to run the same random operation on both a fleet subset and its scalar twins.
+def apply_random_step(rng, fleet: VendingFleet, machines: list):
+    indices = rng.choice(len(machines), size=rng.integers(1, len(machines)), replace=False)
+    op = rng.integers(0, 9)
+    if op == 0:
+        expected = [machines[i].putCoin1() for i in indices]
+        actual = fleet.putCoin1(indices)
+    elif op == 1:
+        expected = [machines[i].putCoin2() for i in indices]
+        actual = fleet.putCoin2(indices)
+    elif op == 2:
+        expected = [machines[i].returnMoney() for i in indices]
+        actual = fleet.returnMoney(indices)
+    elif op == 3:
+        number = rng.integers(-1, 5, size=len(indices))
+        expected = [machines[i].giveProduct1(int(n)) for i, n in zip(indices, number)]
+        actual = fleet.giveProduct1(indices, number)
+    elif op == 4:
+        number = int(rng.integers(-1, 5))
+        expected = [machines[i].giveProduct2(number) for i in indices]
+        actual = fleet.giveProduct2(indices, number)
+    elif op == 5:
+        code = ADMIN_CODE if rng.random() < 0.9 else ADMIN_CODE + 1
+        expected = [machines[i].enterAdminMode(code) for i in indices]
+        actual = fleet.enterAdminMode(indices, code)
+    elif op == 6:
+        c1, c2 = (int(c) for c in rng.integers(0, 52, size=2))
+        expected = [machines[i].fillCoins(c1, c2) for i in indices]
+        actual = fleet.fillCoins(indices, c1, c2)
+    elif op == 7:
+        p1, p2 = (int(p) for p in rng.integers(0, 10, size=2))
+        expected = [machines[i].setPrices(p1, p2) for i in indices]
+        actual = fleet.setPrices(indices, p1, p2)
+    else:
+        expected = [machines[i].fillProducts() for i in indices]
+        actual = fleet.fillProducts(indices)
+        for i in indices:
+            machines[i].exitAdminMode()
+        fleet.exitAdminMode(indices)
+    assert list(actual) == expected
+
+# Tests that random operation sequences give the same responses and states on both engines.
+@pytest.mark.parametrize("seed", range(5))
+def test_vendingFleet_MatchesScalar(seed: int):
+    rng = np.random.default_rng(seed)
+    fleet = VendingFleet(FLEET_SIZE)
+    machines = [VendingMachine() for _ in range(FLEET_SIZE)]
+    for _ in range(400):
+        apply_random_step(rng, fleet, machines)
+    assert_same_state(fleet, machines)
+
+# Tests correct per-index responses when only some machines can accept a coin.
+def test_vendingFleet_PutCoin1MixedResponses():
+    fleet = VendingFleet(3)
+    fleet.enterAdminMode([0, 1], ADMIN_CODE)
+    fleet.fillCoins([1], 50, 1)
+    fleet.exitAdminMode([1])
+    assert list(fleet.putCoin1([0, 1, 2])) == [VendingMachine.Response.ILLEGAL_OPERATION,
+                                               VendingMachine.Response.CANNOT_PERFORM,
+                                               VendingMachine.Response.OK]
+    assert list(fleet.getCurrentBalance([0, 1, 2])) == [0, 0, 1]
+
+# Tests giveProduct2() returning one response per index.
+def test_vendingFleet_GiveProduct2ResponseShape():
+    fleet = VendingFleet(FLEET_SIZE)
+    responses = fleet.giveProduct2(np.arange(FLEET_SIZE), 1)
+    assert responses.shape == (FLEET_SIZE,)
+    assert (responses == VendingMachine.Response.INSUFFICIENT_PRODUCT).all()
+
+# Tests putCoins() keeping what fits, rejecting the rest and refusing admin mode.
+def test_vendingFleet_PutCoinsPartial():
+    fleet = VendingFleet(4)
+    fleet.enterAdminMode([0, 1], ADMIN_CODE)
+    fleet.fillCoins([1], 48, 1)
+    fleet.exitAdminMode([1])
+    out, accepted1, accepted2 = fleet.putCoins([0, 1, 2, 3], [1, 5, 2, -1], [1, 3, 0, 1])
+    assert list(out) == [VendingMachine.Response.ILLEGAL_OPERATION, VendingMachine.Response.CANNOT_PERFORM,
+                         VendingMachine.Response.OK, VendingMachine.Response.INVALID_PARAM]
+    assert list(accepted1) == [0, 2, 2, 0]
+    assert list(accepted2) == [0, 3, 0, 0]
+    assert list(fleet.getCurrentBalance([0, 1, 2, 3])) == [0, 8, 2, 0]
+
+# Tests fleet snapshots using VendingMachine's packed layout in both directions.
+def test_vendingFleet_ToBytesMatchesScalar():
+    rng = np.random.default_rng(11)
+    fleet = VendingFleet(FLEET_SIZE)
+    machines = [VendingMachine() for _ in range(FLEET_SIZE)]
+    for _ in range(200):
+        apply_random_step(rng, fleet, machines)
+    data = fleet.to_bytes()
+    assert data == bytes(VendingMachine.snapshot_fleet(machines))
+    assert VendingFleet.from_buffer(data).to_bytes() == data
+    with pytest.raises(ValueError):
+        VendingFleet.from_buffer(data[:-1])
+    with pytest.raises(ValueError):
+        VendingFleet.from_buffer(VendingMachine(coinValues=(1, 3)).to_bytes())
+
+# Tests refusing records of states no machine could be in, as VendingMachine.from_buffer() does.
+@pytest.mark.parametrize("state", [(7, 0, (8, 5), (0, 0), (0, 0)), (1, 999, (8, 5), (0, 0), (-5, 0)),
+                                   (1, 999, (8, 5), (0, 0), (50, 50)), (1, 0, (8, 5), (31, 0), (0, 0)),
+                                   (2, 1, (8, 5), (0, 0), (1, 0)), (1, 0, (0, 5), (0, 0), (0, 0))])
+def test_vendingFleet_FromBufferInvalid(state: tuple):
+    machine = VendingMachine()
+    machine._setState(state)
+    data = bytes(VendingMachine.snapshot_fleet([VendingMachine(), machine]))
+    with pytest.raises(ValueError):
+        VendingMachine.from_buffer(data[len(data) // 2:])
+    with pytest.raises(ValueError):
+        VendingFleet.from_buffer(data)
+
+# Tests bulk admin operations with masks and per-machine arguments against scalar calls.
+@pytest.mark.parametrize("seed", range(3))
+def test_vendingFleet_BulkAdminMatchesScalar(seed: int):
+    rng = np.random.default_rng(seed)
+    fleet = VendingFleet(FLEET_SIZE)
+    machines = [VendingMachine() for _ in range(FLEET_SIZE)]
+    for _ in range(100):
+        apply_random_step(rng, fleet, machines)
+    for _ in range(20):
+        mask = rng.random(FLEET_SIZE) < 0.5
+        selected = np.flatnonzero(mask)
+        codes = np.where(rng.random(selected.shape[0]) < 0.8, ADMIN_CODE, 7)
+        assert list(fleet.enterAdminMode(mask, codes)) == \
+            [machines[i].enterAdminMode(int(c)) for i, c in zip(selected, codes)]
+        c1, c2 = rng.integers(-1, 52, size=(2, selected.shape[0]))
+        assert list(fleet.fillCoins(mask, c1, c2)) == \
+            [machines[i].fillCoins(int(a), int(b)) for i, a, b in zip(selected, c1, c2)]
+        p1, p2 = rng.integers(-1, 10, size=(2, selected.shape[0]))
+        assert list(fleet.setPrices(selected, p1, p2)) == \
+            [machines[i].setPrices(int(a), int(b)) for i, a, b in zip(selected, p1, p2)]
+        assert list(fleet.fillProducts(mask)) == [machines[i].fillProducts() for i in selected]
+        fleet.exitAdminMode(mask)
+        for i in selected:
+            machines[i].exitAdminMode()
+        apply_random_step(rng, fleet, machines)
+    assert_same_state(fleet, machines)
+
+# Tests rejecting a mask that doesn't cover the whole fleet.
+def test_vendingFleet_MaskShape():
+    fleet = VendingFleet(4)
+    with pytest.raises(ValueError):
+        fleet.fillProducts(np.array([True, False]))
+    assert list(fleet.getCurrentBalance(np.zeros(4, dtype=bool))) == []
+
+# Tests rejecting an index that occurs twice in one call.
+def test_vendingFleet_DuplicateIndices():
+    fleet = VendingFleet(4)
+    with pytest.raises(ValueError):
+        fleet.putCoin1([0, 0, 0])
+    assert list(fleet.getCurrentBalance([0, 1])) == [0, 0]
+    assert list(fleet.putCoin1([2, 0])) == [VendingMachine.Response.OK] * 2
+    with pytest.raises(ValueError):
+        fleet.putCoin1([-1, 3])
+    assert list(fleet.getCurrentBalance([0, 0])) == [1, 1]
+
+# Tests negative indices counting from the end, like the scalar list indexing.
+def test_vendingFleet_NegativeIndices():
+    fleet = VendingFleet(3)
+    assert list(fleet.putCoin1([-1, 0])) == [VendingMachine.Response.OK] * 2
+    assert list(fleet.getCurrentBalance([0, 1, 2])) == [1, 0, 1]
+    assert list(fleet.getCurrentBalance([-3])) == [1]
+    with pytest.raises(IndexError):
+        fleet.putCoin1([3])
+    with pytest.raises(IndexError):
+        fleet.getCurrentBalance([-4])
@@ -1,7 +1,10 @@
 from VendingMachine import VendingMachine
+from ChangeMaker import ChangeMaker
+import random
 import pytest
 from typing import Callable
 from itertools import product
+from array import array
 
 # For the sake of simplicity, we'll be assuming that we know all the private constants in the VendingMachine class.
 # We could've computed them just like we did in the readme.md file anyway.
@@ -298,7 +301,7 @@ def test_putCoin1_OKCoins1Incrementing():
     machine.putCoin1()
     # We need direct access to a field here to really check that we incremented coins1,
     # there's no other way to do it.
-    assert getattr(machine, "_VendingMachine__coins1") == old_coins1 + 1
+    assert getattr(machine, "_VendingMachine__coins")[0] == old_coins1 + 1
 
 # Tests correct balance incrementing (bug 13).
 def test_putCoin1_OKBalanceIncrementing():
@@ -344,7 +347,7 @@ def test_putCoin2_OKCoins2Incrementing():
     machine.putCoin2()
     # We need direct access to a field here to really check that we incremented coins2,
     # there's no other way to do it.
-    assert getattr(machine, "_VendingMachine__coins2") == old_coins2 + 1
+    assert getattr(machine, "_VendingMachine__coins")[1] == old_coins2 + 1
 
 # Tests correct balance incrementing.
 def test_putCoin2_OKBalanceIncrementing():
@@ -398,110 +401,88 @@ def test_returnMoney_OKZeroBalance():
     assert machine.returnMoney() == VendingMachine.Response.OK
 
 # Helper function to reach balance > coins2 * COIN2_VALUE state in returnMoney().
-def set_machine_to_returnMoneyAllCoins2(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    return machine.returnMoney()
+def set_machine_to_returnMoneyAllCoins2():
+    # One coin of each kind filled in, then three coin-1s.
+    machine = VendingMachine.from_state(balance=3, coins=(4, 1))
+    return machine, machine.returnMoney()
 
 # Tests coins1 decreasing on balance > coins2 * COIN2_VALUE.
 def test_returnMoney_OKAllCoins2_Coins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyAllCoins2(machine)
+    machine, _ = set_machine_to_returnMoneyAllCoins2()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 3
 
 # Tests coins2 setting to zero on balance > coins1 * COIN1_VALUE.
 def test_returnMoney_OKAllCoins2_Coins2Zeroed():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyAllCoins2(machine)
+    machine, _ = set_machine_to_returnMoneyAllCoins2()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 0
 
 # Tests balance setting to zero on balance > coins1 * COIN1_VALUE.
 def test_returnMoney_OKAllCoins2_BalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyAllCoins2(machine)
+    machine, _ = set_machine_to_returnMoneyAllCoins2()
     assert machine.getCurrentBalance() == 0
 
 # Tests correct OK returning on balance > coins1 * COIN1_VALUE.
 def test_returnMoney_OKAllCoins2():
-    machine = VendingMachine()
-    assert set_machine_to_returnMoneyAllCoins2(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_returnMoneyAllCoins2()
+    assert res == VendingMachine.Response.OK
 
 # Helper function to reach balance % COIN2_VALUE == 0 state in returnMoney().
-def set_machine_to_returnMoneySomeCoins2(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 2)
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin2()
-    return machine.returnMoney()
+def set_machine_to_returnMoneySomeCoins2():
+    # Coins 1 and 2 filled in, then two coin-1s and a coin-2.
+    machine = VendingMachine.from_state(balance=4, coins=(3, 3))
+    return machine, machine.returnMoney()
 
 # Tests coins1 not changing to zero on balance % COIN2_VALUE == 0.
 def test_returnMoney_SomeCoins2Coins1NotChanging():
-    machine = VendingMachine()
-    set_machine_to_returnMoneySomeCoins2(machine)
+    machine, _ = set_machine_to_returnMoneySomeCoins2()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 3
 
 # Tests coins2 decreasing on balance % COIN2_VALUE == 0.
 def test_returnMoney_SomeCoins2Coins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_returnMoneySomeCoins2(machine)
+    machine, _ = set_machine_to_returnMoneySomeCoins2()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 1
 
 # Tests balance setting to zero on balance % COIN2_VALUE == 0.
 def test_returnMoney_SomeCoins2BalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_returnMoneySomeCoins2(machine)
+    machine, _ = set_machine_to_returnMoneySomeCoins2()
     assert machine.getCurrentBalance() == 0
 
 # Tests correct OK returning on balance % COIN2_VALUE == 0.
 def test_returnMoney_SomeCoins2():
-    machine = VendingMachine()
-    assert set_machine_to_returnMoneySomeCoins2(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_returnMoneySomeCoins2()
+    assert res == VendingMachine.Response.OK
 
 # Helper function to reach default state in returnMoney().
-def set_machine_to_returnMoneyDefault(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.exitAdminMode()
-    machine.putCoin1()
-    return machine.returnMoney()
+def set_machine_to_returnMoneyDefault():
+    # One coin of each kind filled in, then a coin-1.
+    machine = VendingMachine.from_state(balance=1, coins=(2, 1))
+    return machine, machine.returnMoney()
 
 # Tests coins2 decreasing on default state (bug 18).
 def test_returnMoney_DefaultCoins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyDefault(machine)
+    machine, _ = set_machine_to_returnMoneyDefault()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 1
 
 # Tests coins1 decreasing on default state (bug 18).
 def test_returnMoney_DefaultCoins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyDefault(machine)
+    machine, _ = set_machine_to_returnMoneyDefault()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 1
 
 # Tests balance setting to zero on default state.
 def test_returnMoney_DefaultBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_returnMoneyDefault(machine)
+    machine, _ = set_machine_to_returnMoneyDefault()
     assert machine.getCurrentBalance() == 0
 
 # Tests correct OK returning on default state.
 def test_returnMoney_DefaultOK():
-    machine = VendingMachine()
-    assert set_machine_to_returnMoneyDefault(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_returnMoneyDefault()
+    assert res == VendingMachine.Response.OK
 
 
 
@@ -545,103 +526,77 @@ def test_giveProduct1_InsufficientMoney():
     assert machine.giveProduct1(2) == VendingMachine.Response.INSUFFICIENT_MONEY
 
 # Helper function to reach res > self.__coins2 * self.__coinval2 state in giveProduct1().
-def set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.setPrices(1, 1)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    return machine.giveProduct1(2)
+def set_machine_to_giveProduct1ChangeLargerThanCoins2Sum():
+    # Prices 1 and 1, full slots, one coin of each kind filled in, then five coin-1s.
+    machine = VendingMachine.from_state(balance=5, prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(6, 1))
+    return machine, machine.giveProduct1(2)
 
 # Tests coins1 decreasing on res > self.__coins2 * self.__coinval2.
 def test_giveProduct1_ChangeLargerThanCoins2SumCoins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct1ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 5
 
 # Tests coins2 setting to zero on res > self.__coins2 * self.__coinval2.
 def test_giveProduct1_ChangeLargerThanCoins2SumCoins2Zeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct1ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 0
 
 # Tests balance setting to zero on res > self.__coins2 * self.__coinval2.
 def test_giveProduct1_ChangeLargerThanCoins2SumBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct1ChangeLargerThanCoins2Sum()
     assert machine.getCurrentBalance() == 0
 
 # Tests num1 decreasing on res > self.__coins2 * self.__coinval2.
 def test_giveProduct1_ChangeLargerThanCoins2SumNum1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct1ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getNumberOfProduct1() == MAX_PRODUCT1_N - 2
 
 # Tests correct OK returning on res > self.__coins2 * self.__coinval2.
 def test_giveProduct1_ChangeLargerThanCoins2SumOK():
-    machine = VendingMachine()
-    assert set_machine_to_giveProduct1ChangeLargerThanCoins2Sum(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_giveProduct1ChangeLargerThanCoins2Sum()
+    assert res == VendingMachine.Response.OK
 
 # Helper function to reach res % self.__coinval2 == 0 in giveProduct1().
-def set_machine_to_giveProduct1UnsuitableChange(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.setPrices(1, 1)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    return machine.giveProduct1(2)
+def set_machine_to_giveProduct1UnsuitableChange():
+    # Prices 1 and 1, full slots, one coin of each kind filled in, then four coin-1s.
+    machine = VendingMachine.from_state(balance=4, prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(5, 1))
+    return machine, machine.giveProduct1(2)
 
 # Tests coins1 not changing to zero on res % self.__coinval2 == 0.
 def test_giveProduct1_ChangeDivisibleByCoin2ValueCoins1NotChanging():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct1UnsuitableChange()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 5
 
 # Tests coins2 not changing type to float on res % self.__coinval2 == 0 (bug 19).
 def test_giveProduct1_ChangeDivisibleByCoin2ValueCoins2NotChanging():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct1UnsuitableChange()
     # We need direct access to a field here to really check that we didn't change coins2 to float.
-    assert isinstance(getattr(machine, "_VendingMachine__coins2"), int)
+    assert isinstance(getattr(machine, "_VendingMachine__coins")[1], int)
 
 # Tests coin2 decreasing on res % self.__coinval2 == 0.
 def test_giveProduct1_ChangeDivisibleByCoin2ValueCoins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct1UnsuitableChange()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 0
 
 # Tests balance setting to zero on res % self.__coinval2 == 0.
 def test_giveProduct1_ChangeDivisibleByCoin2ValueBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct1UnsuitableChange()
     assert machine.getCurrentBalance() == 0
 
 # Tests num1 decreasing on res % self.__coinval2 == 0.
 def test_giveProduct1_ChangeDivisibleByCoin2ValueNum1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct1UnsuitableChange()
     assert machine.getNumberOfProduct1() == MAX_PRODUCT1_N - 2
 
 # Tests correct OK returning on res % self.__coinval2 == 0.
 def test_giveProduct1_ChangeDivisibleByCoin2ValueOK():
-    machine = VendingMachine()
-    assert set_machine_to_giveProduct1UnsuitableChange(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_giveProduct1UnsuitableChange()
+    assert res == VendingMachine.Response.OK
 
 # Tests correct UNSUITABLE_CHANGE returning.
 def test_giveProduct1_UnsuitableChange():
@@ -657,49 +612,38 @@ def test_giveProduct1_UnsuitableChange():
     assert machine.giveProduct1(3) == VendingMachine.Response.UNSUITABLE_CHANGE
 
 # Helper function to reach default state in giveProduct1().
-def set_machine_to_giveProduct1Default(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.setPrices(2, 1)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin2()
-    machine.putCoin2()
-    machine.putCoin2()
-    machine.putCoin1()
-    return machine.giveProduct1(1)
+def set_machine_to_giveProduct1Default():
+    # Prices 2 and 1, full slots, then three coin-2s and a coin-1.
+    machine = VendingMachine.from_state(balance=7, prices=(2, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(1, 3))
+    return machine, machine.giveProduct1(1)
 
 # Tests coins1 decreasing on default state.
 def test_giveProduct1_DefaultCoins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1Default(machine)
+    machine, _ = set_machine_to_giveProduct1Default()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 0
 
 # Tests coins2 decreasing on default state.
 def test_giveProduct1_DefaultCoins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1Default(machine)
+    machine, _ = set_machine_to_giveProduct1Default()
     machine.enterAdminMode(ADMIN_CODE)
     # This also test for getCoins2() (bug 15) 
     assert machine.getCoins2() == 1
 
 # Tests balance setting to zero on default state.
 def test_giveProduct1_DefaultBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1Default(machine)
+    machine, _ = set_machine_to_giveProduct1Default()
     assert machine.getCurrentBalance() == 0
 
 # Tests num1 decreasing on default state.
 def test_giveProduct1_DefaultNum1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct1Default(machine)
+    machine, _ = set_machine_to_giveProduct1Default()
     assert machine.getNumberOfProduct1() == MAX_PRODUCT1_N - 1
 
 # Tests correct OK returning on default state.
 def test_giveProduct1_DefaultOK():
-    machine = VendingMachine()
-    assert set_machine_to_giveProduct1Default(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_giveProduct1Default()
+    assert res == VendingMachine.Response.OK
 
 
 
@@ -743,103 +687,77 @@ def test_giveProduct2_InsufficientMoney():
     assert machine.giveProduct2(2) == VendingMachine.Response.INSUFFICIENT_MONEY
 
 # Helper function to reach res > self.__coins2 * self.__coinval2 state in giveProduct2().
-def set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.setPrices(1, 1)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    return machine.giveProduct2(2)
+def set_machine_to_giveProduct2ChangeLargerThanCoins2Sum():
+    # Prices 1 and 1, full slots, one coin of each kind filled in, then five coin-1s.
+    machine = VendingMachine.from_state(balance=5, prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(6, 1))
+    return machine, machine.giveProduct2(2)
 
 # Tests coins1 decreasing on res > self.__coins2 * self.__coinval2.
 def test_giveProduct2_ChangeLargerThanCoins2SumCoins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct2ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 5
 
 # Tests coins2 setting to zero on res > self.__coins2 * self.__coinval2.
 def test_giveProduct2_ChangeLargerThanCoins2SumCoins2Zeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct2ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 0
 
 # Tests balance setting to zero on res > self.__coins2 * self.__coinval2.
 def test_giveProduct2_ChangeLargerThanCoins2SumBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct2ChangeLargerThanCoins2Sum()
     assert machine.getCurrentBalance() == 0
 
 # Tests num2 decreasing on res > self.__coins2 * self.__coinval2.
 def test_giveProduct2_ChangeLargerThanCoins2SumNum2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine)
+    machine, _ = set_machine_to_giveProduct2ChangeLargerThanCoins2Sum()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getNumberOfProduct2() == MAX_PRODUCT2_N - 2
 
 # Tests correct OK returning on res > self.__coins2 * self.__coinval2.
 def test_giveProduct2_ChangeLargerThanCoins2SumOK():
-    machine = VendingMachine()
-    assert set_machine_to_giveProduct2ChangeLargerThanCoins2Sum(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_giveProduct2ChangeLargerThanCoins2Sum()
+    assert res == VendingMachine.Response.OK
 
 # Helper function to reach res % self.__coinval2 == 0 in giveProduct2().
-def set_machine_to_giveProduct2UnsuitableChange(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.fillCoins(1, 1)
-    machine.setPrices(1, 1)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    machine.putCoin1()
-    return machine.giveProduct2(2)
+def set_machine_to_giveProduct2UnsuitableChange():
+    # Prices 1 and 1, full slots, one coin of each kind filled in, then four coin-1s.
+    machine = VendingMachine.from_state(balance=4, prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(5, 1))
+    return machine, machine.giveProduct2(2)
 
 # Tests coins1 not changing to zero on res % self.__coinval2 == 0.
 def test_giveProduct2_ChangeDivisibleByCoin2ValueCoins1NotChanging():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct2UnsuitableChange()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 5
 
 # Tests coins2 not changing type to float on res % self.__coinval2 == 0 (bug 21).
 def test_giveProduct2_ChangeDivisibleByCoin2ValueCoins2NotChanging():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct2UnsuitableChange()
     # We need direct access to a field here to really check that we didn't change coins2 to float.
-    assert isinstance(getattr(machine, "_VendingMachine__coins2"), int)
+    assert isinstance(getattr(machine, "_VendingMachine__coins")[1], int)
 
 # Tests coin2 decreasing on res % self.__coinval2 == 0.
 def test_giveProduct2_ChangeDivisibleByCoin2ValueCoins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct2UnsuitableChange()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 0
 
 # Tests balance setting to zero on res % self.__coinval2 == 0.
 def test_giveProduct2_ChangeDivisibleByCoin2ValueBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct2UnsuitableChange()
     assert machine.getCurrentBalance() == 0
 
 # Tests num2 decreasing on res % self.__coinval2 == 0.
 def test_giveProduct2_ChangeDivisibleByCoin2ValueNum2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2UnsuitableChange(machine)
+    machine, _ = set_machine_to_giveProduct2UnsuitableChange()
     assert machine.getNumberOfProduct2() == MAX_PRODUCT2_N - 2
 
 # Tests correct OK returning on res % self.__coinval2 == 0.
 def test_giveProduct2_ChangeDivisibleByCoin2ValueOK():
-    machine = VendingMachine()
-    assert set_machine_to_giveProduct2UnsuitableChange(machine) == VendingMachine.Response.OK
+    _, res = set_machine_to_giveProduct2UnsuitableChange()
+    assert res == VendingMachine.Response.OK
 
 # Tests correct UNSUITABLE_CHANGE returning.
 def test_giveProduct2_UnsuitableChange():
@@ -855,46 +773,796 @@ def test_giveProduct2_UnsuitableChange():
     assert machine.giveProduct2(3) == VendingMachine.Response.UNSUITABLE_CHANGE
 
 # Helper function to reach default state in giveProduct2().
-def set_machine_to_giveProduct2Default(machine: VendingMachine):
-    # Setting up some generic case.
-    machine.enterAdminMode(ADMIN_CODE)
-    machine.setPrices(1, 2)
-    machine.fillProducts()
-    machine.exitAdminMode()
-    machine.putCoin2()
-    machine.putCoin2()
-    machine.putCoin2()
-    machine.putCoin1()
-    return machine.giveProduct2(1)
+def set_machine_to_giveProduct2Default():
+    # Prices 1 and 2, full slots, then three coin-2s and a coin-1.
+    machine = VendingMachine.from_state(balance=7, prices=(1, 2), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(1, 3))
+    return machine, machine.giveProduct2(1)
 
 # Tests coins1 decreasing on default state (bug 22).
 def test_giveProduct2_DefaultCoins1Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2Default(machine)
+    machine, _ = set_machine_to_giveProduct2Default()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins1() == 0
 
 # Tests coins2 decreasing on default state (bug 22).
 def test_giveProduct2_DefaultCoins2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2Default(machine)
+    machine, _ = set_machine_to_giveProduct2Default()
     machine.enterAdminMode(ADMIN_CODE)
     assert machine.getCoins2() == 1
 
 # Tests balance setting to zero on default state.
 def test_giveProduct2_DefaultBalanceZeroed():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2Default(machine)
+    machine, _ = set_machine_to_giveProduct2Default()
     # This also test putCoin2() (bug 16).
     assert machine.getCurrentBalance() == 0
 
 # Tests num2 decreasing on default state.
 def test_giveProduct2_DefaultNum2Decreasing():
-    machine = VendingMachine()
-    set_machine_to_giveProduct2Default(machine)
+    machine, _ = set_machine_to_giveProduct2Default()
     assert machine.getNumberOfProduct2() == MAX_PRODUCT2_N - 1
 
 # Tests correct OK returning on default state.
 def test_giveProduct2_DefaultOK():
+    _, res = set_machine_to_giveProduct2Default()
+    assert res == VendingMachine.Response.OK
+
+
+
+
+
+"""
+apply_batch() tests.
+"""
+# A typical customer session plus an admin refill, as (opcode, argument) pairs.
+BATCH_SESSION = [(VendingMachine.Op.ENTER_ADMIN_MODE, ADMIN_CODE),
+                 (VendingMachine.Op.FILL_PRODUCTS, 0),
+                 (VendingMachine.Op.EXIT_ADMIN_MODE, 0),
+                 (VendingMachine.Op.PUT_COIN2, 0),
+                 (VendingMachine.Op.PUT_COIN2, 0),
+                 (VendingMachine.Op.PUT_COIN1, 0),
+                 (VendingMachine.Op.GIVE_PRODUCT2, 1),
+                 (VendingMachine.Op.PUT_COIN2, 0),
+                 (VendingMachine.Op.GIVE_PRODUCT1, 1),
+                 (VendingMachine.Op.GIVE_PRODUCT1, 0),
+                 (VendingMachine.Op.RETURN_MONEY, 0)]
+
+# Helper function to run BATCH_SESSION through the regular methods.
+def run_session_one_by_one(machine: VendingMachine):
+    return [machine.enterAdminMode(ADMIN_CODE),
+            machine.fillProducts(),
+            machine.exitAdminMode(),
+            machine.putCoin2(),
+            machine.putCoin2(),
+            machine.putCoin1(),
+            machine.giveProduct2(1),
+            machine.putCoin2(),
+            machine.giveProduct1(1),
+            machine.giveProduct1(0),
+            machine.returnMoney()]
+
+# Tests that a batch of pairs gives the same responses and state as separate calls.
+def test_apply_batch_Pairs():
+    machine, expected_machine = VendingMachine(), VendingMachine()
+    expected = [0 if r is None else r for r in run_session_one_by_one(expected_machine)]
+    assert list(machine.apply_batch(BATCH_SESSION)) == expected
+    assert machine.getCurrentBalance() == expected_machine.getCurrentBalance()
+    assert machine.getNumberOfProduct1() == expected_machine.getNumberOfProduct1()
+    assert machine.getNumberOfProduct2() == expected_machine.getNumberOfProduct2()
+
+# Tests that a flat array('i') batch is accepted.
+def test_apply_batch_FlatArray():
+    ops = array('i', [VendingMachine.Op.PUT_COIN1, 0,
+                      VendingMachine.Op.PUT_COIN2, 0,
+                      VendingMachine.Op.GIVE_PRODUCT1, 1,
+                      VendingMachine.Op.RETURN_MONEY, 0])
+    machine = VendingMachine()
+    assert list(machine.apply_batch(ops)) == [VendingMachine.Response.OK,
+                                              VendingMachine.Response.OK,
+                                              VendingMachine.Response.INSUFFICIENT_PRODUCT,
+                                              VendingMachine.Response.OK]
+    assert machine.getCurrentBalance() == 0
+
+# Tests that an empty batch does nothing.
+def test_apply_batch_Empty():
+    assert len(VendingMachine().apply_batch([])) == 0
+
+# Tests rejecting unknown opcodes before anything is executed.
+@pytest.mark.parametrize("ops", [[(VendingMachine.Op.PUT_COIN1, 0), (0, 0)],
+                                 array('i', [VendingMachine.Op.PUT_COIN1, 0, 99, 0]),
+                                 array('i', [VendingMachine.Op.PUT_COIN1])])
+def test_apply_batch_InvalidOps(ops):
     machine = VendingMachine()
-    assert set_machine_to_giveProduct2Default(machine) == VendingMachine.Response.OK
+    with pytest.raises(ValueError):
+        machine.apply_batch(ops)
+    assert machine.getCurrentBalance() == 0
+
+
+
+
+
+"""
+Arbitrary coin denominations tests.
+"""
+# Helper function to build a machine with coins of value 1, 2 and 5.
+def make_three_coin_machine():
+    machine = VendingMachine(coinValues=(1, 2, 5), coinCapacities=(50, 50, 20))
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.setPrices(3, 4)
+    machine.fillProducts()
+    return machine
+
+# Tests rejecting mismatched or non-positive coin configurations.
+@pytest.mark.parametrize("values, capacities", [((1,), (50,)), ((1, 2), (50,)), ((1, 0), (50, 50)), ((1, 2), (50, -1))])
+def test_init_InvalidCoinConfiguration(values: tuple, capacities: tuple):
+    with pytest.raises(ValueError):
+        VendingMachine(coinValues=values, coinCapacities=capacities)
+
+# Tests fillCoins() requiring one count per coin kind.
+def test_fillCoins_ThreeKindsInvalidParam():
+    machine = make_three_coin_machine()
+    assert machine.fillCoins(1, 1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.fillCoins(1, 1, 21) == VendingMachine.Response.INVALID_PARAM
+    assert machine.fillCoins(1, 1, 20) == VendingMachine.Response.OK
+    assert machine.getCoins(3) == 20
+
+# Tests putCoin() for the third coin kind and invalid kinds.
+def test_putCoin_ThreeKinds():
+    machine = make_three_coin_machine()
+    assert machine.putCoin(3) == VendingMachine.Response.ILLEGAL_OPERATION
+    machine.exitAdminMode()
+    assert machine.putCoin(0) == VendingMachine.Response.INVALID_PARAM
+    assert machine.putCoin(4) == VendingMachine.Response.INVALID_PARAM
+    assert machine.putCoin(3) == VendingMachine.Response.OK
+    assert machine.getCurrentBalance() == 5
+
+# Tests paying change with the fewest coins across three kinds.
+def test_giveProduct1_ThreeKindsFewestCoins():
+    machine = make_three_coin_machine()
+    machine.fillCoins(5, 5, 1)
+    machine.exitAdminMode()
+    machine.putCoin(3)
+    machine.putCoin(3)
+    # 10 - 3 = 7 is paid as 5 + 2.
+    assert machine.giveProduct1(1) == VendingMachine.Response.OK
+    machine.enterAdminMode(ADMIN_CODE)
+    assert [machine.getCoins(k) for k in (1, 2, 3)] == [5, 4, 2]
+
+# Tests UNSUITABLE_CHANGE when the boxes hold enough value but not the right coins.
+def test_giveProduct1_TwoFiveUnsuitable():
+    machine = VendingMachine(coinValues=(2, 5), coinCapacities=(50, 50))
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.setPrices(1, 1)
+    machine.fillProducts()
+    machine.fillCoins(1, 1)
+    machine.exitAdminMode()
+    machine.putCoin2()
+    # Change of 4 needs two coins of 2, but there is only one.
+    assert machine.giveProduct1(1) == VendingMachine.Response.UNSUITABLE_CHANGE
+    assert machine.getCurrentBalance() == 5
+
+
+
+
+
+"""
+Product catalog (giveProduct(), getNumberOfProduct(), getPrice(), setPrice()) tests.
+"""
+# Helper function to build a filled machine with four product slots.
+def make_four_slot_machine():
+    machine = VendingMachine(prices=(1, 2, 3, 4), productCapacities=(5, 6, 7, 8))
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    return machine
+
+# Tests rejecting mismatched or non-positive slot configurations.
+@pytest.mark.parametrize("prices, capacities", [((1,), (5,)), ((1, 2), (5,)), ((0, 2), (5, 5)), ((1, 2), (5, 0))])
+def test_init_InvalidSlotConfiguration(prices: tuple, capacities: tuple):
+    with pytest.raises(ValueError):
+        VendingMachine(prices=prices, productCapacities=capacities)
+
+# Tests the catalog getters on every slot.
+def test_catalog_Getters():
+    machine = make_four_slot_machine()
+    assert machine.getNumberOfSlots() == 4
+    assert [machine.getNumberOfProduct(s) for s in range(1, 5)] == [5, 6, 7, 8]
+    assert [machine.getPrice(s) for s in range(1, 5)] == [1, 2, 3, 4]
+    assert machine.getNumberOfProduct(5) == 0
+    assert machine.getPrice(0) == 0
+
+# Tests setPrice() modes and parameters.
+def test_setPrice():
+    machine = make_four_slot_machine()
+    assert machine.setPrice(0, 1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.setPrice(3, 0) == VendingMachine.Response.INVALID_PARAM
+    assert machine.setPrice(3, 9) == VendingMachine.Response.OK
+    assert machine.getPrice(3) == 9
+    machine.exitAdminMode()
+    assert machine.setPrice(3, 1) == VendingMachine.Response.ILLEGAL_OPERATION
+
+# Tests setPrices() requiring one price per slot.
+def test_setPrices_FourSlots():
+    machine = make_four_slot_machine()
+    assert machine.setPrices(1, 1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.setPrices(1, 1, 1, -1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.setPrices(4, 3, 2, 1) == VendingMachine.Response.OK
+    assert [machine.getPrice(s) for s in range(1, 5)] == [4, 3, 2, 1]
+
+# Tests giveProduct() on a slot beyond the first two.
+def test_giveProduct_FourthSlot():
+    machine = make_four_slot_machine()
+    assert machine.giveProduct(4, 1) == VendingMachine.Response.ILLEGAL_OPERATION
+    machine.exitAdminMode()
+    machine.putCoin2()
+    machine.putCoin2()
+    machine.putCoin1()
+    assert machine.giveProduct(5, 1) == VendingMachine.Response.INVALID_PARAM
+    assert machine.giveProduct(4, 9) == VendingMachine.Response.INVALID_PARAM
+    assert machine.giveProduct(4, 1) == VendingMachine.Response.OK
+    assert machine.getNumberOfProduct(4) == 7
+    assert machine.getCurrentBalance() == 0
+
+# Tests giveProduct() agreeing with giveProduct1() and giveProduct2().
+@pytest.mark.parametrize("slot, number", list(product([1, 2], [0, 1, 2, 3, MAX_PRODUCT1_N + 1])))
+def test_giveProduct_MatchesNumberedMethods(slot: int, number: int):
+    machines = [VendingMachine(), VendingMachine()]
+    for machine in machines:
+        machine.enterAdminMode(ADMIN_CODE)
+        machine.setPrices(2, 3)
+        machine.fillProducts()
+        machine.exitAdminMode()
+        machine.putCoin2()
+        machine.putCoin2()
+        machine.putCoin1()
+    numbered = machines[0].giveProduct1 if slot == 1 else machines[0].giveProduct2
+    assert machines[1].giveProduct(slot, number) == numbered(number)
+    assert machines[1].getNumberOfProduct(slot) == machines[0].getNumberOfProduct(slot)
+
+"""
+Packed state (to_bytes(), from_buffer(), snapshot_fleet(), restore_fleet()) tests.
+"""
+# Helper function to build a machine in a state touching every packed field.
+def make_packed_machine() -> VendingMachine:
+    machine = VendingMachine(coinValues=(1, 2, 5), coinCapacities=(50, 50, 20),
+                             prices=(8, 5, 3), productCapacities=(30, 40, 10))
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.fillCoins(3, 4, 5)
+    machine.setPrice(3, 7)
+    machine.exitAdminMode()
+    machine.putCoin(3)
+    machine.putCoin2()
+    return machine
+
+# Tests that a packed machine comes back with the same state and configuration.
+def test_fromBuffer_RoundTrip():
+    machine = make_packed_machine()
+    data = machine.to_bytes()
+    assert len(data) == machine.packedSize() == 8 + 8 * 19
+    restored = VendingMachine.from_buffer(data)
+    assert restored._getState() == machine._getState()
+    assert restored.getCoinValues() == (1, 2, 5)
+    assert restored.to_bytes() == data
+    assert restored.giveProduct(3, 1) == machine.giveProduct(3, 1) == VendingMachine.Response.OK
+
+# Tests packing into and reading from an offset of a larger buffer.
+def test_packInto_Offset():
+    machine = make_packed_machine()
+    buffer = bytearray(16 + machine.packedSize())
+    machine.pack_into(buffer, 16)
+    assert bytes(buffer[16:]) == machine.to_bytes()
+    assert VendingMachine.from_buffer(buffer, 16)._getState() == machine._getState()
+
+# Tests ValueError for truncated buffers, impossible states and values beyond int64.
+def test_fromBuffer_Invalid():
+    data = bytearray(VendingMachine().to_bytes())
+    with pytest.raises(ValueError):
+        VendingMachine.from_buffer(data[:-1])
+    data[0] = 3
+    with pytest.raises(ValueError):
+        VendingMachine.from_buffer(data)
+    machine = VendingMachine(coinCapacities=(2**63, 50))
+    with pytest.raises(ValueError):
+        machine.to_bytes()
+    # States no machine could be in: a balance the coins don't cover, a balance in admin mode.
+    for mode, balance, coins in ((VendingMachine.Mode.OPERATION, 1000, (1, 1)),
+                                 (VendingMachine.Mode.ADMINISTERING, 1, (1, 0))):
+        machine = VendingMachine()
+        machine._setState((mode, balance, (8, 5), (0, 0), coins))
+        data = machine.to_bytes()
+        with pytest.raises(ValueError):
+            VendingMachine.from_buffer(data)
+        target = VendingMachine()
+        with pytest.raises(ValueError):
+            target.unpack_from(data)
+        assert target.to_bytes() == VendingMachine().to_bytes()
+
+# Tests in-place restore refusing a buffer of another configuration.
+def test_unpackFrom_ConfigurationMismatch():
+    machine = VendingMachine()
+    machine.unpack_from(VendingMachine().to_bytes())
+    with pytest.raises(ValueError):
+        machine.unpack_from(make_packed_machine().to_bytes())
+    with pytest.raises(ValueError):
+        machine.unpack_from(VendingMachine(productCapacities=(30, 41)).to_bytes())
+    assert machine._getState() == VendingMachine()._getState()
+
+# Tests snapshotting a mixed fleet into one buffer and restoring it in place and into new machines.
+def test_snapshotFleet_RoundTrip():
+    machines = [make_packed_machine(), VendingMachine(), make_packed_machine()]
+    machines[2].returnMoney()
+    states = [machine._getState() for machine in machines]
+    buffer = VendingMachine.snapshot_fleet(machines)
+    assert len(buffer) == sum(machine.packedSize() for machine in machines)
+    assert [machine._getState() for machine in VendingMachine.restore_fleet(bytes(buffer))] == states
+    for machine in machines:
+        machine.returnMoney()
+    VendingMachine.restore_fleet(buffer, machines)
+    assert [machine._getState() for machine in machines] == states
+
+# Tests snapshot_fleet() into a caller's buffer that is too small.
+def test_snapshotFleet_BufferTooSmall():
+    with pytest.raises(ValueError):
+        VendingMachine.snapshot_fleet([VendingMachine()], bytearray(10))
+
+"""
+fork() tests.
+"""
+# Helper function to build a stocked machine in operation mode.
+def make_forkable_machine() -> VendingMachine:
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.fillCoins(10, 10)
+    machine.exitAdminMode()
+    machine.putCoin2()
+    return machine
+
+# Tests that a fork starts in its parent's state.
+def test_fork_SameState():
+    machine = make_forkable_machine()
+    child = machine.fork()
+    assert type(child) is VendingMachine
+    assert child._getState() == machine._getState()
+    assert child.to_bytes() == machine.to_bytes()
+
+# Tests that in-place writes of the child don't reach the parent and vice versa.
+def test_fork_Isolated():
+    machine = make_forkable_machine()
+    parentState = machine._getState()
+    child = machine.fork()
+    assert child.putCoin1() == VendingMachine.Response.OK
+    assert child.putCoin2() == VendingMachine.Response.OK
+    assert child.giveProduct2(1) == VendingMachine.Response.OK
+    assert machine._getState() == parentState
+    childState = child._getState()
+    assert machine.putCoin2() == VendingMachine.Response.OK
+    assert machine.returnMoney() == VendingMachine.Response.OK
+    machine.enterAdminMode(ADMIN_CODE)
+    assert machine.setPrice(1, 3) == VendingMachine.Response.OK
+    assert child._getState() == childState
+    assert child.getPrice1() == 8
+
+# Tests a tree of forks where every branch sees only its own writes.
+def test_fork_Tree():
+    root = make_forkable_machine()
+    branches = [root.fork() for _ in range(3)]
+    grandchild = branches[0].fork()
+    for n, branch in enumerate(branches):
+        for _ in range(n):
+            branch.putCoin1()
+    grandchild.putCoin2()
+    assert [branch.getCurrentBalance() for branch in branches] == [2, 3, 4]
+    assert grandchild.getCurrentBalance() == 4
+    assert root.getCurrentBalance() == 2
+
+# Tests that per-instance wrappers stay on the parent.
+def test_fork_DropsInstanceWrappers():
+    machine = make_forkable_machine()
+    calls = []
+    original = machine.putCoin1
+    machine.putCoin1 = lambda: calls.append(1) or original()
+    child = machine.fork()
+    child.putCoin1()
+    assert calls == []
+    assert 'putCoin1' not in child.__dict__
+    machine.putCoin1()
+    assert calls == [1]
+
+"""
+giveProducts() tests.
+"""
+# Helper function to build a filled machine with prices 3 and 4 and the given balance.
+def make_cart_machine(balance: int) -> VendingMachine:
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.fillCoins(5, 5)
+    machine.setPrices(3, 4)
+    machine.exitAdminMode()
+    for _ in range(balance // 2):
+        machine.putCoin2()
+    for _ in range(balance % 2):
+        machine.putCoin1()
+    return machine
+
+# Tests buying a whole cart with a single payout of change.
+@pytest.mark.parametrize("cart", [{1: 2, 2: 3}, [(1, 2), (2, 3)], [(1, 1), (2, 3), (1, 1)]])
+def test_giveProducts_OK(cart):
+    machine = make_cart_machine(21)
+    assert machine.giveProducts(cart) == VendingMachine.Response.OK
+    assert machine.getNumberOfProduct1() == MAX_PRODUCT1_N - 2
+    assert machine.getNumberOfProduct2() == MAX_PRODUCT2_N - 3
+    assert machine.getCurrentBalance() == 0
+    machine.enterAdminMode(ADMIN_CODE)
+    # 21 paid, 18 kept: 3 of change out of 5 + 10 coins and 5 + 10 + 1 inserted.
+    assert machine.getCurrentSum() == 15 + 18
+
+# Tests that a failing cart changes nothing, in the order giveProduct() checks.
+@pytest.mark.parametrize("cart, balance, response", [
+    ({}, 20, VendingMachine.Response.INVALID_PARAM),
+    ({3: 1}, 20, VendingMachine.Response.INVALID_PARAM),
+    ({1: 0}, 20, VendingMachine.Response.INVALID_PARAM),
+    ([(1, MAX_PRODUCT1_N), (1, 1)], 20, VendingMachine.Response.INVALID_PARAM),
+    ({1: 1, 2: 1}, 6, VendingMachine.Response.INSUFFICIENT_MONEY),
+])
+def test_giveProducts_Fails(cart, balance: int, response: int):
+    machine = make_cart_machine(balance)
+    state = machine._getState()
+    assert machine.giveProducts(cart) == response
+    assert machine._getState() == state
+
+# Tests INSUFFICIENT_PRODUCT when only the cart as a whole exceeds the stock.
+def test_giveProducts_InsufficientProduct():
+    machine = make_cart_machine(0)
+    for _ in range(MAX_PRODUCT1_N - 1):
+        machine.putCoin2()
+        machine.putCoin1()
+        assert machine.giveProduct1(1) == VendingMachine.Response.OK
+    machine.putCoin2()
+    machine.putCoin2()
+    machine.putCoin2()
+    state = machine._getState()
+    assert machine.giveProducts([(1, 1), (1, 1)]) == VendingMachine.Response.INSUFFICIENT_PRODUCT
+    assert machine._getState() == state
+    assert machine.giveProducts({1: 1}) == VendingMachine.Response.OK
+
+# Tests correct ILLEGAL_OPERATION returning.
+def test_giveProducts_IllegalOperation():
+    machine = make_cart_machine(0)
+    machine.enterAdminMode(ADMIN_CODE)
+    assert machine.giveProducts({1: 1}) == VendingMachine.Response.ILLEGAL_OPERATION
+
+# Tests that a cart bought at once leaves the same stock as separate purchases.
+def test_giveProducts_MatchesSeparatePurchases():
+    cart, separate = make_cart_machine(7), make_cart_machine(3)
+    assert cart.giveProducts({1: 1, 2: 1}) == VendingMachine.Response.OK
+    assert separate.giveProduct1(1) == VendingMachine.Response.OK
+    separate.putCoin2()
+    separate.putCoin2()
+    assert separate.giveProduct2(1) == VendingMachine.Response.OK
+    assert cart._getState()[3] == separate._getState()[3]
+
+
+
+
+
+"""
+from_state() and state() tests.
+"""
+# Tests that from_state() builds the state the old call-by-call setups reached.
+def test_fromState_MatchesReplay():
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillCoins(1, 1)
+    machine.setPrices(1, 1)
+    machine.fillProducts()
+    machine.exitAdminMode()
+    for _ in range(5):
+        machine.putCoin1()
+    built = VendingMachine.from_state(balance=5, prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N), coins=(6, 1))
+    assert built._getState() == machine._getState()
+    assert built.giveProduct1(2) == machine.giveProduct1(2) == VendingMachine.Response.OK
+    assert built._getState() == machine._getState()
+
+# Tests the defaults: a fresh machine.
+def test_fromState_Defaults():
+    assert VendingMachine.from_state().state() == VendingMachine().state()
+
+# Tests the round trip through state(), configuration included.
+def test_state_RoundTrip():
+    state = dict(mode=VendingMachine.Mode.OPERATION, balance=17, prices=(3, 4, 5), products=(1, 0, 9),
+                 coins=(1, 49, 0), coinValues=(1, 2, 5), coinCapacities=(50, 50, 10), productCapacities=(5, 5, 9))
+    machine = VendingMachine.from_state(**state)
+    assert machine.state() == state
+    assert VendingMachine.from_state(**machine.state()).to_bytes() == machine.to_bytes()
+    assert machine.getCurrentBalance() == 17
+    assert machine.giveProduct(3, 3) == VendingMachine.Response.OK
+
+# Tests rejecting states no machine could be in.
+@pytest.mark.parametrize("state", [dict(mode=3), dict(balance=-1), dict(balance=1), dict(balance=3, coins=(1, 0)),
+                                   dict(mode=VendingMachine.Mode.ADMINISTERING, balance=1, coins=(1, 0)),
+                                   dict(products=(MAX_PRODUCT1_N + 1, 0)), dict(products=(0, 0, 0)),
+                                   dict(coins=(-1, 0)), dict(coins=(0, MAX_COINS2_N + 1)), dict(coins=(0,)),
+                                   dict(prices=(0, 1))])
+def test_fromState_Invalid(state: dict):
+    with pytest.raises(ValueError):
+        VendingMachine.from_state(**state)
+
+
+
+
+
+
+"""
+putCoins() tests.
+"""
+# Tests taking a whole burst at once.
+def test_putCoins_OK():
+    machine = VendingMachine()
+    assert machine.putCoins(3, 4) == (VendingMachine.Response.OK, (3, 4), (0, 0))
+    assert machine.getCurrentBalance() == 11
+    machine.returnMoney()
+    machine.enterAdminMode(ADMIN_CODE)
+    assert (machine.getCoins1(), machine.getCoins2()) == (0, 0)
+
+# Tests that a burst ends in the same state as the coins put in one by one.
+def test_putCoins_MatchesOneByOne():
+    burst, single = VendingMachine.from_state(balance=3, coins=(1, 1)), VendingMachine.from_state(balance=3, coins=(1, 1))
+    burst.putCoins(7, 2)
+    for _ in range(7):
+        single.putCoin1()
+    for _ in range(2):
+        single.putCoin2()
+    assert burst.state() == single.state()
+
+# Tests accepting what fits and reporting the rest as rejected.
+def test_putCoins_PartialAcceptance():
+    machine = VendingMachine.from_state(balance=4, coins=(MAX_COINS1_N - 2, MAX_COINS2_N))
+    assert machine.putCoins(5, 1) == (VendingMachine.Response.CANNOT_PERFORM, (2, 0), (3, 1))
+    assert machine.getCurrentBalance() == 6
+    assert machine.state()['coins'] == (MAX_COINS1_N, MAX_COINS2_N)
+    assert machine.putCoins(1, 0) == (VendingMachine.Response.CANNOT_PERFORM, (0, 0), (1, 0))
+    assert machine.getCurrentBalance() == 6
+
+# Tests that an empty burst is OK and changes nothing.
+def test_putCoins_Empty():
+    machine = VendingMachine()
+    assert machine.putCoins(0, 0) == (VendingMachine.Response.OK, (0, 0), (0, 0))
+    assert machine.state() == VendingMachine().state()
+
+# Tests correct INVALID_PARAM returning, with nothing taken.
+@pytest.mark.parametrize("counts", [(-1, 2), (2, -1), (1, 1, 1)])
+def test_putCoins_InvalidParam(counts: tuple):
+    machine = VendingMachine()
+    assert machine.putCoins(*counts) == (VendingMachine.Response.INVALID_PARAM, (0,) * len(counts), counts)
+    assert machine.getCurrentBalance() == 0
+
+# Tests correct ILLEGAL_OPERATION returning.
+def test_putCoins_IllegalOperation():
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    assert machine.putCoins(1, 1) == (VendingMachine.Response.ILLEGAL_OPERATION, (0, 0), (1, 1))
+    assert machine.getCurrentSum() == 0
+
+# Tests a machine with three coin kinds.
+def test_putCoins_MoreKinds():
+    machine = VendingMachine(coinValues=(1, 2, 5), coinCapacities=(10, 10, 2))
+    assert machine.putCoins(1, 2, 3) == (VendingMachine.Response.CANNOT_PERFORM, (1, 2, 2), (0, 0, 1))
+    assert machine.getCurrentBalance() == 15
+
+
+
+
+
+"""
+canMakeChange() and canBuy() tests.
+"""
+# Helper function to check both queries against the calls they predict.
+def check_change_queries(machine: VendingMachine):
+    _, _, _, _, coins = machine._getState()
+    solver = ChangeMaker(machine.getCoinValues())
+    for amount in range(sum(c * v for c, v in zip(coins, machine.getCoinValues())) + 3):
+        assert machine.canMakeChange(amount) == (solver.solve(amount, coins) is not None), amount
+    for slot in range(machine.getNumberOfSlots() + 2):
+        for number in range(4):
+            assert machine.canBuy(slot, number) == (machine.fork().giveProduct(slot, number) == VendingMachine.Response.OK)
+
+# Tests the bitmap kept up to date through random traffic, coins in and out.
+@pytest.mark.parametrize("seed", range(3))
+def test_canMakeChange_MatchesSolver(seed: int):
+    rng = random.Random(seed)
+    machine = VendingMachine(coinValues=(2, 5, 3), coinCapacities=(6, 4, 5), prices=(3, 7, 4), productCapacities=(9, 9, 9))
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.exitAdminMode()
+    for _ in range(300):
+        name, args = rng.choice([('putCoin', (rng.randint(1, 3),)), ('putCoins', (rng.randint(0, 3), rng.randint(0, 2), rng.randint(0, 2))),
+                                 ('giveProduct', (rng.randint(1, 3), rng.randint(1, 2))), ('returnMoney', ()),
+                                 ('giveProducts', ({1: 1, 3: 1},)), ('fillCoins', (rng.randint(1, 6), rng.randint(1, 4), rng.randint(1, 5)))])
+        if name == 'fillCoins':
+            machine.enterAdminMode(ADMIN_CODE)
+            machine.fillCoins(*args)
+            machine.fillProducts()
+            machine.exitAdminMode()
+        else:
+            getattr(machine, name)(*args)
+        check_change_queries(machine)
+
+# Tests the bitmap of restored states.
+def test_canMakeChange_Restored():
+    machine = VendingMachine.from_state(balance=3, coins=(1, 1))
+    assert [machine.canMakeChange(a) for a in range(5)] == [True, True, True, True, False]
+    machine._setState((VendingMachine.Mode.OPERATION, 4, (8, 5), (0, 0), (0, 2)))
+    assert [machine.canMakeChange(a) for a in range(6)] == [True, False, True, False, True, False]
+    machine.unpack_from(VendingMachine().to_bytes())
+    assert machine.canMakeChange(0) and not machine.canMakeChange(1)
+    assert not machine.canMakeChange(-1)
+
+# Tests that a fork keeps its own bitmap.
+def test_canMakeChange_Fork():
+    machine = VendingMachine.from_state(balance=1, coins=(1, 0))
+    child = machine.fork()
+    child.putCoin2()
+    assert child.canMakeChange(3) and not machine.canMakeChange(3)
+
+# Tests canBuy() on the ways a purchase can fail.
+def test_canBuy():
+    machine = VendingMachine.from_state(balance=8, prices=(3, 1), products=(1, 0), coins=(0, 4))
+    assert not machine.canBuy(1, 1)         # change 5 out of 2-coins
+    assert not machine.canBuy(1, 2)         # only one left
+    assert not machine.canBuy(2, 1)         # none left
+    assert not machine.canBuy(3, 1)
+    machine.putCoin1()
+    assert machine.canBuy(1, 1)
+    assert machine.giveProduct1(1) == VendingMachine.Response.OK
+    assert not machine.canBuy(1, 1)
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    assert not machine.canBuy(1, 1)
+
+
+
+
+
+"""
+begin(), savepoint(), commit(), rollback() and transaction() tests.
+"""
+# Helper function to make a stocked machine with prices 1 and 1 and empty coin boxes.
+def make_transaction_machine() -> VendingMachine:
+    return VendingMachine.from_state(prices=(1, 1), products=(MAX_PRODUCT1_N, MAX_PRODUCT2_N))
+
+# Tests undoing a session whose purchase failed.
+def test_rollback_FailedSession():
+    machine = make_transaction_machine()
+    before = machine.state()
+    machine.begin()
+    for _ in range(3):
+        machine.putCoin2()
+    assert machine.giveProduct1(3) == VendingMachine.Response.UNSUITABLE_CHANGE
+    machine.rollback()
+    assert machine.state() == before
+    assert machine.canMakeChange(0) and not machine.canMakeChange(2)
+    with pytest.raises(ValueError):
+        machine.commit()
+
+# Tests rolling back to a savepoint and going on in the same transaction.
+def test_rollback_Savepoint():
+    machine = make_transaction_machine()
+    machine.begin()
+    machine.putCoin1()
+    after = machine.state()
+    savepoint = machine.savepoint()
+    machine.putCoin2()
+    assert machine.giveProduct2(3) == VendingMachine.Response.OK
+    machine.rollback(savepoint)
+    assert machine.state() == after
+    assert machine.savepoint() == savepoint
+    machine.putCoin1()
+    machine.commit()
+    assert machine.getCurrentBalance() == 2
+
+# Tests that the log grows with the changes made, not with the size of the state.
+def test_savepoint_CountsChanges():
+    machine = VendingMachine(coinValues=(1, 2) + (5,) * 10, coinCapacities=(50,) * 12,
+                             prices=(1,) * 20, productCapacities=(9,) * 20)
+    machine.begin()
+    assert machine.enterAdminMode(ADMIN_CODE) == VendingMachine.Response.OK
+    assert machine.setPrice(7, 3) == VendingMachine.Response.OK
+    machine.exitAdminMode()
+    assert machine.savepoint() == 3
+    assert machine.putCoin1() == VendingMachine.Response.OK
+    assert machine.savepoint() == 6
+    assert machine.giveProduct1(2) == VendingMachine.Response.INSUFFICIENT_PRODUCT
+    assert machine.savepoint() == 6
+    machine.rollback()
+    assert machine.state() == VendingMachine(coinValues=(1, 2) + (5,) * 10, coinCapacities=(50,) * 12,
+                                             prices=(1,) * 20, productCapacities=(9,) * 20).state()
+
+# Tests that rolling back random traffic restores the exact state, change bitmap included.
+@pytest.mark.parametrize("seed", range(3))
+def test_rollback_RandomTraffic(seed: int):
+    rng = random.Random(seed)
+    machine = VendingMachine.from_state(balance=3, prices=(2, 3), products=(4, 4), coins=(1, 1))
+    solver = ChangeMaker(machine.getCoinValues())
+    calls = [('putCoin1', ()), ('putCoin2', ()), ('putCoins', (2, 1)), ('returnMoney', ()), ('giveProduct1', (1,)),
+             ('giveProduct2', (1,)), ('giveProducts', ({1: 1, 2: 1},)), ('enterAdminMode', (ADMIN_CODE,)),
+             ('exitAdminMode', ()), ('fillProducts', ()), ('fillCoins', (3, 2)), ('setPrices', (1, 4)),
+             ('setPrice', (2, 2))]
+    for _ in range(20):
+        before = machine.state()
+        machine.begin()
+        savepoints = []
+        for _ in range(rng.randint(1, 15)):
+            if rng.random() < 0.2:
+                savepoints.append((machine.savepoint(), machine.state()))
+            name, args = rng.choice(calls)
+            getattr(machine, name)(*args)
+        if savepoints:
+            savepoint, state = rng.choice(savepoints)
+            machine.rollback(savepoint)
+            assert machine.state() == state
+        if rng.random() < 0.5:
+            machine.rollback()
+            assert machine.state() == before
+        else:
+            machine.commit()
+        coins = machine.state()['coins']
+        assert all(machine.canMakeChange(a) == (solver.solve(a, coins) is not None) for a in range(12))
+
+# Tests the context manager committing, rolling back on an exception and nesting as a savepoint.
+def test_transaction_ContextManager():
+    machine = make_transaction_machine()
+    with machine.transaction():
+        machine.putCoin2()
+    assert machine.getCurrentBalance() == 2
+    with pytest.raises(RuntimeError):
+        with machine.transaction():
+            machine.putCoin2()
+            with pytest.raises(KeyError):
+                with machine.transaction():
+                    machine.putCoin1()
+                    raise KeyError
+            assert machine.getCurrentBalance() == 4
+            raise RuntimeError
+    assert machine.getCurrentBalance() == 2
+    with machine.transaction():
+        machine.putCoin1()
+        machine.rollback()
+    assert machine.getCurrentBalance() == 2
+
+# Tests that a fork taken inside a transaction is independent of its rollback.
+def test_rollback_Fork():
+    machine = make_transaction_machine()
+    machine.putCoin2()
+    machine.begin()
+    assert machine.giveProduct1(2) == VendingMachine.Response.OK
+    child = machine.fork()
+    with pytest.raises(ValueError):
+        child.rollback()
+    machine.rollback()
+    assert machine.getNumberOfProduct1() == MAX_PRODUCT1_N
+    assert child.getNumberOfProduct1() == MAX_PRODUCT1_N - 2
+    machine.begin()
+    assert machine.giveProduct1(2) == VendingMachine.Response.OK
+    assert child.getNumberOfProduct1() == MAX_PRODUCT1_N - 2
+    machine = VendingMachine.from_state(coins=(1, 1))
+    machine.begin()
+    machine.putCoin1()
+    child = machine.fork()
+    assert machine.returnMoney() == VendingMachine.Response.OK
+    machine.rollback()
+    assert child.state()['balance'] == 1
+    assert child.state()['coins'] == (2, 1)
+    assert machine.state() == VendingMachine.from_state(coins=(1, 1)).state()
+
+# Tests misuse: nested begin(), no transaction, unknown savepoints.
+def test_transaction_Errors():
+    machine = VendingMachine()
+    for call in (machine.commit, machine.rollback, machine.savepoint):
+        with pytest.raises(ValueError):
+            call()
+    machine.begin()
+    with pytest.raises(ValueError):
+        machine.begin()
+    with pytest.raises(ValueError):
+        machine.rollback(1)
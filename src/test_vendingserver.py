@@ -0,0 +1,120 @@
+from VendingMachine import VendingMachine
+from VendingServer import VendingServer, VendingClient, Protocol
+import asyncio
+import pytest
+
+ADMIN_CODE = 117345294655382
+
+# Helper function to run `scenario(client, server)` against a fresh server on an ephemeral port.
+def run_with_server(machines, scenario):
+    async def main():
+        server = await VendingServer(machines).start()
+        client = await VendingClient().connect(*server.address[:2])
+        try:
+            return await scenario(client, server)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+"""
+VendingServer and VendingClient tests.
+"""
+# Tests that pipelined requests give the same values as local calls, in order.
+def test_pipeline_MatchesLocalCalls():
+    local = VendingMachine()
+    expected = [local.enterAdminMode(ADMIN_CODE),
+                local.fillProducts(),
+                local.fillCoins(5, 5),
+                local.exitAdminMode() or 0,
+                local.putCoin2(),
+                local.putCoin2(),
+                local.putCoin1(),
+                local.getCurrentBalance(),
+                local.giveProduct2(1),
+                local.getNumberOfProduct(2),
+                local.returnMoney()]
+    requests = [(0, VendingMachine.Op.ENTER_ADMIN_MODE, ADMIN_CODE),
+                (0, VendingMachine.Op.FILL_PRODUCTS),
+                (0, VendingMachine.Op.FILL_COINS, 5, 5),
+                (0, VendingMachine.Op.EXIT_ADMIN_MODE),
+                (0, VendingMachine.Op.PUT_COIN2),
+                (0, VendingMachine.Op.PUT_COIN2),
+                (0, VendingMachine.Op.PUT_COIN1),
+                (0, Protocol.GET_CURRENT_BALANCE),
+                (0, VendingMachine.Op.GIVE_PRODUCT2, 1),
+                (0, Protocol.GET_NUMBER_OF_PRODUCT, 2),
+                (0, VendingMachine.Op.RETURN_MONEY)]
+    machines = [VendingMachine()]
+    assert run_with_server(machines, lambda client, server: client.pipeline(requests)) == expected
+
+# Tests that one server keeps machines apart.
+def test_pipeline_SeveralMachines():
+    machines = [VendingMachine() for _ in range(3)]
+    requests = [(i, VendingMachine.Op.PUT_COIN1) for i in range(3) for _ in range(i + 1)]
+    run_with_server(machines, lambda client, server: client.pipeline(requests))
+    assert [m.getCurrentBalance() for m in machines] == [1, 2, 3]
+
+# Tests ERROR for unknown machines, opcodes and argument lists.
+@pytest.mark.parametrize("request_", [(5, VendingMachine.Op.PUT_COIN1),
+                                      (0, 200),
+                                      (0, VendingMachine.Op.GIVE_PRODUCT1),
+                                      (0, VendingMachine.Op.GIVE_PRODUCTS, 1, 1, 2)])
+def test_call_Error(request_: tuple):
+    value = run_with_server([VendingMachine()], lambda client, server: client.call(*request_))
+    assert value == Protocol.ERROR
+
+# Tests sending a cart as slot/number pairs.
+def test_call_GiveProducts():
+    machine = VendingMachine()
+    machine.enterAdminMode(ADMIN_CODE)
+    machine.fillProducts()
+    machine.exitAdminMode()
+    for _ in range(9):
+        machine.putCoin2()
+    value = run_with_server([machine], lambda client, server:
+                            client.call(0, VendingMachine.Op.GIVE_PRODUCTS, 1, 1, 2, 2))
+    assert value == VendingMachine.Response.OK
+    assert (machine.getNumberOfProduct1(), machine.getNumberOfProduct2()) == (29, 38)
+
+# Tests answering a burst with its response.
+def test_call_PutCoins():
+    machine = VendingMachine.from_state(coins=(48, 0))
+    value = run_with_server([machine], lambda client, server: client.call(0, VendingMachine.Op.PUT_COINS, 3, 1))
+    assert value == VendingMachine.Response.CANNOT_PERFORM
+    assert machine.getCurrentBalance() == 4
+
+# A machine whose purchases raise, standing in for one with a fault.
+class FaultyMachine(VendingMachine):
+    def giveProduct1(self, number: int):
+        raise RuntimeError("jammed")
+
+# Tests that a call raising anything but TypeError answers ERROR and keeps the connection.
+def test_call_MachineRaises():
+    requests = [(0, VendingMachine.Op.GIVE_PRODUCT1, 1), (0, VendingMachine.Op.PUT_COIN2),
+                (0, Protocol.GET_CURRENT_BALANCE)]
+    values = run_with_server([FaultyMachine()], lambda client, server: client.pipeline(requests))
+    assert values == [Protocol.ERROR, VendingMachine.Response.OK, 2]
+
+# Tests that the client skips responses to ids it never sent or already got.
+def test_receive_UnknownIds():
+    async def answer(reader, writer):
+        requestId, _, _, _ = Protocol.REQUEST.unpack(await reader.readexactly(Protocol.REQUEST.size))
+        writer.write(Protocol.RESPONSE.pack(requestId + 7, 5) + Protocol.RESPONSE.pack(requestId, 1)
+                     + Protocol.RESPONSE.pack(requestId, 2))
+        requestId, _, _, _ = Protocol.REQUEST.unpack(await reader.readexactly(Protocol.REQUEST.size))
+        writer.write(Protocol.RESPONSE.pack(requestId, 3))
+        await writer.drain()
+
+    async def main():
+        server = await asyncio.start_server(answer, '127.0.0.1', 0)
+        client = await VendingClient().connect(*server.sockets[0].getsockname()[:2])
+        try:
+            first = await asyncio.wait_for(client.call(0, VendingMachine.Op.PUT_COIN1), 5)
+            second = await asyncio.wait_for(client.call(0, VendingMachine.Op.PUT_COIN1), 5)
+            return first, second
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+    assert asyncio.run(main()) == (1, 3)